@@ -7,6 +7,11 @@ from flask import (
     flash,
     session,
     jsonify,
+    g,
+    has_app_context,
+    Response,
+    stream_with_context,
+    send_file,
 )
 import sqlite3
 from datetime import datetime
@@ -15,69 +20,61 @@ import io
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 import json
-from crawl4ai import AsyncWebCrawler
-import asyncio
+import base64
+import os
+import re
 from asgiref.wsgi import WsgiToAsgi
 from quart import Quart
 from googleapiclient.discovery import build
 from urllib.parse import urlparse, parse_qs
-from database import init_db
-from yt_dlp import YoutubeDL
-from contextlib import contextmanager
+from database import init_db, ConnectionPool, DATABASE
+from jobs import enqueue as enqueue_job, get_job
+from crawler import parse_url_list, MAX_BATCH_URLS
+from search import KINDS as SEARCH_KINDS, search as search_index
+from crawl_store import available_formats, load_payload, PAYLOAD_FORMATS, DETAIL_TABS
+from transcript_cache import FORMATS as TRANSCRIPT_FORMATS, get_transcript_cache
+from csv_import import (
+    import_inventory_csv, report_path as import_report_path, remove_report as remove_import_report,
+    DEFAULT_CHUNK_SIZE,
+)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'  # make sure this is secure
 
+app.config.setdefault('DATABASE', DATABASE)
+app.config.setdefault('DB_POOL_SIZE', 8)
+app.config.setdefault('CSV_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+db_pool = ConnectionPool(app.config['DATABASE'], max_size=app.config['DB_POOL_SIZE'])
+
 # Define database functions first
 def get_db():
-    conn = sqlite3.connect('inventory.db', timeout=15)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return the pooled connection bound to the current app context.
+
+    Outside an app context a connection is checked out directly; closing it
+    (or leaving its ``with`` block) hands it back to the pool.
+    """
+    if not has_app_context():
+        return db_pool.acquire()
+    if "db" not in g:
+        conn = db_pool.acquire()
+        conn.request_bound = True
+        g.db = conn
+    return g.db
 
-@contextmanager
 def get_db_connection():
-    conn = get_db()
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+    # Pooled connections work both as ``with get_db_connection() as conn:``
+    # (commit/rollback on exit) and as a plain ``conn = get_db_connection()``
+    return get_db()
 
-# Then define init_db
-def init_db():
-    try:
-        with get_db_connection() as conn:
-            # Create users table
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL
-                )
-            ''')
-
-            # Create videos table
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS videos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    url TEXT NOT NULL,
-                    title TEXT,
-                    transcript TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            ''')
-    except Exception as e:
-        print(f"Database initialization error: {str(e)}")
-        raise e
+@app.teardown_appcontext
+def release_db(exception=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        db_pool.release(conn)
 
-# Initialize database
-init_db()
+# Apply any pending schema migrations (no-op when already current)
+init_db(app.config['DATABASE'])
 
 # Add custom Jinja2 filter for JSON parsing
 @app.template_filter("from_json")
@@ -103,24 +100,151 @@ def landing():
     return render_template("landing.html")
 
 
+# Keyset pagination over a user's inventory. Each sort key pairs with an
+# (user_id, column) index and ``id`` breaks ties so pages never overlap.
+INVENTORY_SORTS = {
+    "date_added": "desc",
+    "name": "asc",
+    "quantity": "desc",
+    "category": "asc",
+}
+INVENTORY_PAGE_SIZES = (25, 50, 100, 250)
+DEFAULT_PAGE_SIZE = 50
+
+
+def encode_cursor(value, item_id):
+    raw = json.dumps([value, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    padded = token + "=" * (-len(token) % 4)
+    value, item_id = json.loads(base64.urlsafe_b64decode(padded))
+    return value, int(item_id)
+
+
+def inventory_page_args(args):
+    """Normalize sort/order/page_size/after query arguments"""
+    sort = args.get("sort", "date_added")
+    if sort not in INVENTORY_SORTS:
+        sort = "date_added"
+    order = args.get("order", INVENTORY_SORTS[sort])
+    if order not in ("asc", "desc"):
+        order = INVENTORY_SORTS[sort]
+    page_size = args.get("page_size", DEFAULT_PAGE_SIZE, type=int)
+    page_size = max(1, min(page_size, INVENTORY_PAGE_SIZES[-1]))
+    return sort, order, page_size, args.get("after")
+
+
+def fetch_inventory_page(conn, user_id, sort="date_added", order="desc",
+                         page_size=DEFAULT_PAGE_SIZE, after=None):
+    """Return (items, next_cursor) for one page of a user's inventory"""
+    # sort/order are whitelisted by inventory_page_args, safe to interpolate
+    op = "<" if order == "desc" else ">"
+    query = "SELECT * FROM inventory WHERE user_id = ?"
+    params = [user_id]
+    if after:
+        value, item_id = decode_cursor(after)
+        query += f" AND ({sort}, id) {op} (?, ?)"
+        params += [value, item_id]
+    query += f" ORDER BY {sort} {order}, id {order} LIMIT ?"
+    params.append(page_size + 1)
+
+    items = conn.execute(query, params).fetchall()
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(last[sort], last["id"])
+    return items, next_cursor
+
+
 @app.route("/dashboard")
 @login_required
 def dashboard():
     if "user_id" not in session:
         return redirect(url_for("login"))
         
+    sort, order, page_size, _ = inventory_page_args(request.args)
     try:
         with get_db_connection() as conn:
-            videos = conn.execute(
-                "SELECT * FROM videos WHERE user_id = ?", 
+            items, next_cursor = fetch_inventory_page(
+                conn, session["user_id"], sort, order, page_size
+            )
+            youtube_videos = conn.execute(
+                "SELECT * FROM youtube_data WHERE user_id = ? ORDER BY date_added DESC",
                 (session["user_id"],)
             ).fetchall()
-            return render_template("dashboard.html", videos=videos)
+            return render_template(
+                "dashboard.html",
+                items=items,
+                next_cursor=next_cursor,
+                sort=sort,
+                order=order,
+                page_size=page_size,
+                page_sizes=INVENTORY_PAGE_SIZES,
+                sorts=INVENTORY_SORTS,
+                youtube_videos=youtube_videos,
+            )
     except Exception as e:
         flash(f"Error loading dashboard: {str(e)}")
         return redirect(url_for("login"))
 
 
+@app.route("/inventory")
+@login_required
+def inventory_page():
+    """One page of inventory: rows for htmx "load more", JSON otherwise"""
+    sort, order, page_size, after = inventory_page_args(request.args)
+    try:
+        with get_db_connection() as conn:
+            items, next_cursor = fetch_inventory_page(
+                conn, session["user_id"], sort, order, page_size, after
+            )
+    except (ValueError, TypeError):
+        return "Invalid cursor", 400
+
+    if request.headers.get("HX-Request"):
+        return render_template(
+            "partials/inventory_page.html",
+            items=items,
+            next_cursor=next_cursor,
+            sort=sort,
+            order=order,
+            page_size=page_size,
+        )
+    return jsonify({
+        "items": [dict(item) for item in items],
+        "next_cursor": next_cursor,
+    })
+
+
+@app.route("/inventory/export")
+@login_required
+def export_inventory():
+    """Stream the full inventory as it is read instead of buffering all rows"""
+    sort, order, _, _ = inventory_page_args(request.args)
+    user_id = session["user_id"]
+
+    def iter_items():
+        with get_db_connection() as conn:
+            cursor = conn.execute(
+                f"SELECT * FROM inventory WHERE user_id = ? ORDER BY {sort} {order}, id {order}",
+                (user_id,)
+            )
+            cursor.arraysize = 500
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield from rows
+
+    template = app.jinja_env.get_template("inventory_export.html")
+    return Response(stream_with_context(template.generate(
+        items=iter_items(), username=session.get("username")
+    )))
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
@@ -238,47 +362,48 @@ def upload_csv():
             return redirect(url_for("upload_csv"))
 
         if file and file.filename.endswith(".csv"):
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-            csv_data = csv.reader(stream)
-
-            conn = get_db_connection()
-            success_count = 0
-            error_count = 0
-
-            for row in csv_data:
-                try:
-                    name, quantity, category, sector, application, *_ = row
-                    conn.execute(
-                        """
-                        INSERT INTO inventory (name, quantity, category, sector, application, user_id)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                        (
-                            name.strip(),
-                            int(quantity),
-                            category.strip(),
-                            sector.strip(),
-                            application.strip(),
-                            session["user_id"],
-                        ),
-                    )
-                    success_count += 1
-                except Exception as e:
-                    error_count += 1
-                    continue
-
-            conn.commit()
-            conn.close()
+            with get_db_connection() as conn:
+                result = import_inventory_csv(
+                    conn,
+                    file.stream,
+                    session["user_id"],
+                    chunk_size=app.config["CSV_IMPORT_CHUNK_SIZE"],
+                )
 
             flash(
-                f"Successfully imported {success_count} items. {error_count} items failed."
+                f"Successfully imported {result['imported']} items. "
+                f"{result['failed']} items failed. "
+                f"({result['rows_per_second']:,.0f} rows/s, {result['seconds']:.2f}s)"
             )
+            if result["report_id"]:
+                return redirect(url_for("upload_csv", report=result["report_id"]))
             return redirect(url_for("dashboard"))
         else:
             flash("Please upload a CSV file")
             return redirect(url_for("upload_csv"))
 
-    return render_template("upload_csv.html")
+    return render_template("upload_csv.html", report_id=request.args.get("report"))
+
+
+@app.route("/upload_csv/report/<report_id>")
+@login_required
+def download_import_report(report_id):
+    if not re.fullmatch(r"[0-9a-f]{32}", report_id):
+        return "Report not found", 404
+    path = import_report_path(session["user_id"], report_id)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return "Report not found", 404
+    # Reports are one-shot: delete before sending so they don't pile up on disk
+    remove_import_report(path)
+    return send_file(
+        io.BytesIO(data),
+        mimetype="text/csv",
+        as_attachment=True,
+        download_name=f"import_errors_{report_id[:8]}.csv",
+    )
 
 
 @app.route("/update_quantity/<int:item_id>", methods=["PUT"])
@@ -350,121 +475,40 @@ def delete_item(item_id):
 @login_required
 def crawl_website():
     if request.method == "POST":
-        url = request.form["url"]
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            async def perform_crawl():
-                async with AsyncWebCrawler(
-                    verbose=True,
-                    timeout=30,
-                    wait_for_selector=".article-content",
-                    wait_time=2,
-                    browser_type="chromium",
-                    headless=True,
-                    javascript_enabled=True,
-                    ignore_https_errors=True,
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                    html2text={
-                        "escape_dot": False,
-                        "body_width": 0,
-                        "protect_links": True,
-                        "unicode_snob": True,
-                    },
-                ) as crawler:
-                    result = await crawler.arun(
-                        url=url,
-                        word_count_threshold=10,  # Minimum words per block
-                        exclude_external_links=True,  # Remove external links
-                        exclude_external_images=True,  # Remove external images
-                        excluded_tags=["form", "nav"],  # Remove specific HTML tags
-                        include_links_on_markdown=True,  # Include links in markdown
-                    )
-
-                    # Debug print of all available formats
-                    print("\n=== Crawl Results ===")
-                    print(f"URL: {result.url}")
-                    print(f"Status Code: {result.status_code}")
-
-                    print("\n=== Raw HTML (first 200 chars) ===")
-                    print(result.html[:200] if result.html else "No HTML content")
-
-                    print("\n=== Cleaned HTML (first 200 chars) ===")
-                    print(
-                        result.cleaned_html[:200]
-                        if hasattr(result, "cleaned_html")
-                        else "No cleaned HTML"
-                    )
-
-                    print("\n=== Standard Markdown (first 200 chars) ===")
-                    print(
-                        result.markdown[:200]
-                        if result.markdown
-                        else "No markdown content"
-                    )
-
-                    print(
-                        "\n=== Fit Markdown (most relevant content, first 200 chars) ==="
-                    )
-                    print(
-                        result.fit_markdown[:200]
-                        if hasattr(result, "fit_markdown")
-                        else "No fit markdown"
-                    )
-
-                    print("\nFirst 5 links:")
-                    print(list(result.links)[:5] if result.links else "No links found")
-
-                    print("\nHeaders:")
-                    print(
-                        dict(result.headers)
-                        if hasattr(result, "headers")
-                        else "No headers"
-                    )
-                    print("===================\n")
-
-                    return result
-
-            result = loop.run_until_complete(perform_crawl())
-            loop.close()
-
-            # Store all available formats
-            crawl_data = {
-                "url": url,
-                "html": result.html,  # Original HTML
-                "cleaned_html": (
-                    result.cleaned_html if hasattr(result, "cleaned_html") else None
-                ),  # Sanitized HTML
-                "markdown": result.markdown,  # Standard markdown
-                "fit_markdown": (
-                    result.fit_markdown if hasattr(result, "fit_markdown") else None
-                ),  # Most relevant content
-                "links": list(result.links) if result.links else [],
-                "status_code": (
-                    result.status_code if hasattr(result, "status_code") else None
-                ),
-                "headers": dict(result.headers) if hasattr(result, "headers") else {},
-                "timestamp": datetime.now().isoformat(),
-            }
+        url = request.form.get("url", "").strip()
+        refresh = bool(request.form.get("refresh"))
+        if url:
+            with get_db_connection() as conn:
+                job_id = enqueue_job(
+                    conn, session["user_id"], "crawl", {"url": url, "refresh": refresh}
+                )
+            flash("Crawl queued. This page updates when it finishes.")
+            return redirect(url_for("job_status", job_id=job_id))
+
+        # Batch mode: pasted list, uploaded file of URLs and/or a sitemap
+        text = request.form.get("urls", "")
+        url_file = request.files.get("url_file")
+        if url_file and url_file.filename:
+            text += "\n" + url_file.stream.read().decode("utf-8", errors="ignore")
+        urls = parse_url_list(text)
+        sitemap_url = request.form.get("sitemap_url", "").strip()
+        if not urls and not sitemap_url:
+            flash("Please provide a URL, a list of URLs or a sitemap")
+            return redirect(url_for("crawl_website"))
+        if len(urls) > MAX_BATCH_URLS:
+            flash(f"Only the first {MAX_BATCH_URLS} URLs will be crawled")
+            urls = urls[:MAX_BATCH_URLS]
 
-            conn = get_db_connection()
-            conn.execute(
-                """
-                INSERT INTO crawled_data (user_id, url, crawl_data, status)
-                VALUES (?, ?, ?, ?)
-            """,
-                (session["user_id"], url, json.dumps(crawl_data), "completed"),
+        with get_db_connection() as conn:
+            enqueue_job(
+                conn,
+                session["user_id"],
+                "batch_crawl",
+                {"urls": urls, "sitemap_url": sitemap_url or None, "refresh": refresh},
+                max_attempts=1,
             )
-            conn.commit()
-            conn.close()
-
-            flash("Website crawled successfully!")
-            return redirect(url_for("crawl_history"))
-        except Exception as e:
-            print(f"\nError during crawl: {str(e)}\n")
-            flash(f"Error crawling website: {str(e)}")
-            return redirect(url_for("crawl_website"))
+        flash("Batch crawl queued. Progress is shown below.")
+        return redirect(url_for("crawl_history"))
 
     return render_template("crawl.html")
 
@@ -477,14 +521,22 @@ def crawl_history():
     try:
         with get_db_connection() as conn:
             # Fetch crawl history for the user
-            history = conn.execute(
-                "SELECT * FROM videos WHERE user_id = ? ORDER BY created_at DESC", 
+            crawls = conn.execute(
+                "SELECT * FROM crawled_data WHERE user_id = ? ORDER BY crawl_date DESC",
+                (session["user_id"],)
+            ).fetchall()
+            active_jobs = conn.execute(
+                """SELECT * FROM jobs
+                   WHERE user_id = ? AND kind IN ('crawl', 'batch_crawl')
+                   AND status IN ('queued', 'running')
+                   ORDER BY id""",
                 (session["user_id"],)
             ).fetchall()
             
             return render_template(
                 "crawl_history.html", 
-                history=history
+                crawls=crawls,
+                active_jobs=active_jobs
             )
     except Exception as e:
         flash(f"Error loading crawl history: {str(e)}")
@@ -502,86 +554,39 @@ def crawl_details(crawl_id):
     """,
         (crawl_id, session["user_id"]),
     ).fetchone()
-    conn.close()
 
     if crawl is None:
         flash("Crawl not found")
         return redirect(url_for("crawl_history"))
 
-    return render_template("crawl_details.html", crawl=crawl)
+    # Only metadata is read here; each content tab is fetched on demand
+    formats = available_formats(conn, crawl_id)
+    return render_template(
+        "crawl_details.html",
+        crawl=crawl,
+        formats=[fmt for fmt in DETAIL_TABS if fmt in formats],
+        has_links="links" in formats,
+    )
 
 
-def extract_youtube_data(url):
-    try:
-        # First get the channel URL from the video
-        with YoutubeDL({'quiet': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
-            channel_url = info.get('channel_url') or info.get('uploader_url')
-            
-            if not channel_url:
-                # If no channel URL found, just return the single video
-                return [{
-                    'video_id': info.get('id'),
-                    'title': info.get('title'),
-                    'url': info.get('webpage_url') or f'https://youtube.com/watch?v={info.get("id")}',
-                    'thumbnail_url': info.get('thumbnail'),
-                    'channel_name': info.get('uploader')
-                }]
-
-        # Now fetch all videos from the channel
-        ydl_opts = {
-            'quiet': True,
-            'extract_flat': True,
-            'force_generic_extractor': False,
-            'ignoreerrors': True,
-            'extract_flat_playlist': True,
-            'playlistend': 50  # Limit to latest 50 videos
-        }
-        
-        with YoutubeDL(ydl_opts) as ydl:
-            print(f"Fetching videos from channel: {channel_url}")
-            channel_info = ydl.extract_info(channel_url, download=False)
-            
-            if not channel_info:
-                print("No channel information found")
-                return None
-
-            videos = []
-            if 'entries' in channel_info:
-                for entry in channel_info['entries']:
-                    if entry and all(key in entry for key in ['id', 'title']):
-                        # Get best thumbnail
-                        thumbnail_url = entry.get('thumbnail')
-                        if isinstance(entry.get('thumbnails'), list):
-                            thumbnails = sorted(
-                                entry['thumbnails'], 
-                                key=lambda x: x.get('height', 0) * x.get('width', 0),
-                                reverse=True
-                            )
-                            if thumbnails:
-                                thumbnail_url = thumbnails[0].get('url')
-
-                        video = {
-                            'video_id': entry.get('id'),
-                            'title': entry.get('title'),
-                            'url': entry.get('webpage_url') or f'https://youtube.com/watch?v={entry.get("id")}',
-                            'thumbnail_url': thumbnail_url,
-                            'channel_name': entry.get('uploader') or channel_info.get('uploader')
-                        }
-                        
-                        # Only add if all required fields are present
-                        if all(video.values()):
-                            videos.append(video)
-                
-                print(f"Found {len(videos)} videos in channel")
-                return videos
-            else:
-                print("No entries found in channel info")
-                return None
+@app.route("/crawl-details/<int:crawl_id>/<fmt>")
+@login_required
+def crawl_payload(crawl_id, fmt):
+    if fmt not in PAYLOAD_FORMATS:
+        return "Unknown format", 404
+    conn = get_db_connection()
+    owned = conn.execute(
+        "SELECT 1 FROM crawled_data WHERE id = ? AND user_id = ?",
+        (crawl_id, session["user_id"]),
+    ).fetchone()
+    if owned is None:
+        return "Crawl not found", 404
 
-    except Exception as e:
-        print(f"Error in extract_youtube_data: {str(e)}")
-        return None
+    return render_template(
+        "partials/crawl_payload.html",
+        fmt=fmt,
+        content=load_payload(conn, crawl_id, fmt),
+    )
 
 
 @app.route('/add_youtube', methods=['POST'])
@@ -592,57 +597,10 @@ def add_youtube():
         flash('Please provide a YouTube URL')
         return redirect(url_for('dashboard'))
     
-    try:
-        print(f"Processing URL: {url}")
-        videos = extract_youtube_data(url)
-        
-        if videos:
-            conn = get_db_connection()
-            added_count = 0
-            skipped_count = 0
-            
-            for video in videos:
-                # Check if video already exists
-                existing = conn.execute(
-                    'SELECT id FROM youtube_data WHERE video_id = ? AND user_id = ?',
-                    (video['video_id'], session['user_id'])
-                ).fetchone()
-                
-                if not existing:
-                    try:
-                        conn.execute('''
-                            INSERT INTO youtube_data 
-                            (user_id, video_id, title, url, thumbnail_url, channel_name)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
-                            session['user_id'],
-                            video['video_id'],
-                            video['title'],
-                            video['url'],
-                            video['thumbnail_url'],
-                            video['channel_name']
-                        ))
-                        added_count += 1
-                    except Exception as e:
-                        print(f"Error inserting video {video['video_id']}: {str(e)}")
-                        continue
-                else:
-                    skipped_count += 1
-            
-            conn.commit()
-            conn.close()
-            
-            if added_count > 0:
-                flash(f'Successfully added {added_count} new videos! ({skipped_count} already existed)')
-            else:
-                flash(f'No new videos were added. {skipped_count} videos already existed in your collection.')
-        else:
-            flash('No videos found or invalid URL')
-    except Exception as e:
-        print(f"Error in add_youtube: {str(e)}")
-        flash(f'Error processing YouTube URL: {str(e)}')
-    
-    return redirect(url_for('dashboard'))
+    with get_db_connection() as conn:
+        job_id = enqueue_job(conn, session['user_id'], 'youtube_import', {'url': url})
+    flash('YouTube import queued. This page updates when it finishes.')
+    return redirect(url_for('job_status', job_id=job_id))
 
 
 @app.route("/upload", methods=["GET", "POST"])
@@ -657,16 +615,13 @@ def upload():
                 flash("Please provide a video URL")
                 return redirect(url_for("upload"))
 
-            # Your existing video processing logic here...
-            
             with get_db_connection() as conn:
-                conn.execute(
-                    "INSERT INTO videos (url, user_id, title, transcript) VALUES (?, ?, ?, ?)",
-                    (video_url, session["user_id"], title, transcript)
+                job_id = enqueue_job(
+                    conn, session["user_id"], "transcribe", {"url": video_url}
                 )
                 
-            flash("Video uploaded successfully!")
-            return redirect(url_for("dashboard"))
+            flash("Video queued for transcription.")
+            return redirect(url_for("job_status", job_id=job_id))
             
         except Exception as e:
             flash(f"Upload error: {str(e)}")
@@ -697,6 +652,28 @@ def video_detail(video_id):
         return redirect(url_for("dashboard"))
 
 
+@app.route("/video/<int:video_id>/transcript.<fmt>")
+@login_required
+def video_transcript(video_id, fmt):
+    if fmt not in TRANSCRIPT_FORMATS:
+        return "Unknown transcript format", 404
+    with get_db_connection() as conn:
+        video = conn.execute(
+            "SELECT title, transcript_key FROM videos WHERE id = ? AND user_id = ?",
+            (video_id, session["user_id"]),
+        ).fetchone()
+    if video is None or not video["transcript_key"]:
+        return "Transcript not found", 404
+    path = get_transcript_cache().paths(video["transcript_key"])[TRANSCRIPT_FORMATS[fmt]]
+    if not os.path.exists(path):
+        return "Transcript not found", 404
+    return send_file(
+        os.path.abspath(path),
+        as_attachment=True,
+        download_name=f"video_{video_id}.{fmt}",
+    )
+
+
 @app.route("/delete/<int:video_id>", methods=["POST"])
 def delete_video(video_id):
     if "user_id" not in session:
@@ -720,24 +697,41 @@ def delete_video(video_id):
 def search():
     if "user_id" not in session:
         return redirect(url_for("login"))
-        
-    if request.method == "POST":
-        query = request.form.get("query", "")
+
+    query = request.values.get("query", "").strip()
+    kind = request.values.get("kind", "")
+    page = request.values.get("page", 1, type=int)
+    results, has_more = [], False
+    if query:
         try:
-            with get_db_connection() as conn:
-                videos = conn.execute(
-                    """SELECT * FROM videos 
-                       WHERE user_id = ? AND 
-                       (title LIKE ? OR transcript LIKE ?)""",
-                    (session["user_id"], f"%{query}%", f"%{query}%")
-                ).fetchall()
-                
-            return render_template("search_results.html", videos=videos, query=query)
+            conn = get_db_connection()
+            results, has_more = search_index(
+                conn, session["user_id"], query, kind=kind, page=page
+            )
+            # Imported YouTube videos link out, so fetch their URLs
+            youtube_ids = [r["ref_id"] for r in results if r["kind"] == "youtube"]
+            if youtube_ids:
+                placeholders = ", ".join("?" for _ in youtube_ids)
+                urls = dict(conn.execute(
+                    f"SELECT id, url FROM youtube_data WHERE id IN ({placeholders})",
+                    youtube_ids,
+                ).fetchall())
+                for result in results:
+                    if result["kind"] == "youtube":
+                        result["url"] = urls.get(result["ref_id"])
         except Exception as e:
             flash(f"Search error: {str(e)}")
             return redirect(url_for("dashboard"))
-            
-    return render_template("search.html")
+
+    return render_template(
+        "search.html",
+        query=query,
+        kind=kind,
+        kinds=SEARCH_KINDS,
+        page=page,
+        results=results,
+        has_more=has_more,
+    )
 
 
 @app.route("/profile")
@@ -763,6 +757,7 @@ def profile():
 
 
 @app.route('/upload_csv_file', methods=['POST'])
+@login_required
 def upload_csv_file():
     if 'file' not in request.files:
         return 'No file uploaded', 400
@@ -773,19 +768,14 @@ def upload_csv_file():
 
     try:
         with get_db_connection() as conn:
-            csv_file = TextIOWrapper(file.stream, encoding='utf-8')
-            csv_reader = csv.reader(csv_file)
-            next(csv_reader)  # Skip header row
-            
-            for row in csv_reader:
-                conn.execute(
-                    "INSERT INTO inventory (item_name, quantity, price) VALUES (?, ?, ?)",
-                    (row[0], row[1], row[2])
-                )
-            
-        return 'File uploaded successfully', 200
+            result = import_inventory_csv(
+                conn,
+                file.stream,
+                session['user_id'],
+                chunk_size=app.config['CSV_IMPORT_CHUNK_SIZE'],
+            )
+        return jsonify(result), 200
     except Exception as e:
-        flash(f"Error uploading CSV: {str(e)}")
         return f'Error uploading file: {str(e)}', 500
 
 
@@ -808,7 +798,26 @@ def upload_csv_data():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route("/jobs/<int:job_id>")
+@login_required
+def job_status(job_id):
+    """Job progress page; htmx polls it for the status partial"""
+    with get_db_connection() as conn:
+        job = get_job(conn, job_id, session["user_id"])
+    if job is None:
+        flash("Job not found")
+        return redirect(url_for("dashboard"))
+
+    result = json.loads(job["result"]) if job["result"] else {}
+    template = "partials/job_status.html" if request.headers.get("HX-Request") else "job.html"
+    return render_template(template, job=job, result=result)
+
+
+@app.route("/db_stats")
+@login_required
+def db_stats():
+    return jsonify(db_pool.stats())
+
+
 if __name__ == "__main__":
-    from database import init_db
-    init_db()  # Initialize database tables
     app.run(debug=True)
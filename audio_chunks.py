@@ -0,0 +1,179 @@
+"""Split long audio at silences and stitch chunk transcriptions back together.
+
+Chunks are cut at the silence closest to ``target`` seconds (never longer
+than ``max_length``) and each chunk after the first starts ``overlap``
+seconds early, so words cut at a boundary are heard whole by one side.
+When stitching, timestamps are shifted by the chunk's start and anything
+the next chunk says before the previous chunk's cut point is dropped.
+
+``load_pcm`` decodes a file or stream URL straight to the 16 kHz mono
+float32 samples Whisper works on, through a pipe and without temp files.
+"""
+import re
+
+import ffmpeg
+import numpy as np
+
+SILENCE_DB = -35
+MIN_SILENCE = 0.4  # seconds
+CHUNK_TARGET = 600  # seconds
+CHUNK_MAX = 900
+OVERLAP = 2.0
+SAMPLE_RATE = 16000  # what Whisper resamples everything to
+
+_SILENCE = re.compile(r'silence_(start|end): (-?[\d.]+)')
+
+
+def probe_duration(path):
+    return float(ffmpeg.probe(path)['format']['duration'])
+
+
+def load_pcm(source, headers=None, sample_rate=SAMPLE_RATE):
+    """Decode ``source`` (a path or URL) to mono float32 samples in [-1, 1).
+
+    ``headers`` are sent with HTTP requests, as yt-dlp's ``http_headers``
+    for a stream URL.
+    """
+    input_args = {}
+    if headers:
+        input_args['headers'] = ''.join(f'{key}: {value}\r\n' for key, value in headers.items())
+    raw, _ = (
+        ffmpeg.input(source, **input_args)
+        .output('-', format='s16le', acodec='pcm_s16le', ac=1, ar=sample_rate)
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+
+
+def detect_silences(path, noise_db=SILENCE_DB, min_silence=MIN_SILENCE):
+    """Return [(start, end)] of silent stretches using ffmpeg's silencedetect"""
+    _, stderr = (
+        ffmpeg.input(path)
+        .filter('silencedetect', noise=f'{noise_db}dB', d=min_silence)
+        .output('-', format='null')
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    silences = []
+    start = None
+    for kind, value in _SILENCE.findall(stderr.decode('utf-8', errors='ignore')):
+        if kind == 'start':
+            start = float(value)
+        elif start is not None:
+            silences.append((max(start, 0.0), float(value)))
+            start = None
+    return silences
+
+
+def plan_chunks(duration, silences, target=CHUNK_TARGET, max_length=CHUNK_MAX):
+    """Return the cut points [0, c1, ..., duration] for chunks of about
+    ``target`` seconds, each cut in the middle of a silence when one falls
+    between half the target and ``max_length``"""
+    cuts = [0.0]
+    midpoints = [(start + end) / 2 for start, end in silences]
+    while duration - cuts[-1] > max_length:
+        begin = cuts[-1]
+        candidates = [m for m in midpoints if begin + target / 2 <= m <= begin + max_length]
+        if candidates:
+            cut = min(candidates, key=lambda m: abs(m - (begin + target)))
+        else:
+            cut = begin + target
+        cuts.append(cut)
+    cuts.append(duration)
+    return cuts
+
+
+def chunk_windows(cuts, overlap=OVERLAP):
+    """(start, end, cut) per chunk: the audio window to extract and the cut
+    point before which its words belong to the previous chunk"""
+    return [
+        (max(0.0, cuts[i] - overlap) if i else 0.0, cuts[i + 1], cuts[i])
+        for i in range(len(cuts) - 1)
+    ]
+
+
+def extract_chunk(path, start, end, out_path):
+    """Write [start, end) of ``path`` as 16 kHz mono audio.
+
+    An ``.mp3`` path gets a 48 kbps encode, small enough for the API's
+    upload limit at any sensible chunk length; anything else is written as
+    16-bit PCM WAV, which Whisper reads without a second lossy encode.
+    """
+    if out_path.endswith('.mp3'):
+        codec = {'audio_bitrate': '48k'}
+    else:
+        codec = {'acodec': 'pcm_s16le', 'format': 'wav'}
+    (
+        ffmpeg.input(path, ss=start, t=end - start)
+        .output(out_path, ac=1, ar=SAMPLE_RATE, vn=None, **codec)
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    return out_path
+
+
+def _shift(item, offset):
+    item = dict(item)
+    item['start'] = item['start'] + offset
+    item['end'] = item['end'] + offset
+    return item
+
+
+def _same_word(a, b):
+    clean = lambda word: re.sub(r'\W', '', word['word']).lower()
+    return clean(a) == clean(b) and abs(a['start'] - b['start']) < 0.5
+
+
+def _segments_with_words(result):
+    """Segments with their words attached; the API returns words in a
+    separate top-level list rather than per segment"""
+    segments = result.get('segments') or []
+    words = result.get('words') or []
+    if not words or any(segment.get('words') for segment in segments):
+        return segments
+    attached = []
+    for segment in segments:
+        segment = dict(segment)
+        segment['words'] = [
+            dict(word, word=word['word'] if word['word'].startswith(' ') else ' ' + word['word'])
+            for word in words if segment['start'] <= word['start'] < segment['end']
+        ]
+        attached.append(segment)
+    return attached
+
+
+def stitch(chunk_results, windows):
+    """Merge per-chunk transcriptions into one Whisper-style result.
+
+    ``chunk_results`` are dicts with ``segments`` (and optionally ``words``
+    on segments, as with word_timestamps=True). Segments and words are
+    shifted by their chunk's start; content before a chunk's cut point is
+    dropped because the previous chunk already covered it, and a boundary
+    word repeated by both chunks is kept once.
+    """
+    segments = []
+    last_word = None
+    language = None
+    for result, (start, _end, cut) in zip(chunk_results, windows):
+        language = language or result.get('language')
+        for segment in _segments_with_words(result):
+            segment = _shift(segment, start)
+            words = [_shift(word, start) for word in segment.get('words') or []]
+            if words:
+                words = [word for word in words if word['start'] >= cut]
+                if words and last_word and _same_word(words[0], last_word):
+                    words = words[1:]
+                if not words:
+                    continue
+                segment['words'] = words
+                segment['start'] = max(segment['start'], words[0]['start'])
+                segment['text'] = ''.join(word['word'] for word in words)
+                last_word = words[-1]
+            elif (segment['start'] + segment['end']) / 2 < cut:
+                continue
+            segment['id'] = len(segments)
+            segments.append(segment)
+    return {
+        'text': ''.join(segment['text'] for segment in segments).strip(),
+        'segments': segments,
+        'language': language,
+    }
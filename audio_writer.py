@@ -0,0 +1,67 @@
+"""Stream synthesized chunks into a single audio file.
+
+``ChunkWriter`` keeps one ``soundfile.SoundFile`` open and appends each chunk
+as it is generated, optionally separated by silence, so only the current
+chunk is held in memory and a long document yields one file instead of one
+per chunk. Each ``write`` returns where the chunk landed, in samples and
+seconds, for the caller's metadata.
+"""
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+# Extension -> (soundfile format, subtype). Opus only supports 8, 12, 16,
+# 24 and 48 kHz and needs libsndfile >= 1.0.29.
+FORMATS = {
+    'wav': ('WAV', 'PCM_16'),
+    'flac': ('FLAC', 'PCM_16'),
+    'ogg': ('OGG', 'VORBIS'),
+    'opus': ('OGG', 'OPUS'),
+}
+
+
+class ChunkWriter:
+    def __init__(self, path, sample_rate, audio_format='wav', silence=0.0):
+        if audio_format not in FORMATS:
+            raise ValueError(f"Unsupported audio format: {audio_format}")
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.gap = np.zeros(int(round(silence * sample_rate)), dtype=np.float32)
+        self.samples_written = 0
+        self.chunks = 0
+        file_format, subtype = FORMATS[audio_format]
+        self._file = sf.SoundFile(
+            str(self.path), mode='w', samplerate=sample_rate, channels=1,
+            format=file_format, subtype=subtype,
+        )
+
+    def write(self, samples):
+        """Append one chunk (after the silence gap) and return its placement"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if self.chunks and len(self.gap):
+            self._write(self.gap)
+        start = self.samples_written
+        self._write(samples)
+        self.chunks += 1
+        return {
+            'audio_path': str(self.path),
+            'start_sample': start,
+            'end_sample': self.samples_written,
+            'offset': round(start / self.sample_rate, 3),
+            'duration': round(len(samples) / self.sample_rate, 3),
+        }
+
+    def _write(self, samples):
+        self._file.write(samples)
+        self.samples_written += len(samples)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,183 @@
+"""Conditional re-crawl cache.
+
+``crawl_cache`` remembers, per user and normalized URL, the last successful crawl, the
+validators the server sent (ETag / Last-Modified) and a hash of the page. A
+re-crawl within ``CRAWL_CACHE_TTL`` seconds, or one the server answers with
+``304 Not Modified``, skips the browser entirely: the new history entry
+points at the cached crawl's payload blobs instead of storing another copy.
+The same happens when a real re-crawl renders a page whose hash matches the
+cached copy. Blobs themselves are content-addressed, so they are shared
+across users.
+"""
+import hashlib
+import json
+import os
+import urllib.error
+import urllib.request
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from crawl_store import load_payload
+from search import index_crawl
+
+CRAWL_CACHE_TTL = int(os.getenv("CRAWL_CACHE_TTL", 3600))  # seconds
+CHECK_TIMEOUT = 10
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """Canonical cache key: lowercase scheme/host, no default port or
+    fragment, sorted query parameters and a non-empty path"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def _header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def content_hash(crawl_data):
+    """SHA-256 of the page HTML (falling back to markdown)"""
+    body = crawl_data.get("html") or crawl_data.get("markdown") or ""
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def lookup(conn, user_id, url):
+    """Cached entry for ``url`` as a dict, or None"""
+    cursor = conn.execute(
+        """
+        SELECT c.*, c.checked_at > datetime('now', ?) AS fresh
+        FROM crawl_cache c
+        WHERE c.user_id = ? AND c.url_key = ?
+          AND EXISTS (SELECT 1 FROM crawl_payloads p WHERE p.crawl_id = c.crawl_id)
+        """,
+        (f"-{CRAWL_CACHE_TTL} seconds", user_id, normalize_url(url)),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+def is_fresh(entry):
+    return bool(entry and entry["fresh"])
+
+
+def not_modified(entry, timeout=CHECK_TIMEOUT):
+    """Ask the server whether the cached copy is still current.
+
+    Sends a conditional GET with the stored validators and returns True only
+    on ``304 Not Modified``; any other answer (or error) means re-crawl.
+    """
+    if not entry or not (entry["etag"] or entry["last_modified"]):
+        return False
+    request = urllib.request.Request(entry["url"], headers={"User-Agent": USER_AGENT})
+    if entry["etag"]:
+        request.add_header("If-None-Match", entry["etag"])
+    if entry["last_modified"]:
+        request.add_header("If-Modified-Since", entry["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status == 304
+    except urllib.error.HTTPError as e:
+        return e.code == 304
+    except Exception as e:
+        print(f"Conditional check failed for {entry['url']}: {str(e)}")
+        return False
+
+
+def _cacheable(crawl_data):
+    status_code = crawl_data.get("status_code")
+    return status_code is None or 200 <= status_code < 300
+
+
+def unchanged(conn, user_id, url, crawl_data):
+    """The cached entry for ``url`` if ``crawl_data`` has the same content, else None"""
+    if not _cacheable(crawl_data):
+        return None
+    entry = lookup(conn, user_id, url)
+    if entry is None or entry["content_hash"] != content_hash(crawl_data):
+        return None
+    return entry
+
+
+def record(conn, user_id, url, crawl_id, crawl_data):
+    """Remember a successful crawl as the cached copy of its URL"""
+    if not _cacheable(crawl_data):
+        return
+    status_code = crawl_data.get("status_code")
+    headers = crawl_data.get("headers") or {}
+    conn.execute(
+        """
+        INSERT INTO crawl_cache
+            (user_id, url_key, url, crawl_id, status_code, etag, last_modified, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, url_key) DO UPDATE SET
+            url = excluded.url, crawl_id = excluded.crawl_id,
+            status_code = excluded.status_code, etag = excluded.etag,
+            last_modified = excluded.last_modified,
+            content_hash = excluded.content_hash,
+            fetched_at = CURRENT_TIMESTAMP, checked_at = CURRENT_TIMESTAMP
+        """,
+        (
+            user_id, normalize_url(url), url, crawl_id, status_code,
+            _header(headers, "etag"), _header(headers, "last-modified"),
+            content_hash(crawl_data),
+        ),
+    )
+
+
+def reuse(conn, user_id, url, entry, reason):
+    """Add a history entry for ``url`` backed by the cached crawl's payloads"""
+    source = conn.execute(
+        "SELECT crawl_data, status_code, link_count FROM crawled_data WHERE id = ?",
+        (entry["crawl_id"],),
+    ).fetchone()
+    metadata = json.loads(source[0])
+    metadata.update(url=url, cached=reason, timestamp=datetime.now().isoformat())
+    cursor = conn.execute(
+        """
+        INSERT INTO crawled_data
+            (user_id, url, crawl_data, status, status_code, link_count, source_crawl_id)
+        VALUES (?, ?, ?, 'completed', ?, ?, ?)
+        """,
+        (user_id, url, json.dumps(metadata), source[1], source[2], entry["crawl_id"]),
+    )
+    conn.execute(
+        """
+        INSERT INTO crawl_payloads (crawl_id, format, blob_hash)
+        SELECT ?, format, blob_hash FROM crawl_payloads WHERE crawl_id = ?
+        """,
+        (cursor.lastrowid, entry["crawl_id"]),
+    )
+    index_crawl(conn, cursor.lastrowid, user_id, url,
+                load_payload(conn, cursor.lastrowid, "markdown"))
+    if reason == "not_modified":
+        conn.execute(
+            "UPDATE crawl_cache SET checked_at = CURRENT_TIMESTAMP "
+            "WHERE user_id = ? AND url_key = ?",
+            (user_id, entry["url_key"]),
+        )
+    return cursor.lastrowid
+
+
+def cached_crawl(conn, user_id, url):
+    """Reuse the cached crawl of ``url`` if it is fresh or unchanged upstream;
+    returns the new history entry's id, or None when a real crawl is needed"""
+    entry = lookup(conn, user_id, url)
+    if entry is None:
+        return None
+    if is_fresh(entry):
+        return reuse(conn, user_id, url, entry, "ttl")
+    if not_modified(entry):
+        return reuse(conn, user_id, url, entry, "not_modified")
+    return None
@@ -0,0 +1,190 @@
+"""Compressed, content-addressed storage for crawl payloads.
+
+Each crawl format (raw HTML, cleaned HTML, markdown, fit markdown, links) is
+compressed and stored once in ``crawl_blobs`` keyed by its SHA-256, and
+``crawl_payloads`` maps (crawl_id, format) to a blob. ``crawled_data`` keeps
+only small metadata, so listing and detail pages never parse the page bodies.
+"""
+import hashlib
+import json
+import zlib
+
+from search import index_crawls
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available
+    zstandard = None
+
+PAYLOAD_FORMATS = ('markdown', 'fit_markdown', 'cleaned_html', 'html', 'links')
+DETAIL_TABS = ('markdown', 'fit_markdown', 'cleaned_html')
+DEFAULT_CODEC = 'zstd' if zstandard is not None else 'zlib'
+LOOKUP_CHUNK = 500  # stays well under SQLite's bound-parameter limit
+MIGRATION_BATCH = 200  # legacy crawls held in memory at once while migrating
+
+
+def compress(raw, codec=DEFAULT_CODEC):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return zlib.compress(raw, 6)
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this crawl payload")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def encode_payload(fmt, value):
+    if fmt == 'links':
+        return json.dumps(list(value or []), ensure_ascii=False).encode('utf-8')
+    return (value or '').encode('utf-8')
+
+
+def decode_payload(fmt, raw):
+    text = raw.decode('utf-8')
+    return json.loads(text) if fmt == 'links' else text
+
+
+def split_crawl_data(crawl_data):
+    """Split a crawl dict into (metadata, {format: value}) for storage"""
+    metadata = {
+        key: value for key, value in crawl_data.items() if key not in PAYLOAD_FORMATS
+    }
+    metadata['link_count'] = len(crawl_data.get('links') or [])
+    payloads = {
+        fmt: crawl_data[fmt] for fmt in PAYLOAD_FORMATS if crawl_data.get(fmt)
+    }
+    return metadata, payloads
+
+
+def store_payloads(conn, crawl_id, payloads):
+    """Write a crawl's formats, reusing blobs already stored for identical content"""
+    store_payloads_many(conn, [(crawl_id, payloads)])
+
+
+def store_payloads_many(conn, crawls):
+    """Write the formats of many (crawl_id, payloads) with one executemany
+    per table, compressing each distinct blob once"""
+    blobs = {}
+    mappings = []
+    for crawl_id, payloads in crawls:
+        for fmt, value in payloads.items():
+            raw = encode_payload(fmt, value)
+            digest = hashlib.sha256(raw).hexdigest()
+            if digest not in blobs:
+                blobs[digest] = raw
+            mappings.append((crawl_id, fmt, digest))
+
+    # Only compress blobs we don't have yet
+    digests = list(blobs)
+    existing = set()
+    for start in range(0, len(digests), LOOKUP_CHUNK):
+        chunk = digests[start:start + LOOKUP_CHUNK]
+        placeholders = ', '.join('?' for _ in chunk)
+        existing.update(row[0] for row in conn.execute(
+            f'SELECT hash FROM crawl_blobs WHERE hash IN ({placeholders})', chunk
+        ))
+    conn.executemany(
+        'INSERT OR IGNORE INTO crawl_blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)',
+        [
+            (digest, DEFAULT_CODEC, len(raw), compress(raw))
+            for digest, raw in blobs.items() if digest not in existing
+        ],
+    )
+    conn.executemany(
+        'INSERT OR REPLACE INTO crawl_payloads (crawl_id, format, blob_hash) VALUES (?, ?, ?)',
+        mappings,
+    )
+
+
+def save_crawl_record(conn, user_id, url, crawl_data, status='completed'):
+    """Insert a crawled_data row plus its compressed payloads; returns the id"""
+    return save_crawl_records(conn, user_id, [(url, crawl_data, status)])[0]
+
+
+def save_crawl_records(conn, user_id, crawls):
+    """Insert (url, crawl_data, status) crawls with their payloads in batched
+    statements; returns the new ids in order. The caller commits."""
+    if not crawls:
+        return []
+    rows = [(url, status) + split_crawl_data(crawl_data) for url, crawl_data, status in crawls]
+    conn.executemany(
+        '''
+        INSERT INTO crawled_data (user_id, url, crawl_data, status, status_code, link_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+        [
+            (user_id, url, json.dumps(metadata), status,
+             metadata.get('status_code'), metadata['link_count'])
+            for url, status, metadata, _ in rows
+        ],
+    )
+    # One statement inside the caller's write transaction allocates
+    # consecutive ids, ending at the last inserted row
+    last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    ids = list(range(last_id - len(rows) + 1, last_id + 1))
+    store_payloads_many(conn, [(crawl_id, row[3]) for crawl_id, row in zip(ids, rows)])
+    index_crawls(conn, user_id, [
+        (crawl_id, url, payloads.get('markdown'))
+        for crawl_id, (url, status, _, payloads) in zip(ids, rows) if status == 'completed'
+    ])
+    return ids
+
+
+def available_formats(conn, crawl_id):
+    return [
+        row[0] for row in conn.execute(
+            'SELECT format FROM crawl_payloads WHERE crawl_id = ?', (crawl_id,)
+        )
+    ]
+
+
+def load_payload(conn, crawl_id, fmt):
+    """Decompress and decode one format of a crawl, or None if it wasn't stored"""
+    row = conn.execute(
+        '''
+        SELECT b.codec, b.data FROM crawl_payloads p
+        JOIN crawl_blobs b ON b.hash = p.blob_hash
+        WHERE p.crawl_id = ? AND p.format = ?
+    ''',
+        (crawl_id, fmt),
+    ).fetchone()
+    if row is None:
+        return None
+    return decode_payload(fmt, decompress(row[1], row[0]))
+
+
+def migrate_legacy_crawls(conn, batch_size=None):
+    """Migration step: move JSON blobs in crawled_data into split storage.
+
+    Rows are read in id order ``batch_size`` at a time, so only one batch of
+    page bodies is in memory however many legacy crawls there are. The
+    space they free is returned to the filesystem by the VACUUM that
+    ``database.migrate`` runs after committing.
+    """
+    batch_size = batch_size or MIGRATION_BATCH
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, crawl_data FROM crawled_data WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        for crawl_id, raw in rows:
+            try:
+                crawl_data = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(crawl_data, dict):
+                continue
+            metadata, payloads = split_crawl_data(crawl_data)
+            conn.execute(
+                'UPDATE crawled_data SET crawl_data = ?, status_code = ?, link_count = ? WHERE id = ?',
+                (json.dumps(metadata), metadata.get('status_code'), metadata['link_count'], crawl_id),
+            )
+            store_payloads(conn, crawl_id, payloads)
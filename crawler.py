@@ -0,0 +1,428 @@
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+import urllib.request
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from urllib.parse import urlparse
+
+import crawl_cache
+from crawl_store import save_crawl_records
+
+# crawl4ai takes about a second to import, so the web app (which only
+# enqueues crawls) never pays for it; the first crawl imports it.
+AsyncWebCrawler = None
+
+try:
+    import psutil
+except ImportError:  # memory-based recycling is skipped without psutil
+    psutil = None
+
+CRAWLER_OPTIONS = dict(
+    verbose=True,
+    timeout=30,
+    wait_for_selector=".article-content",
+    wait_time=2,
+    browser_type="chromium",
+    headless=True,
+    javascript_enabled=True,
+    ignore_https_errors=True,
+    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    html2text={
+        "escape_dot": False,
+        "body_width": 0,
+        "protect_links": True,
+        "unicode_snob": True,
+    },
+)
+# Longest a single-page crawl may take, including waiting for a browser,
+# before the caller gives up and the crawl is cancelled
+CRAWL_TIMEOUT = CRAWLER_OPTIONS["timeout"] + 60
+
+RUN_OPTIONS = dict(
+    word_count_threshold=10,  # Minimum words per block
+    exclude_external_links=True,  # Remove external links
+    exclude_external_images=True,  # Remove external images
+    excluded_tags=["form", "nav"],  # Remove specific HTML tags
+    include_links_on_markdown=True,  # Include links in markdown
+)
+
+
+class _Slot:
+    """One warm AsyncWebCrawler (browser) and how much it has been used"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.pages = 0
+        self.started = time.monotonic()
+
+
+class CrawlerService:
+    """Bounded pool of warm crawlers driven by a dedicated event loop thread.
+
+    Browsers are started lazily up to ``size``, reused across crawls and
+    recycled after ``max_pages`` pages or when the process tree (including
+    Chromium children) exceeds ``max_rss_mb``.
+    """
+
+    def __init__(self, size=2, max_pages=100, max_rss_mb=2048):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._pid = os.getpid()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="crawler-loop", daemon=True
+        )
+        self._thread.start()
+        self._idle = []
+        self._started = 0
+        self._available = None  # asyncio.Semaphore, created on the loop
+        self._stats = {
+            "crawls": 0,
+            "errors": 0,
+            "browsers_started": 0,
+            "browsers_recycled": 0,
+            "crawl_time": 0.0,
+            "wait_time": 0.0,
+        }
+
+    def submit(self, coro):
+        """Schedule a coroutine on the crawler loop; returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def crawl(self, url, timeout=None, **run_options):
+        """Crawl ``url`` on a warm browser; safe to call from any thread.
+
+        When ``timeout`` expires the crawl is cancelled and its browser
+        discarded, then concurrent.futures.TimeoutError is raised.
+        """
+        future = self.submit(self.acrawl(url, **run_options))
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def acrawl(self, url, timeout=None, **run_options):
+        """Crawl ``url`` from a coroutine running on this service's loop.
+
+        ``timeout`` starts once a browser is free, so time spent queued for
+        the pool doesn't count against the page.
+        """
+        if self._available is None:
+            self._available = asyncio.Semaphore(self.size)
+        waited = time.monotonic()
+        async with self._available:
+            self._stats["wait_time"] += time.monotonic() - waited
+            slot = await self._checkout()
+            started = time.monotonic()
+            healthy = True
+            try:
+                result = await asyncio.wait_for(
+                    slot.crawler.arun(url=url, **dict(RUN_OPTIONS, **run_options)), timeout
+                )
+                self._stats["crawls"] += 1
+                print(f"Crawled {result.url} (status {result.status_code})")
+                return result
+            except (Exception, asyncio.CancelledError):
+                self._stats["errors"] += 1
+                healthy = False  # a failed or hung page may have left the browser broken
+                raise
+            finally:
+                slot.pages += 1
+                self._stats["crawl_time"] += time.monotonic() - started
+                await self._checkin(slot, healthy)
+
+    async def _checkout(self):
+        global AsyncWebCrawler
+        if self._idle:
+            return self._idle.pop()
+        if AsyncWebCrawler is None:
+            from crawl4ai import AsyncWebCrawler
+        crawler = AsyncWebCrawler(**CRAWLER_OPTIONS)
+        await crawler.start()
+        self._started += 1
+        self._stats["browsers_started"] += 1
+        return _Slot(crawler)
+
+    async def _checkin(self, slot, healthy=True):
+        if healthy and slot.pages < self.max_pages and not self._over_memory():
+            self._idle.append(slot)
+            return
+        self._stats["browsers_recycled"] += 1
+        self._started -= 1
+        try:
+            await slot.crawler.close()
+        except Exception as e:
+            print(f"Error closing crawler: {str(e)}")
+
+    def _over_memory(self):
+        if psutil is None or not self.max_rss_mb:
+            return False
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss > self.max_rss_mb * 1024 * 1024
+
+    def stats(self):
+        crawls = self._stats["crawls"] + self._stats["errors"]
+        busy = self._started - len(self._idle)
+        return dict(
+            self._stats,
+            size=self.size,
+            browsers=self._started,
+            busy=busy,
+            idle=len(self._idle),
+            utilization=round(busy / self.size, 2) if self.size else 0,
+            avg_crawl_time=round(self._stats["crawl_time"] / crawls, 3) if crawls else None,
+        )
+
+    def shutdown(self, timeout=30):
+        async def close_all():
+            while self._idle:
+                await self._idle.pop().crawler.close()
+
+        if self._loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(close_all(), self._loop).result(timeout)
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_crawler_service():
+    """Process-wide CrawlerService, sized by CRAWLER_POOL_SIZE (default 2)"""
+    global _service
+    with _service_lock:
+        if _service is None or _service._pid != os.getpid():
+            _service = CrawlerService(
+                size=int(os.getenv("CRAWLER_POOL_SIZE", 2)),
+                max_pages=int(os.getenv("CRAWLER_MAX_PAGES", 100)),
+                max_rss_mb=int(os.getenv("CRAWLER_MAX_RSS_MB", 2048)),
+            )
+            atexit.register(_service.shutdown)
+        return _service
+
+
+def crawl_url(url):
+    """Crawl a single page on the shared warm crawler pool and return the result"""
+    return get_crawler_service().crawl(url, timeout=CRAWL_TIMEOUT)
+
+
+MAX_BATCH_URLS = 1000
+BATCH_CONCURRENCY = 4
+DOMAIN_DELAY = 1.0  # seconds between requests to the same host
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+NOT_MODIFIED = object()  # crawl_many result for pages answered with a 304
+
+
+def parse_url_list(text):
+    """Return unique http(s) URLs from pasted text or an uploaded file, in order"""
+    urls = []
+    seen = set()
+    for line in text.replace(",", "\n").splitlines():
+        url = line.strip()
+        if urlparse(url).scheme in ("http", "https") and url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+
+def fetch_sitemap_urls(sitemap_url, limit=MAX_BATCH_URLS, timeout=30):
+    """Read page URLs from a sitemap, following one level of sitemap index"""
+    with urllib.request.urlopen(sitemap_url, timeout=timeout) as response:
+        root = ET.fromstring(response.read())
+
+    locs = [loc.text.strip() for loc in root.iter(f"{SITEMAP_NS}loc") if loc.text]
+    if root.tag != f"{SITEMAP_NS}sitemapindex":
+        return locs[:limit]
+
+    urls = []
+    for child in locs:
+        if len(urls) >= limit:
+            break
+        try:
+            urls.extend(fetch_sitemap_urls(child, limit - len(urls), timeout))
+        except Exception as e:
+            print(f"Error reading sitemap {child}: {str(e)}")
+    return urls[:limit]
+
+
+class DomainThrottle:
+    """Spaces out requests to the same host by at least ``delay`` seconds"""
+
+    def __init__(self, delay=DOMAIN_DELAY):
+        self.delay = delay
+        self._next_slot = {}
+
+    async def wait(self, url):
+        host = urlparse(url).netloc.lower()
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def crawl_many(service, urls, on_result, concurrency=BATCH_CONCURRENCY,
+                     domain_delay=DOMAIN_DELAY, validators=None, timeout=CRAWL_TIMEOUT):
+    """Crawl ``urls`` concurrently, calling ``on_result(url, result, error)``
+    as each page finishes. Runs on the service's event loop.
+
+    A page that takes longer than ``timeout`` once it has a browser is
+    cancelled and reported as failed, so one hung page can't hold its slot
+    for the rest of the batch.
+
+    URLs with a cache entry in ``validators`` are checked with a conditional
+    GET first and reported as ``NOT_MODIFIED`` instead of rendered on a 304.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    throttle = DomainThrottle(domain_delay)
+    validators = validators or {}
+
+    async def crawl_one(url):
+        async with semaphore:
+            await throttle.wait(url)
+            entry = validators.get(url)
+            if entry and await asyncio.get_running_loop().run_in_executor(
+                None, crawl_cache.not_modified, entry
+            ):
+                on_result(url, NOT_MODIFIED, None)
+                return
+            try:
+                result = await service.acrawl(url, timeout=timeout)
+            except asyncio.TimeoutError:
+                on_result(url, None, TimeoutError(f"Crawl timed out after {timeout}s"))
+            except Exception as e:
+                on_result(url, None, e)
+            else:
+                on_result(url, result, None)
+
+    await asyncio.gather(*(crawl_one(url) for url in urls))
+
+
+def crawl_batch(conn, user_id, urls, progress=None, batch_size=20,
+                concurrency=BATCH_CONCURRENCY, domain_delay=DOMAIN_DELAY, refresh=False,
+                timeout=CRAWL_TIMEOUT):
+    """Crawl many URLs on the shared pool, writing results in batched inserts.
+
+    Results are handed from the crawler loop to this thread through a queue so
+    all database writes stay on the caller's connection. Pages cached within
+    the TTL are reused without a request; older cached pages are revalidated
+    with a conditional GET unless ``refresh`` is set.
+    """
+    entries = {} if refresh else {url: crawl_cache.lookup(conn, user_id, url) for url in urls}
+    done = cached = failed = 0
+    for url, entry in entries.items():
+        if crawl_cache.is_fresh(entry):
+            crawl_cache.reuse(conn, user_id, url, entry, "ttl")
+            done += 1
+            cached += 1
+    conn.commit()
+    validators = {url: entry for url, entry in entries.items() if entry and not entry["fresh"]}
+    to_crawl = [url for url in urls if not crawl_cache.is_fresh(entries.get(url))]
+
+    service = get_crawler_service()
+    results = queue.Queue()
+    future = service.submit(crawl_many(
+        service, to_crawl, lambda *item: results.put(item), concurrency, domain_delay,
+        validators, timeout,
+    ))
+    pending = []
+
+    def flush():
+        save_crawls(conn, user_id, pending)
+        conn.commit()
+        pending.clear()
+        if progress:
+            progress(done / len(urls), f"Crawled {done} of {len(urls)} pages "
+                                       f"({cached} from cache, {failed} failed)")
+
+    while done < len(urls):
+        try:
+            url, result, error = results.get(timeout=1)
+        except queue.Empty:
+            if future.done():
+                future.result()  # surface unexpected errors from the loop
+                break
+            continue
+        done += 1
+        if result is NOT_MODIFIED:
+            crawl_cache.reuse(conn, user_id, url, validators[url], "not_modified")
+            cached += 1
+        elif error is None:
+            pending.append((url, build_crawl_data(url, result), "completed"))
+        else:
+            failed += 1
+            pending.append((url, {"url": url, "error": str(error), "links": []}, "failed"))
+        if len(pending) >= batch_size:
+            flush()
+    if pending or cached:
+        flush()
+    return {"crawled": done - failed, "cached": cached, "failed": failed}
+
+
+def build_crawl_data(url, result):
+    """Collect every format crawl4ai produced for storage"""
+    return {
+        "url": url,
+        "html": result.html,  # Original HTML
+        "cleaned_html": (
+            result.cleaned_html if hasattr(result, "cleaned_html") else None
+        ),  # Sanitized HTML
+        "markdown": result.markdown,  # Standard markdown
+        "fit_markdown": (
+            result.fit_markdown if hasattr(result, "fit_markdown") else None
+        ),  # Most relevant content
+        "links": list(result.links) if result.links else [],
+        "status_code": (
+            result.status_code if hasattr(result, "status_code") else None
+        ),
+        "headers": dict(result.headers) if hasattr(result, "headers") else {},
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def save_crawls(conn, user_id, crawls):
+    """Store (url, crawl_data, status) tuples; the caller commits once per batch.
+
+    New crawls are inserted together with executemany; a page identical to
+    its cached copy reuses that crawl's payloads, and only its validators and
+    timestamps are refreshed. Returns the crawl ids in order.
+    """
+    ids = [None] * len(crawls)
+    new = []
+    for index, (url, crawl_data, status) in enumerate(crawls):
+        if status == "completed":
+            entry = crawl_cache.unchanged(conn, user_id, url, crawl_data)
+            if entry is not None:
+                ids[index] = crawl_cache.reuse(conn, user_id, url, entry, "unchanged")
+                crawl_cache.record(conn, user_id, url, entry["crawl_id"], crawl_data)
+                continue
+        new.append(index)
+
+    saved = save_crawl_records(conn, user_id, [crawls[index] for index in new])
+    for index, crawl_id in zip(new, saved):
+        url, crawl_data, status = crawls[index]
+        ids[index] = crawl_id
+        if status == "completed":
+            crawl_cache.record(conn, user_id, url, crawl_id, crawl_data)
+    return ids
+
+
+def save_crawl(conn, user_id, url, crawl_data, status="completed"):
+    """Store a crawl and make it the cached copy of its URL when it succeeded"""
+    return save_crawls(conn, user_id, [(url, crawl_data, status)])[0]
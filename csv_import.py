@@ -0,0 +1,167 @@
+import codecs
+import csv
+import os
+import time
+import uuid
+
+INVENTORY_COLUMNS = ('name', 'quantity', 'category', 'sector', 'application')
+DEFAULT_CHUNK_SIZE = 5000
+REPORT_DIR = 'import_reports'
+REPORT_MAX_AGE = 24 * 60 * 60  # reports nobody downloaded are removed after a day
+
+INSERT_INVENTORY = '''
+    INSERT INTO inventory (name, quantity, category, sector, application, user_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+def parse_inventory_row(row, user_id):
+    """Validate one CSV row and return the INSERT parameters.
+
+    Raises ValueError with a human readable reason for bad rows.
+    """
+    if len(row) < len(INVENTORY_COLUMNS):
+        raise ValueError(f"expected {len(INVENTORY_COLUMNS)} columns, got {len(row)}")
+    name, quantity, category, sector, application = (
+        value.strip() for value in row[:len(INVENTORY_COLUMNS)]
+    )
+    if not name:
+        raise ValueError("name is empty")
+    try:
+        quantity = int(quantity)
+    except ValueError:
+        raise ValueError(f"quantity {quantity!r} is not an integer")
+    if quantity < 0:
+        raise ValueError("quantity cannot be negative")
+    return (name, quantity, category, sector, application, user_id)
+
+
+def is_header(row):
+    return [value.strip().lower() for value in row[:len(INVENTORY_COLUMNS)]] == list(INVENTORY_COLUMNS)
+
+
+class ErrorReport:
+    """CSV of rejected rows, only created on disk once the first error arrives"""
+
+    def __init__(self, user_id, report_dir=REPORT_DIR):
+        self.user_id = user_id
+        self.report_dir = report_dir
+        self.report_id = None
+        self.path = None
+        self._file = None
+        self._writer = None
+        self.count = 0
+
+    def add(self, line, reason, row):
+        if self._writer is None:
+            os.makedirs(self.report_dir, exist_ok=True)
+            prune_reports(self.report_dir)
+            self.report_id = uuid.uuid4().hex
+            self.path = report_path(self.user_id, self.report_id, self.report_dir)
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['line', 'reason'] + list(INVENTORY_COLUMNS))
+        self._writer.writerow([line, reason] + list(row))
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def report_path(user_id, report_id, report_dir=REPORT_DIR):
+    return os.path.join(report_dir, f"{user_id}_{report_id}.csv")
+
+
+def remove_report(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def prune_reports(report_dir=REPORT_DIR, max_age=REPORT_MAX_AGE):
+    """Delete error reports older than ``max_age`` seconds, returning how many went"""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(report_dir))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith('.csv'):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # downloaded or pruned by another request meanwhile
+    return removed
+
+
+def import_inventory_csv(conn, stream, user_id, chunk_size=DEFAULT_CHUNK_SIZE,
+                         report_dir=REPORT_DIR):
+    """Stream a binary CSV upload into the inventory table.
+
+    The upload is decoded incrementally, valid rows are inserted with
+    executemany and committed every ``chunk_size`` rows, and rejected rows
+    are written to an error report with their line numbers. ``stream`` only
+    needs ``read()``: before Python 3.11 werkzeug's SpooledTemporaryFile
+    uploads can't be wrapped in io.TextIOWrapper.
+    """
+    started = time.perf_counter()
+    text = codecs.getreader('utf-8-sig')(stream)
+    reader = csv.reader(text)
+    report = ErrorReport(user_id, report_dir)
+    imported = 0
+    batch = []
+    lines = []
+
+    def flush():
+        nonlocal imported
+        try:
+            conn.executemany(INSERT_INVENTORY, batch)
+            conn.commit()
+            imported += len(batch)
+        except Exception:
+            # Retry the chunk row by row so one bad row doesn't sink the rest
+            conn.rollback()
+            for line, params in zip(lines, batch):
+                try:
+                    conn.execute(INSERT_INVENTORY, params)
+                    imported += 1
+                except Exception as e:
+                    report.add(line, str(e), params[:-1])
+            conn.commit()
+        batch.clear()
+        lines.clear()
+
+    try:
+        try:
+            for row in reader:
+                if not row or (reader.line_num == 1 and is_header(row)):
+                    continue
+                try:
+                    batch.append(parse_inventory_row(row, user_id))
+                    lines.append(reader.line_num)
+                except ValueError as e:
+                    report.add(reader.line_num, str(e), row)
+                    continue
+                if len(batch) >= chunk_size:
+                    flush()
+        except UnicodeDecodeError as e:
+            report.add(reader.line_num + 1, f"file is not valid UTF-8: {e.reason}", [])
+        if batch:
+            flush()
+    finally:
+        report.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        'imported': imported,
+        'failed': report.count,
+        'seconds': seconds,
+        'rows_per_second': imported / seconds if seconds else 0.0,
+        'report_id': report.report_id,
+    }
@@ -1,11 +1,212 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
 
-def init_db():
-    connection = sqlite3.connect('inventory.db')
-    cursor = connection.cursor()
+from search import (
+    MIGRATION_STATEMENTS as SEARCH_INDEX_STATEMENTS,
+    NARROW_UPDATE_TRIGGER_STATEMENTS as SEARCH_UPDATE_TRIGGER_STATEMENTS,
+)
 
-    # Create users table
-    cursor.execute('''
+DATABASE = 'inventory.db'
+
+# Applied to every pooled connection when it is opened. journal_mode=WAL is
+# persistent in the database file, the rest are per-connection settings.
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',    # safe with WAL, avoids an fsync per commit
+    'cache_size': -16000,       # ~16MB page cache per connection
+    'mmap_size': 268435456,     # 256MB memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that returns itself to its pool instead of closing"""
+
+    pool = None
+    request_bound = False
+    checked_out = False  # cleared on release so a second close is a no-op
+
+    def _track_busy(self, method, *args):
+        try:
+            return method(*args)
+        except sqlite3.OperationalError as e:
+            if self.pool is not None and 'locked' in str(e):
+                self.pool.record_busy()
+            raise
+
+    def execute(self, *args):
+        return self._track_busy(super().execute, *args)
+
+    def executemany(self, *args):
+        return self._track_busy(super().executemany, *args)
+
+    def executescript(self, *args):
+        return self._track_busy(super().executescript, *args)
+
+    def commit(self):
+        return self._track_busy(super().commit)
+
+    def close(self):
+        # Request-bound connections are released by the app teardown handler
+        if self.request_bound:
+            return
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        result = super().__exit__(exc_type, exc_value, traceback)
+        if not self.request_bound:
+            self.close()
+        return result
+
+
+class ConnectionPool:
+    """Bounded pool of WAL-mode SQLite connections shared by a process"""
+
+    def __init__(self, database=DATABASE, max_size=8, timeout=15):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'busy_timeouts': 0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            factory=PooledConnection,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """Check out a connection, opening one if the pool is not full"""
+        with self._lock:
+            # Connections must not be shared across a fork (gunicorn workers)
+            if self._pid != os.getpid():
+                self._reset()
+            self._stats['checkouts'] += 1
+            try:
+                return self._check_out(self._idle.get_nowait())
+            except queue.Empty:
+                pass
+            if self._opened < self.max_size:
+                self._opened += 1
+                open_new = True
+            else:
+                self._stats['waits'] += 1
+                open_new = False
+
+        if open_new:
+            try:
+                return self._check_out(self._connect())
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        started = time.monotonic()
+        try:
+            return self._check_out(self._idle.get(timeout=self.timeout))
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out waiting for a database connection ({self.max_size} in use)"
+            )
+        finally:
+            with self._lock:
+                self._stats['wait_time'] += time.monotonic() - started
+
+    def _check_out(self, conn):
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction.
+
+        Releasing a connection that is not checked out (closing it twice)
+        does nothing, so it can't end up in the idle queue twice.
+        """
+        with self._lock:
+            if not conn.checked_out:
+                return
+            conn.checked_out = False
+        conn.request_bound = False
+        if conn.pool is not self or self._pid != os.getpid():
+            sqlite3.Connection.close(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._lock:
+                self._opened -= 1
+            sqlite3.Connection.close(conn)
+            return
+        self._idle.put(conn)
+
+    def record_busy(self):
+        with self._lock:
+            self._stats['busy_timeouts'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                wait_time=round(self._stats['wait_time'], 4),
+                opened=self._opened,
+                idle=self._idle.qsize(),
+                in_use=self._opened - self._idle.qsize(),
+                max_size=self.max_size,
+            )
+
+    def close_all(self):
+        """Close idle connections, e.g. before forking or at shutdown"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+            sqlite3.Connection.close(conn)
+
+
+def _index_crawls(conn):
+    from search import backfill_crawls
+    backfill_crawls(conn)
+
+
+def _split_crawl_payloads(conn):
+    from crawl_store import migrate_legacy_crawls
+    migrate_legacy_crawls(conn)
+
+
+# Ordered list of (version, description, statements). Each migration runs
+# exactly once and is recorded in schema_version; append new entries only.
+# A statement may also be a callable taking the connection, for data moves.
+MIGRATIONS = [
+    (1, 'base tables', [
+        '''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -13,10 +214,8 @@ def init_db():
             email TEXT UNIQUE NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
-
-    # Create inventory table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS inventory (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -28,10 +227,8 @@ def init_db():
             date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
-    ''')
-
-    # Create youtube_data table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS youtube_data (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -43,10 +240,8 @@ def init_db():
             date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
-    ''')
-
-    # Create crawled_data table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS crawled_data (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -56,10 +251,200 @@ def init_db():
             crawl_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
-    ''')
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT,
+            transcript TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+    ]),
+    (2, 'indexes for per-user listings and lookups', [
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_date ON inventory (user_id, date_added)',
+        'CREATE INDEX IF NOT EXISTS idx_crawled_data_user_date ON crawled_data (user_id, crawl_date)',
+        'CREATE INDEX IF NOT EXISTS idx_videos_user_created ON videos (user_id, created_at)',
+        # Older databases may hold duplicate imports; keep the first copy
+        '''
+        DELETE FROM youtube_data WHERE id NOT IN (
+            SELECT MIN(id) FROM youtube_data GROUP BY user_id, video_id
+        )
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_youtube_data_user_video ON youtube_data (user_id, video_id)',
+    ]),
+    (3, 'indexes for sorted inventory pages', [
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_name ON inventory (user_id, name)',
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_quantity ON inventory (user_id, quantity)',
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_category ON inventory (user_id, category)',
+    ]),
+    (4, 'background job queue', [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            worker TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at)',
+    ]),
+    (5, 'compressed, content-addressed crawl payloads', [
+        '''
+        CREATE TABLE IF NOT EXISTS crawl_blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS crawl_payloads (
+            crawl_id INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            blob_hash TEXT NOT NULL,
+            PRIMARY KEY (crawl_id, format),
+            FOREIGN KEY (crawl_id) REFERENCES crawled_data(id),
+            FOREIGN KEY (blob_hash) REFERENCES crawl_blobs(hash)
+        ) WITHOUT ROWID
+        ''',
+        'ALTER TABLE crawled_data ADD COLUMN status_code INTEGER',
+        'ALTER TABLE crawled_data ADD COLUMN link_count INTEGER NOT NULL DEFAULT 0',
+        _split_crawl_payloads,
+    ]),
+    (6, 'conditional re-crawl cache', [
+        '''
+        CREATE TABLE IF NOT EXISTS crawl_cache (
+            user_id INTEGER NOT NULL,
+            url_key TEXT NOT NULL,
+            url TEXT NOT NULL,
+            crawl_id INTEGER NOT NULL,
+            status_code INTEGER,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT NOT NULL,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, url_key),
+            FOREIGN KEY (crawl_id) REFERENCES crawled_data(id)
+        )
+        ''',
+        'ALTER TABLE crawled_data ADD COLUMN source_crawl_id INTEGER REFERENCES crawled_data(id)',
+    ]),
+    (7, 'full-text search index', SEARCH_INDEX_STATEMENTS + [_index_crawls]),
+    (8, 'tracked youtube channels for incremental sync', [
+        '''
+        CREATE TABLE IF NOT EXISTS youtube_channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            channel_url TEXT NOT NULL,
+            channel_name TEXT,
+            newest_video_id TEXT,
+            newest_upload_date TEXT,
+            video_count INTEGER NOT NULL DEFAULT 0,
+            last_synced_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, channel_url),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_youtube_channels_synced ON youtube_channels (last_synced_at)',
+    ]),
+    (9, 'link videos to the transcript cache', [
+        'ALTER TABLE videos ADD COLUMN transcript_key TEXT',
+        'CREATE INDEX IF NOT EXISTS idx_videos_transcript_key ON videos (transcript_key)',
+    ]),
+    (10, 'only re-index search entries when indexed text changes',
+     SEARCH_UPDATE_TRIGGER_STATEMENTS),
+    (11, 'resume channel syncs cut short by the sync limit', [
+        'ALTER TABLE youtube_channels ADD COLUMN backfill_pending INTEGER NOT NULL DEFAULT 0',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+# Migrations that move enough data out of existing rows that the file should
+# be rebuilt afterwards; SQLite only reuses freed pages otherwise
+VACUUM_AFTER = {5}
+
+
+def schema_version(conn):
+    """Return the highest applied migration version, 0 for a new database"""
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone():
+        return 0
+    return conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+
+
+def migrate(conn):
+    """Apply missing migrations in one transaction; returns applied versions"""
+    # Fast path for every worker boot after the first: no DDL, no write lock
+    if schema_version(conn) >= LATEST_VERSION:
+        return []
+
+    # Take the write lock before re-checking so concurrent workers don't race
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        current = schema_version(conn)
+        applied = []
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description),
+            )
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if current and VACUUM_AFTER.intersection(applied):
+        # Outside the transaction; rewrites the whole file, so it needs up
+        # to the database's size in free disk space
+        conn.execute('VACUUM')
+    return applied
+
+
+def init_db(database=DATABASE):
+    connection = sqlite3.connect(database, timeout=15)
+    try:
+        applied = migrate(connection)
+    finally:
+        connection.close()
+    if applied:
+        print(f"Applied database migrations: {applied}")
+    return applied
 
-    connection.commit()
-    connection.close()
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,62 @@
+"""Lay synthesized segments onto a transcript's timeline.
+
+``DubbingTrack`` preallocates one silent buffer for the whole video and
+mixes each segment's speech in at its ``start`` time. Speech that runs past
+its ``[start, end]`` window is sped up by resampling (linear interpolation
+over the whole array, so it also raises pitch slightly) by at most
+``max_speedup``; whatever still doesn't fit overlaps the following gap.
+Shorter speech is left as is and the rest of the window stays silent.
+"""
+import math
+
+import numpy as np
+
+MAX_SPEEDUP = 1.5
+
+
+def stretch(samples, length):
+    """Resample ``samples`` to exactly ``length`` samples"""
+    samples = np.asarray(samples, dtype=np.float32)
+    if length == len(samples) or not len(samples):
+        return samples
+    positions = np.linspace(0, len(samples) - 1, num=length)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def fit_to_window(samples, window, max_speedup=MAX_SPEEDUP):
+    """Speed up speech longer than ``window`` samples, by at most ``max_speedup``"""
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) <= window:
+        return samples
+    return stretch(samples, max(window, math.ceil(len(samples) / max_speedup)))
+
+
+class DubbingTrack:
+    def __init__(self, duration, sample_rate, max_speedup=MAX_SPEEDUP):
+        self.sample_rate = sample_rate
+        self.max_speedup = max_speedup
+        self.buffer = np.zeros(math.ceil(duration * sample_rate), dtype=np.float32)
+
+    def place(self, samples, start, end):
+        """Mix one segment in at ``start`` seconds, fitted to end by ``end``;
+        returns where it landed"""
+        begin = round(start * self.sample_rate)
+        window = max(0, round(end * self.sample_rate) - begin)
+        fitted = fit_to_window(samples, window, self.max_speedup)
+        stop = begin + len(fitted)
+        if stop > len(self.buffer):
+            # Only the last segments can overrun the transcript's duration
+            self.buffer = np.concatenate(
+                [self.buffer, np.zeros(stop - len(self.buffer), dtype=np.float32)]
+            )
+        self.buffer[begin:stop] += fitted
+        return {
+            'start_sample': begin,
+            'end_sample': stop,
+            'speedup': round(len(samples) / len(fitted), 3) if len(fitted) else 1.0,
+            'overrun': round(max(0, stop - begin - window) / self.sample_rate, 3),
+        }
+
+    def audio(self):
+        """The mixed track, clipped where overlapping segments add up past full scale"""
+        return np.clip(self.buffer, -1.0, 1.0)
@@ -0,0 +1,424 @@
+"""SQLite-backed background job queue.
+
+Routes enqueue slow work (crawls, YouTube imports, transcriptions) and return
+immediately; worker processes started with ``python jobs.py --workers N``
+claim jobs from the ``jobs`` table, report progress and retry failures.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+
+from database import DATABASE, ConnectionPool, init_db
+
+# Maximum number of running jobs per kind across all workers. Crawls each
+# drive a headless Chromium, so they are capped well below the worker count.
+KIND_LIMITS = {
+    'crawl': 2,
+    'batch_crawl': 1,
+    'transcribe': 1,
+    'channel_sync': 2,
+}
+RETRY_DELAY = 30  # seconds, doubled per attempt
+STALE_AFTER = 15 * 60  # requeue running jobs without a heartbeat for this long
+HEARTBEAT_INTERVAL = 60  # running jobs refresh heartbeat_at this often
+POLL_INTERVAL = 1.0
+# Tracked YouTube channels are re-synced this often (seconds, 0 disables)
+CHANNEL_SYNC_INTERVAL = int(os.getenv('CHANNEL_SYNC_INTERVAL', 6 * 60 * 60))
+
+HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register ``func(conn, job, payload, progress)`` as the runner for a kind"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(conn, user_id, kind, payload, max_attempts=3):
+    cursor = conn.execute(
+        'INSERT INTO jobs (user_id, kind, payload, max_attempts) VALUES (?, ?, ?, ?)',
+        (user_id, kind, json.dumps(payload), max_attempts),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def get_job(conn, job_id, user_id):
+    return conn.execute(
+        'SELECT * FROM jobs WHERE id = ? AND user_id = ?', (job_id, user_id)
+    ).fetchone()
+
+
+def claim_job(conn, worker, kinds=None):
+    """Atomically move the oldest runnable job to 'running' and return it"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        running = dict(conn.execute(
+            "SELECT kind, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY kind"
+        ).fetchall())
+        allowed = [
+            kind for kind in (kinds or HANDLERS)
+            if running.get(kind, 0) < KIND_LIMITS.get(kind, float('inf'))
+        ]
+        if not allowed:
+            conn.rollback()
+            return None
+
+        placeholders = ', '.join('?' for _ in allowed)
+        job = conn.execute(
+            f"""
+            SELECT * FROM jobs
+            WHERE status = 'queued' AND run_after <= CURRENT_TIMESTAMP
+              AND kind IN ({placeholders})
+            ORDER BY id LIMIT 1
+            """,
+            allowed,
+        ).fetchone()
+        if job is None:
+            conn.rollback()
+            return None
+
+        conn.execute(
+            """
+            UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                   started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP,
+                   worker = ?
+            WHERE id = ?
+            """,
+            (worker, job['id']),
+        )
+        conn.commit()
+        return conn.execute('SELECT * FROM jobs WHERE id = ?', (job['id'],)).fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def update_progress(conn, job_id, progress, message=None, commit=True):
+    conn.execute(
+        """
+        UPDATE jobs SET progress = ?, message = COALESCE(?, message),
+               heartbeat_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """,
+        (max(0.0, min(progress, 1.0)), message, job_id),
+    )
+    if commit:
+        conn.commit()
+
+
+def complete_job(conn, job_id, result=None, message=None):
+    conn.execute(
+        """
+        UPDATE jobs SET status = 'completed', progress = 1, result = ?,
+               message = COALESCE(?, message), finished_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """,
+        (json.dumps(result), message, job_id),
+    )
+    conn.commit()
+
+
+def fail_job(conn, job, error):
+    """Requeue with exponential backoff, or mark failed after max_attempts"""
+    if job['attempts'] < job['max_attempts']:
+        delay = RETRY_DELAY * 2 ** (job['attempts'] - 1)
+        conn.execute(
+            """
+            UPDATE jobs SET status = 'queued', message = ?,
+                   run_after = datetime('now', ?)
+            WHERE id = ?
+            """,
+            (f"Retrying after error: {error}", f'+{delay} seconds', job['id']),
+        )
+    else:
+        conn.execute(
+            """
+            UPDATE jobs SET status = 'failed', message = ?,
+                   finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (str(error), job['id']),
+        )
+    conn.commit()
+
+
+def requeue_stale(conn, stale_after=STALE_AFTER):
+    """Return jobs orphaned by a crashed worker to the queue.
+
+    A job that has used up its attempts is marked failed instead, so one
+    that keeps killing its worker (out of memory, a crashing browser) isn't
+    retried forever. Returns the number of jobs requeued or failed.
+    """
+    cutoff = (f'-{stale_after} seconds',)
+    failed = conn.execute(
+        """
+        UPDATE jobs SET status = 'failed', finished_at = CURRENT_TIMESTAMP,
+               message = 'Worker stopped responding; no attempts left'
+        WHERE status = 'running' AND heartbeat_at < datetime('now', ?)
+          AND attempts >= max_attempts
+        """,
+        cutoff,
+    ).rowcount
+    requeued = conn.execute(
+        """
+        UPDATE jobs SET status = 'queued', message = 'Requeued after worker timeout'
+        WHERE status = 'running' AND heartbeat_at < datetime('now', ?)
+        """,
+        cutoff,
+    ).rowcount
+    conn.commit()
+    return failed + requeued
+
+
+def schedule_channel_syncs(conn, interval=CHANNEL_SYNC_INTERVAL):
+    """Queue a channel_sync job for every tracked channel not synced within
+    ``interval`` seconds that doesn't already have one pending"""
+    cursor = conn.execute(
+        """
+        INSERT INTO jobs (user_id, kind, payload, max_attempts)
+        SELECT c.user_id, 'channel_sync', json_object('channel_id', c.id), 1
+        FROM youtube_channels c
+        WHERE (c.last_synced_at IS NULL OR c.last_synced_at < datetime('now', ?))
+          AND NOT EXISTS (
+              SELECT 1 FROM jobs j
+              WHERE j.kind = 'channel_sync' AND j.status IN ('queued', 'running')
+                AND json_extract(j.payload, '$.channel_id') = c.id
+          )
+        """,
+        (f'-{interval} seconds',),
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def _heartbeat(database, job_id, stop, interval):
+    # Handlers can block for longer than STALE_AFTER between progress calls
+    # (a single Whisper inference, a slow crawl), so the worker keeps the job
+    # alive from its own thread and connection while the handler runs.
+    conn = sqlite3.connect(database, timeout=15)
+    try:
+        while not stop.wait(interval):
+            try:
+                with conn:
+                    conn.execute(
+                        """
+                        UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                        WHERE id = ? AND status = 'running'
+                        """,
+                        (job_id,),
+                    )
+            except sqlite3.OperationalError as e:
+                print(f"Heartbeat for job {job_id} failed: {str(e)}")
+    finally:
+        conn.close()
+
+
+def run_job(conn, job, heartbeat_interval=HEARTBEAT_INTERVAL):
+    handler = HANDLERS.get(job['kind'])
+    if handler is None:
+        fail_job(conn, dict(job, attempts=job['max_attempts']), f"Unknown job kind: {job['kind']}")
+        return
+
+    def progress(fraction, message=None):
+        # Handlers own their commits. Inside one of their transactions the
+        # update rides along with it rather than committing half their work
+        # (another connection would only wait on the same write lock).
+        update_progress(conn, job['id'], fraction, message, commit=not conn.in_transaction)
+
+    stop = threading.Event()
+    database = conn.execute('PRAGMA database_list').fetchone()[2]
+    heartbeat = None
+    if database:  # in-memory databases can't be shared with another connection
+        heartbeat = threading.Thread(
+            target=_heartbeat, args=(database, job['id'], stop, heartbeat_interval),
+            name=f"job-{job['id']}-heartbeat", daemon=True,
+        )
+        heartbeat.start()
+    try:
+        result = handler(conn, job, json.loads(job['payload']), progress)
+        complete_job(conn, job['id'], result, (result or {}).get('message'))
+    except Exception as e:
+        conn.rollback()
+        print(f"Job {job['id']} ({job['kind']}) failed: {str(e)}")
+        fail_job(conn, job, e)
+    finally:
+        stop.set()
+        if heartbeat is not None:
+            heartbeat.join()
+
+
+def run_worker(database=DATABASE, kinds=None, poll_interval=POLL_INTERVAL, once=False):
+    """Claim and run jobs until interrupted (or until the queue is empty with once=True)"""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    conn = ConnectionPool(database, max_size=1).acquire()
+    last_sweep = 0.0
+    try:
+        while True:
+            if time.monotonic() - last_sweep > 60:
+                requeue_stale(conn)
+                if CHANNEL_SYNC_INTERVAL:
+                    schedule_channel_syncs(conn)
+                last_sweep = time.monotonic()
+            job = claim_job(conn, worker, kinds)
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            run_job(conn, job)
+    finally:
+        conn.close()
+
+
+# --- Job handlers -----------------------------------------------------------
+# Imports are deferred so a worker only loads what its job kinds need.
+
+@job_handler('crawl')
+def crawl_job(conn, job, payload, progress):
+    from crawl_cache import cached_crawl
+    from crawler import build_crawl_data, crawl_url, get_crawler_service, save_crawl
+
+    if not payload.get('refresh'):
+        progress(0.05, "Checking crawl cache")
+        crawl_id = cached_crawl(conn, job['user_id'], payload['url'])
+        if crawl_id:
+            conn.commit()
+            return {
+                'crawl_id': crawl_id,
+                'cached': True,
+                'message': 'Page unchanged since the last crawl; reused cached copy.',
+            }
+
+    progress(0.1, f"Crawling {payload['url']}")
+    result = crawl_url(payload['url'])
+    progress(0.8, "Saving crawl results")
+    crawl_id = save_crawl(
+        conn, job['user_id'], payload['url'], build_crawl_data(payload['url'], result)
+    )
+    conn.commit()
+    return {
+        'crawl_id': crawl_id,
+        'crawler': get_crawler_service().stats(),
+        'message': 'Website crawled successfully!',
+    }
+
+
+@job_handler('batch_crawl')
+def batch_crawl_job(conn, job, payload, progress):
+    from crawler import MAX_BATCH_URLS, crawl_batch, fetch_sitemap_urls, get_crawler_service
+
+    urls = payload.get('urls') or []
+    if payload.get('sitemap_url'):
+        progress(0.0, f"Reading sitemap {payload['sitemap_url']}")
+        urls = urls + fetch_sitemap_urls(payload['sitemap_url'])
+    urls = list(dict.fromkeys(urls))[:MAX_BATCH_URLS]
+    if not urls:
+        raise ValueError('No URLs to crawl')
+
+    progress(0.0, f"Crawling {len(urls)} pages")
+    result = crawl_batch(conn, job['user_id'], urls, progress, refresh=payload.get('refresh', False))
+    result['crawler'] = get_crawler_service().stats()
+    result['message'] = (f"Crawled {result['crawled']} pages "
+                         f"({result['cached']} from cache, {result['failed']} failed)")
+    return result
+
+
+def _sync_summary(counts):
+    message = (
+        f"Added {counts['added']} new videos, updated {counts['updated']} "
+        f"({counts['unchanged']} unchanged)"
+    )
+    if counts.get('backfill_pending'):
+        message += "; older videos will be imported on the next sync"
+    return dict(counts, message=message)
+
+
+@job_handler('youtube_import')
+def youtube_import_job(conn, job, payload, progress):
+    from youtube_import import sync_channel
+
+    progress(0.05, "Fetching new channel videos")
+    counts = sync_channel(conn, job['user_id'], payload['url'], progress)
+    conn.commit()
+    return _sync_summary(counts)
+
+
+@job_handler('channel_sync')
+def channel_sync_job(conn, job, payload, progress):
+    from youtube_import import sync_channel_videos
+
+    channel = conn.execute(
+        'SELECT channel_url, channel_name FROM youtube_channels WHERE id = ? AND user_id = ?',
+        (payload['channel_id'], job['user_id']),
+    ).fetchone()
+    if channel is None:
+        return {'message': 'Channel is no longer tracked'}
+    progress(0.05, f"Syncing {channel['channel_name'] or channel['channel_url']}")
+    counts = sync_channel_videos(
+        conn, job['user_id'], channel['channel_url'], channel['channel_name'], progress
+    )
+    conn.commit()
+    return _sync_summary(counts)
+
+
+@job_handler('transcribe')
+def transcribe_job(conn, job, payload, progress):
+    from youtube_transcriber import YouTubeTranscriber
+
+    progress(0.05, "Loading transcriber")
+    transcriber = YouTubeTranscriber(use_openai=bool(os.getenv('OPENAI_API_KEY')))
+    progress(0.1, "Downloading and transcribing audio")
+    result = transcriber.transcribe_video(payload['url'])
+    transcription = result['transcription']
+    transcript = transcription.get('text') or ' '.join(
+        segment['text'].strip() for segment in transcription.get('segments', [])
+    )
+    cursor = conn.execute(
+        'INSERT INTO videos (url, user_id, title, transcript, transcript_key) VALUES (?, ?, ?, ?, ?)',
+        (payload['url'], job['user_id'], result['title'], transcript, result.get('cache_key')),
+    )
+    conn.commit()
+    verb = 'Reused cached transcript of' if result.get('cached') else 'Transcribed'
+    return {'video_id': cursor.lastrowid, 'message': f"{verb} {result['title']}"}
+
+
+def _worker_main(database, kinds):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(database, kinds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    parser.add_argument('--workers', type=int, default=2, help='worker processes')
+    parser.add_argument('--kinds', help='comma separated job kinds to run (default: all)')
+    parser.add_argument('--database', default=DATABASE)
+    args = parser.parse_args()
+
+    init_db(args.database)
+    kinds = args.kinds.split(',') if args.kinds else None
+    processes = [
+        multiprocessing.Process(target=_worker_main, args=(args.database, kinds), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"Started {len(processes)} job workers")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
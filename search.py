@@ -0,0 +1,196 @@
+"""Full-text search over everything a user has stored.
+
+A single FTS5 table, ``search_index``, holds video transcripts, imported
+YouTube titles, inventory items and crawled markdown. Each document's rowid
+encodes its source (``ref_id * 4 + kind``) so triggers can update or delete
+entries by rowid without scanning the index. The owner is stored as an
+indexed token (``u<user_id>``) so per-user filtering is part of the match
+rather than a post-filter over every hit.
+
+Videos, YouTube data and inventory are kept in sync by triggers created in
+the migrations. Crawled markdown lives compressed in ``crawl_blobs``, which
+SQL can't read, so crawls are indexed from Python when they are saved.
+"""
+import re
+
+from markupsafe import Markup, escape
+
+KINDS = {'video': 0, 'youtube': 1, 'inventory': 2, 'crawl': 3}
+KIND_NAMES = {code: kind for kind, code in KINDS.items()}
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Column weights for bm25(): owner, title, body
+BM25_WEIGHTS = (0.0, 10.0, 1.0)
+SNIPPET_TOKENS = 16
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+
+CREATE_INDEX = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        owner, title, body,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+
+
+def _sync_triggers(table, kind, title, body, columns):
+    """Triggers keeping ``table`` mirrored in search_index; updates only
+    re-index a row when one of ``columns`` (the indexed text) changes"""
+    rowid = f"{{row}}.id * 4 + {KINDS[kind]}"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} "
+        f"BEGIN {_insert(rowid, title, body)} END",
+        _update_trigger(table, kind, title, body, columns),
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} "
+        f"BEGIN {_delete(rowid)} END",
+        f"INSERT INTO search_index (rowid, owner, title, body) "
+        f"SELECT {rowid.format(row=table)}, 'u' || user_id, "
+        f"{title.format(row=table)}, {body.format(row=table)} FROM {table}",
+    ]
+
+
+def _insert(rowid, title, body):
+    return (
+        f"INSERT INTO search_index (rowid, owner, title, body) VALUES "
+        f"({rowid.format(row='new')}, 'u' || new.user_id, "
+        f"{title.format(row='new')}, {body.format(row='new')});"
+    )
+
+
+def _delete(rowid):
+    return f"DELETE FROM search_index WHERE rowid = {rowid.format(row='old')};"
+
+
+def _update_trigger(table, kind, title, body, columns):
+    rowid = f"{{row}}.id * 4 + {KINDS[kind]}"
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_update "
+        f"AFTER UPDATE OF {', '.join(('user_id',) + columns)} ON {table} "
+        f"BEGIN {_delete(rowid)} {_insert(rowid, title, body)} END"
+    )
+
+
+# (table, kind, title, body, indexed columns) for trigger-synced sources
+SYNCED_TABLES = [
+    ('videos', 'video', "{row}.title", "{row}.transcript", ('title', 'transcript')),
+    ('youtube_data', 'youtube', "{row}.title", "{row}.channel_name", ('title', 'channel_name')),
+    ('inventory', 'inventory', "{row}.name", "{row}.category || ' ' || {row}.application",
+     ('name', 'category', 'application')),
+]
+
+# Statements for the search migration, backfilling existing rows
+MIGRATION_STATEMENTS = [CREATE_INDEX] + [
+    statement for source in SYNCED_TABLES for statement in _sync_triggers(*source)
+] + [
+    'CREATE TRIGGER IF NOT EXISTS crawled_data_search_delete AFTER DELETE ON crawled_data '
+    f"BEGIN DELETE FROM search_index WHERE rowid = old.id * 4 + {KINDS['crawl']}; END",
+]
+
+# Replace update triggers created to fire on any column with ones that
+# only fire when indexed text changes
+NARROW_UPDATE_TRIGGER_STATEMENTS = [
+    statement
+    for table, *rest in SYNCED_TABLES
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {table}_search_update",
+        _update_trigger(table, *rest),
+    )
+]
+
+
+def index_crawl(conn, crawl_id, user_id, url, markdown):
+    """Add or replace a crawl's markdown in the index"""
+    rowid = crawl_id * 4 + KINDS['crawl']
+    conn.execute('DELETE FROM search_index WHERE rowid = ?', (rowid,))
+    if markdown:
+        conn.execute(
+            'INSERT INTO search_index (rowid, owner, title, body) VALUES (?, ?, ?, ?)',
+            (rowid, f'u{user_id}', url, markdown),
+        )
+
+
+def index_crawls(conn, user_id, crawls):
+    """Index the markdown of newly inserted (crawl_id, url, markdown) crawls"""
+    conn.executemany(
+        'INSERT INTO search_index (rowid, owner, title, body) VALUES (?, ?, ?, ?)',
+        [
+            (crawl_id * 4 + KINDS['crawl'], f'u{user_id}', url, markdown)
+            for crawl_id, url, markdown in crawls if markdown
+        ],
+    )
+
+
+def backfill_crawls(conn):
+    """Migration step: index markdown of crawls stored before search existed"""
+    from crawl_store import load_payload
+
+    rows = conn.execute("SELECT id, user_id, url FROM crawled_data WHERE status = 'completed'")
+    for crawl_id, user_id, url in rows.fetchall():
+        index_crawl(conn, crawl_id, user_id, url, load_payload(conn, crawl_id, 'markdown'))
+
+
+def build_match(query):
+    """Turn free text into a safe FTS5 expression: every word must match
+    (the last one as a prefix), quoted so punctuation can't break syntax"""
+    terms = re.findall(r'\w+', query, re.UNICODE)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return '{title body} : (' + ' '.join(quoted) + ')'
+
+
+def highlight(snippet):
+    """Escape a snippet and turn the match markers into <mark> tags"""
+    return Markup(
+        str(escape(snippet))
+        .replace(_HIGHLIGHT_START, '<mark>')
+        .replace(_HIGHLIGHT_END, '</mark>')
+    )
+
+
+def search(conn, user_id, query, kind=None, page=1, per_page=PAGE_SIZE):
+    """Return (results, has_more) for one page of BM25-ranked matches.
+
+    Each result is a dict with kind, ref_id, title, snippet and score;
+    title and snippet are escaped Markup with matches wrapped in <mark>.
+    """
+    match = build_match(query)
+    if match is None:
+        return [], False
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    markers = [_HIGHLIGHT_START, _HIGHLIGHT_END]
+    params = markers + markers + [SNIPPET_TOKENS, f'owner : u{user_id} AND {match}']
+    kind_filter = ''
+    if kind in KINDS:
+        kind_filter = 'AND rowid % 4 = ?'
+        params.append(KINDS[kind])
+    params += [per_page + 1, (max(page, 1) - 1) * per_page]
+
+    rows = conn.execute(
+        f'''
+        SELECT rowid,
+               highlight(search_index, 1, ?, ?) AS title,
+               snippet(search_index, 2, ?, ?, '…', ?) AS snippet,
+               bm25(search_index, {', '.join(map(str, BM25_WEIGHTS))}) AS score
+        FROM search_index
+        WHERE search_index MATCH ? {kind_filter}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+        ''',
+        params,
+    ).fetchall()
+
+    results = [
+        {
+            'kind': KIND_NAMES[rowid % 4],
+            'ref_id': rowid // 4,
+            'title': highlight(title or ''),
+            'snippet': highlight(snippet or ''),
+            'score': score,
+        }
+        for rowid, title, snippet, score in rows[:per_page]
+    ]
+    return results, len(rows) > per_page
@@ -1,3 +1,4 @@
+import io
 import unittest
 from app import app
 
@@ -79,6 +80,66 @@ class FlaskAppTests(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Item successfully added!', response.data)
 
+    def test_inventory_pagination(self):
+        self.app.post('/login', data={
+            'username': self.test_username,
+            'password': self.test_password
+        })
+        for name in ('Page Item A', 'Page Item B'):
+            self.app.post('/add', data={
+                'name': name,
+                'quantity': '1',
+                'category': 'Test Category',
+                'sector': 'Test Sector',
+                'application': 'Test Application'
+            })
+        first = self.app.get('/inventory?page_size=1').get_json()
+        self.assertEqual(len(first['items']), 1)
+        self.assertIsNotNone(first['next_cursor'])
+        second = self.app.get(
+            '/inventory?page_size=1&after=' + first['next_cursor']
+        ).get_json()
+        self.assertNotEqual(first['items'][0]['id'], second['items'][0]['id'])
+
+        response = self.app.get('/inventory?page_size=1',
+                                headers={'HX-Request': 'true'})
+        self.assertIn(b'load-more-row', response.data)
+
+    def test_dashboard_keeps_sort_order(self):
+        self.app.post('/login', data={
+            'username': self.test_username,
+            'password': self.test_password
+        })
+        response = self.app.get('/dashboard?sort=name&order=desc&page_size=25')
+        self.assertIn(b'<option value="desc" selected>', response.data)
+        self.assertNotIn(b'<option value="asc" selected>', response.data)
+
+    def test_upload_csv_file_multipart(self):
+        self.app.post('/login', data={
+            'username': self.test_username,
+            'password': self.test_password
+        })
+        response = self.app.post('/upload_csv_file', data={
+            'file': (io.BytesIO(b'name,quantity,category,sector,application\n'
+                                b'Upload Item,3,Cat,Sec,App\n'), 'items.csv'),
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['imported'], 1)
+
+    def test_error_report_is_deleted_once_downloaded(self):
+        self.app.post('/login', data={
+            'username': self.test_username,
+            'password': self.test_password
+        })
+        response = self.app.post('/upload_csv', data={
+            'file': (io.BytesIO(b'Bad Item,many,Cat,Sec,App\n'), 'items.csv'),
+        }, content_type='multipart/form-data')
+        report_url = '/upload_csv/report/' + response.location.rsplit('report=', 1)[1]
+        response = self.app.get(report_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'not an integer', response.data)
+        self.assertEqual(self.app.get(report_url).status_code, 404)
+
     def test_upload_csv(self):
         # This test would require a valid CSV file to be uploaded
         pass  # Implement CSV upload test
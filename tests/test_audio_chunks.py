@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import audio_chunks
+from audio_chunks import chunk_windows, load_pcm, plan_chunks, stitch
+
+
+def word(text, start, end):
+    return {'word': text, 'start': start, 'end': end}
+
+
+class PlanChunksTests(unittest.TestCase):
+    def test_short_audio_is_one_chunk(self):
+        self.assertEqual(plan_chunks(300, [], target=600, max_length=900), [0.0, 300])
+
+    def test_cuts_at_silence_nearest_target(self):
+        silences = [(350, 351), (590, 592), (700, 701), (1250, 1252)]
+        cuts = plan_chunks(2000, silences, target=600, max_length=900)
+        self.assertEqual(cuts, [0.0, 591.0, 1251.0, 2000])
+
+    def test_falls_back_to_hard_cut_without_silence(self):
+        self.assertEqual(plan_chunks(1600, [], target=600, max_length=900), [0.0, 600, 1200, 1600])
+
+    def test_windows_overlap_previous_chunk(self):
+        self.assertEqual(
+            chunk_windows([0.0, 600.0, 1000.0], overlap=2.0),
+            [(0.0, 600.0, 0.0), (598.0, 1000.0, 600.0)],
+        )
+
+
+class StitchTests(unittest.TestCase):
+    def test_offsets_and_drops_overlap(self):
+        windows = [(0.0, 10.0, 0.0), (8.0, 20.0, 10.0)]
+        first = {'language': 'en', 'segments': [
+            {'start': 0.0, 'end': 9.8, 'text': ' hello there world',
+             'words': [word(' hello', 0.0, 0.5), word(' there', 5.0, 5.5), word(' world', 9.0, 9.8)]},
+        ]}
+        second = {'segments': [
+            {'start': 0.5, 'end': 4.0, 'text': ' world again now',
+             'words': [word(' world', 1.0, 1.8), word(' again', 2.2, 2.8), word(' now', 3.0, 4.0)]},
+        ]}
+        result = stitch([first, second], windows)
+        self.assertEqual(result['text'], 'hello there world again now')
+        self.assertEqual(result['language'], 'en')
+        self.assertEqual([s['id'] for s in result['segments']], [0, 1])
+        self.assertEqual(result['segments'][1]['start'], 10.2)
+        self.assertEqual(result['segments'][1]['end'], 12.0)
+
+    def test_api_words_are_attached_to_segments(self):
+        windows = [(0.0, 10.0, 0.0), (8.0, 20.0, 10.0)]
+        first = {'segments': [{'start': 0.0, 'end': 9.0, 'text': ' one'}],
+                 'words': [word('one', 1.0, 1.5)]}
+        second = {'segments': [{'start': 0.0, 'end': 1.5, 'text': ' stale'},
+                               {'start': 3.0, 'end': 5.0, 'text': ' two'}]}
+        result = stitch([first, second], windows)
+        self.assertEqual(result['text'], 'one two')
+        self.assertEqual(result['segments'][1]['start'], 11.0)
+
+
+class LoadPcmTests(unittest.TestCase):
+    @mock.patch.object(audio_chunks.ffmpeg, 'input')
+    def test_decodes_s16le_to_float_samples(self, ffmpeg_input):
+        raw = np.array([0, 16384, -32768, 32767], np.int16).tobytes()
+        output = ffmpeg_input.return_value.output
+        output.return_value.run.return_value = (raw, b'')
+        samples = load_pcm('https://media.example/audio', {'User-Agent': 'yt', 'Referer': 'r'})
+        ffmpeg_input.assert_called_once_with(
+            'https://media.example/audio', headers='User-Agent: yt\r\nReferer: r\r\n')
+        output.assert_called_once_with('-', format='s16le', acodec='pcm_s16le', ac=1, ar=16000)
+        self.assertEqual(samples.dtype, np.float32)
+        np.testing.assert_allclose(samples, [0.0, 0.5, -1.0, 32767 / 32768])
+
+    @mock.patch.object(audio_chunks.ffmpeg, 'input')
+    def test_chunks_are_mp3_only_for_uploads(self, ffmpeg_input):
+        output = ffmpeg_input.return_value.output
+        audio_chunks.extract_chunk('audio.m4a', 10.0, 25.0, 'chunk.wav')
+        ffmpeg_input.assert_called_with('audio.m4a', ss=10.0, t=15.0)
+        self.assertEqual(output.call_args.kwargs['acodec'], 'pcm_s16le')
+        self.assertNotIn('audio_bitrate', output.call_args.kwargs)
+        audio_chunks.extract_chunk('audio.m4a', 10.0, 25.0, 'chunk.mp3')
+        self.assertEqual(output.call_args.kwargs['audio_bitrate'], '48k')
+        self.assertEqual(output.call_args.kwargs['ar'], 16000)
+
+    @mock.patch.object(audio_chunks.ffmpeg, 'input')
+    def test_sample_rate_is_passed_to_ffmpeg(self, ffmpeg_input):
+        output = ffmpeg_input.return_value.output
+        output.return_value.run.return_value = (b'', b'')
+        self.assertEqual(len(load_pcm('audio.m4a', sample_rate=8000)), 0)
+        ffmpeg_input.assert_called_once_with('audio.m4a')
+        self.assertEqual(output.call_args.kwargs['ar'], 8000)
+
+
+if __name__ == '__main__':
+    unittest.main()
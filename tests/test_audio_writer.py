@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+try:
+    import soundfile as sf
+except ImportError:  # only installed with requirements_tts.txt
+    sf = None
+
+if sf is not None:
+    from audio_writer import FORMATS, ChunkWriter
+
+
+def tone(seconds, sample_rate, frequency=440.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+@unittest.skipIf(sf is None, 'soundfile is not installed')
+class ChunkWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def path(self, ext):
+        return os.path.join(self.tmpdir.name, f'out.{ext}')
+
+    def test_offsets_include_silence_gaps(self):
+        with ChunkWriter(self.path('wav'), 16000, silence=0.5) as writer:
+            first = writer.write(tone(1.0, 16000))
+            second = writer.write(tone(0.25, 16000))
+        self.assertEqual((first['start_sample'], first['end_sample']), (0, 16000))
+        self.assertEqual(first['offset'], 0.0)
+        # 8000 samples of silence sit between the chunks, none before the first
+        self.assertEqual((second['start_sample'], second['end_sample']), (24000, 28000))
+        self.assertEqual((second['offset'], second['duration']), (1.5, 0.25))
+        self.assertEqual(writer.chunks, 2)
+        self.assertEqual(writer.samples_written, 28000)
+
+    def test_written_audio_matches_chunks_and_gaps(self):
+        first, second = tone(0.5, 8000), tone(0.25, 8000, 220.0)
+        with ChunkWriter(self.path('wav'), 8000, silence=0.125) as writer:
+            writer.write(first)
+            writer.write(second.reshape(-1, 1))  # any shape is flattened
+        data, sample_rate = sf.read(self.path('wav'), dtype='float32')
+        self.assertEqual(sample_rate, 8000)
+        self.assertEqual(len(data), 4000 + 1000 + 2000)
+        np.testing.assert_allclose(data[:4000], first, atol=1e-4)
+        self.assertFalse(data[4000:5000].any())
+        np.testing.assert_allclose(data[5000:], second, atol=1e-4)
+
+    def test_no_gap_without_silence(self):
+        with ChunkWriter(self.path('wav'), 8000) as writer:
+            writer.write(tone(0.5, 8000))
+            placement = writer.write(tone(0.5, 8000))
+        self.assertEqual(placement['start_sample'], 4000)
+
+    def test_each_format_writes_a_readable_file(self):
+        for ext, (file_format, subtype) in FORMATS.items():
+            with self.subTest(format=ext):
+                # Opus only supports a few sample rates; 48 kHz works everywhere
+                with ChunkWriter(self.path(ext), 48000, audio_format=ext, silence=0.25) as writer:
+                    writer.write(tone(0.5, 48000))
+                    placement = writer.write(tone(0.5, 48000))
+                info = sf.info(self.path(ext))
+                self.assertEqual((info.format, info.subtype), (file_format, subtype))
+                self.assertEqual((info.samplerate, info.channels), (48000, 1))
+                self.assertEqual(placement['audio_path'], self.path(ext))
+                self.assertAlmostEqual(info.duration, 1.25, places=2)
+
+    def test_unknown_format_is_rejected_before_creating_a_file(self):
+        with self.assertRaises(ValueError):
+            ChunkWriter(self.path('mp3'), 16000, audio_format='mp3')
+        self.assertFalse(os.path.exists(self.path('mp3')))
+
+
+if __name__ == '__main__':
+    unittest.main()
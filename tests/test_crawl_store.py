@@ -0,0 +1,95 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import crawl_store
+from database import MIGRATIONS, migrate
+
+
+def sample_crawl(markdown='# Title'):
+    return {
+        'url': 'https://example.com',
+        'html': '<html><body>' + 'x' * 5000 + '</body></html>',
+        'cleaned_html': '<p>clean</p>',
+        'markdown': markdown,
+        'fit_markdown': markdown,
+        'links': ['https://example.com/a'],
+        'status_code': 200,
+        'headers': {'etag': '"abc"'},
+        'timestamp': '2024-01-01T00:00:00',
+    }
+
+
+class CrawlStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, 'test.db'))
+        migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_round_trip_and_metadata(self):
+        crawl_id = crawl_store.save_crawl_record(self.conn, 1, 'https://example.com', sample_crawl())
+        self.assertEqual(crawl_store.load_payload(self.conn, crawl_id, 'markdown'), '# Title')
+        self.assertEqual(crawl_store.load_payload(self.conn, crawl_id, 'links'), ['https://example.com/a'])
+        metadata, status_code, link_count = self.conn.execute(
+            'SELECT crawl_data, status_code, link_count FROM crawled_data WHERE id = ?', (crawl_id,)
+        ).fetchone()
+        self.assertNotIn('html', json.loads(metadata))
+        self.assertEqual((status_code, link_count), (200, 1))
+
+    def test_identical_content_is_stored_once(self):
+        crawl_store.save_crawl_record(self.conn, 1, 'https://example.com', sample_crawl())
+        crawl_store.save_crawl_record(self.conn, 1, 'https://example.com', sample_crawl())
+        blobs = self.conn.execute('SELECT COUNT(*) FROM crawl_blobs').fetchone()[0]
+        # markdown and fit_markdown share a blob: html, cleaned_html, markdown, links
+        self.assertEqual(blobs, 4)
+        size, stored = self.conn.execute(
+            'SELECT SUM(size), SUM(LENGTH(data)) FROM crawl_blobs').fetchone()
+        self.assertLess(stored, size)
+
+
+class LegacyCrawlMigrationTests(unittest.TestCase):
+    def test_json_rows_are_split(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            conn = sqlite3.connect(os.path.join(tmpdir, 'test.db'))
+            # Bring the schema to the version before split storage existed
+            conn.execute('CREATE TABLE schema_version (version INTEGER PRIMARY KEY, '
+                         'description TEXT NOT NULL, applied_at TIMESTAMP)')
+            for version, description, statements in MIGRATIONS[:4]:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                             (version, description))
+            conn.execute(
+                'INSERT INTO crawled_data (user_id, url, crawl_data, status) VALUES (1, ?, ?, ?)',
+                ('https://example.com', json.dumps(sample_crawl('legacy')), 'completed'),
+            )
+            conn.executemany(
+                'INSERT INTO crawled_data (user_id, url, crawl_data, status) VALUES (1, ?, ?, ?)',
+                [(f'https://example.com/{i}', json.dumps(sample_crawl(f'page {i}')), 'completed')
+                 for i in range(2, 6)],
+            )
+            conn.commit()
+
+            statements = []
+            conn.set_trace_callback(statements.append)
+            with mock.patch.object(crawl_store, 'MIGRATION_BATCH', 2):
+                migrate(conn)
+            conn.set_trace_callback(None)
+            self.assertEqual(crawl_store.load_payload(conn, 1, 'markdown'), 'legacy')
+            self.assertEqual(crawl_store.load_payload(conn, 5, 'markdown'), 'page 5')
+            self.assertEqual(crawl_store.available_formats(conn, 1).count('html'), 1)
+            selects = [s for s in statements if s.startswith('SELECT id, crawl_data')]
+            self.assertEqual(len(selects), 4)  # three batches of two, then an empty one
+            self.assertIn('VACUUM', statements)
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+import asyncio
+import concurrent.futures
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import crawl_cache
+import crawler
+from crawl_store import load_payload
+from database import migrate
+
+
+class FakeCrawler:
+    instances = []
+
+    def __init__(self, **options):
+        self.closed = False
+        FakeCrawler.instances.append(self)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    async def arun(self, url, **options):
+        if 'broken' in url:
+            raise RuntimeError('navigation failed')
+        if 'hung' in url:
+            await asyncio.Event().wait()  # never returns
+        if 'slow' in url:
+            await asyncio.sleep(0.15)
+        return SimpleNamespace(
+            url=url, status_code=200, html='<p>hi</p>', cleaned_html='<p>hi</p>',
+            markdown='hi', fit_markdown='hi', links=[], headers={},
+        )
+
+
+class CrawlerServiceTests(unittest.TestCase):
+    def setUp(self):
+        FakeCrawler.instances = []
+        patcher = mock.patch.object(crawler, 'AsyncWebCrawler', FakeCrawler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuses_warm_browser(self):
+        service = crawler.CrawlerService(size=2, max_pages=10, max_rss_mb=None)
+        self.addCleanup(service.shutdown)
+        for _ in range(3):
+            self.assertEqual(service.crawl('https://example.com').status_code, 200)
+        stats = service.stats()
+        self.assertEqual(len(FakeCrawler.instances), 1)
+        self.assertEqual(stats['crawls'], 3)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_recycles_after_max_pages(self):
+        service = crawler.CrawlerService(size=1, max_pages=2, max_rss_mb=None)
+        self.addCleanup(service.shutdown)
+        for _ in range(3):
+            service.crawl('https://example.com')
+        self.assertEqual(len(FakeCrawler.instances), 2)
+        self.assertTrue(FakeCrawler.instances[0].closed)
+        self.assertEqual(service.stats()['browsers_recycled'], 1)
+
+    def test_timeout_cancels_crawl_and_discards_browser(self):
+        service = crawler.CrawlerService(size=1, max_rss_mb=None)
+        self.addCleanup(service.shutdown)
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            service.crawl('https://hung.com', timeout=0.1)
+        self.assertEqual(service.crawl('https://example.com', timeout=5).status_code, 200)
+        self.assertEqual(len(FakeCrawler.instances), 2)
+        self.assertTrue(FakeCrawler.instances[0].closed)
+
+
+class BatchCrawlTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(crawler, 'AsyncWebCrawler', FakeCrawler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, 'test.db'))
+        self.addCleanup(self.conn.close)
+        migrate(self.conn)
+
+    def test_parse_url_list(self):
+        text = 'https://a.com/1\nnot a url\nhttps://a.com/1, https://b.com/2\n'
+        self.assertEqual(crawler.parse_url_list(text), ['https://a.com/1', 'https://b.com/2'])
+
+    def test_crawl_batch_records_results_and_failures(self):
+        service = crawler.CrawlerService(size=2, max_rss_mb=None)
+        self.addCleanup(service.shutdown)
+        urls = [f'https://site{i}.com/' for i in range(5)] + ['https://broken.com/']
+        updates = []
+        with mock.patch.object(crawler, 'get_crawler_service', return_value=service):
+            result = crawler.crawl_batch(
+                self.conn, 1, urls, lambda *args: updates.append(args),
+                batch_size=2, domain_delay=0,
+            )
+        self.assertEqual(result, {'crawled': 5, 'cached': 0, 'failed': 1})
+        rows = dict(self.conn.execute(
+            'SELECT status, COUNT(*) FROM crawled_data GROUP BY status').fetchall())
+        self.assertEqual(rows, {'completed': 5, 'failed': 1})
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(updates[-1][0], 1.0)
+
+    def test_crawl_batch_fails_hung_pages_after_timeout(self):
+        service = crawler.CrawlerService(size=1, max_rss_mb=None)
+        self.addCleanup(service.shutdown)
+        urls = ['https://hung.com/', 'https://site.com/']
+        with mock.patch.object(crawler, 'get_crawler_service', return_value=service):
+            result = crawler.crawl_batch(
+                self.conn, 1, urls, concurrency=1, domain_delay=0, timeout=0.2)
+        self.assertEqual(result, {'crawled': 1, 'cached': 0, 'failed': 1})
+        rows = dict(self.conn.execute('SELECT url, status FROM crawled_data').fetchall())
+        self.assertEqual(rows, {'https://hung.com/': 'failed', 'https://site.com/': 'completed'})
+        self.assertEqual(service.stats()['errors'], 1)
+
+    def test_timeout_starts_once_a_browser_is_free(self):
+        service = crawler.CrawlerService(size=1, max_rss_mb=None)
+        self.addCleanup(service.shutdown)
+        urls = [f'https://slow{i}.com/' for i in range(3)]
+        with mock.patch.object(crawler, 'get_crawler_service', return_value=service):
+            # the last page waits ~0.3s for the browser but crawls in 0.15s
+            result = crawler.crawl_batch(
+                self.conn, 1, urls, concurrency=3, domain_delay=0, timeout=0.25)
+        self.assertEqual(result, {'crawled': 3, 'cached': 0, 'failed': 0})
+
+    def test_save_crawls_returns_ids_in_order(self):
+        crawls = [
+            (f'https://site{i}.com/', {'url': f'https://site{i}.com/', 'markdown': f'page {i}',
+                                       'links': [], 'status_code': 200}, 'completed')
+            for i in range(3)
+        ] + [('https://broken.com/', {'url': 'https://broken.com/', 'error': 'x', 'links': []},
+              'failed')]
+        ids = crawler.save_crawls(self.conn, 1, crawls)
+        self.assertEqual(len(set(ids)), 4)
+        for crawl_id, (url, data, status) in zip(ids, crawls):
+            row = self.conn.execute(
+                'SELECT url, status FROM crawled_data WHERE id = ?', (crawl_id,)).fetchone()
+            self.assertEqual(row, (url, status))
+            self.assertEqual(load_payload(self.conn, crawl_id, 'markdown'), data.get('markdown'))
+
+    def test_domain_throttle_spaces_same_host(self):
+        throttle = crawler.DomainThrottle(delay=0.05)
+
+        async def hit_twice():
+            started = time.monotonic()
+            await throttle.wait('https://a.com/1')
+            await throttle.wait('https://b.com/1')
+            await throttle.wait('https://a.com/2')
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(hit_twice()), 0.045)
+
+
+class CrawlCacheTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(crawler, 'AsyncWebCrawler', FakeCrawler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, 'test.db'))
+        self.addCleanup(self.conn.close)
+        migrate(self.conn)
+        self.service = crawler.CrawlerService(size=1, max_rss_mb=None)
+        self.addCleanup(self.service.shutdown)
+        patcher = mock.patch.object(crawler, 'get_crawler_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_normalize_url(self):
+        self.assertEqual(
+            crawl_cache.normalize_url('HTTPS://Example.com:443?b=2&a=1#top'),
+            'https://example.com/?a=1&b=2',
+        )
+
+    def test_recrawl_within_ttl_reuses_payloads(self):
+        urls = ['https://a.com/', 'https://b.com/']
+        crawler.crawl_batch(self.conn, 1, urls, domain_delay=0)
+        result = crawler.crawl_batch(self.conn, 1, ['https://A.com/#x', 'https://b.com/'],
+                                     domain_delay=0)
+        self.assertEqual(result, {'crawled': 2, 'cached': 2, 'failed': 0})
+        self.assertEqual(self.service.stats()['crawls'], 2)
+        source, reused = self.conn.execute(
+            'SELECT source_crawl_id, id FROM crawled_data WHERE url = ?', ('https://A.com/#x',)
+        ).fetchone()
+        self.assertEqual(source, 1)
+        self.assertEqual(
+            self.conn.execute('SELECT COUNT(*) FROM crawl_payloads WHERE crawl_id = ?',
+                              (reused,)).fetchone()[0],
+            self.conn.execute('SELECT COUNT(*) FROM crawl_payloads WHERE crawl_id = 1').fetchone()[0],
+        )
+
+    def test_stale_entry_is_revalidated(self):
+        crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0)
+        self.conn.execute("UPDATE crawl_cache SET etag = '\"v1\"', checked_at = '2000-01-01'")
+        self.conn.commit()
+        with mock.patch.object(crawl_cache, 'not_modified', return_value=True) as check:
+            result = crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0)
+        self.assertEqual(check.call_args[0][0]['etag'], '"v1"')
+        self.assertEqual(result['cached'], 1)
+        self.assertEqual(self.service.stats()['crawls'], 1)
+
+    def test_refresh_bypasses_cache(self):
+        crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0)
+        result = crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0, refresh=True)
+        self.assertEqual(result['cached'], 0)
+        self.assertEqual(self.service.stats()['crawls'], 2)
+
+
+    def test_unchanged_recrawl_reuses_cached_payloads(self):
+        crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0)
+        self.conn.execute("UPDATE crawl_cache SET checked_at = '2000-01-01'")
+        self.conn.commit()
+        blobs = self.conn.execute('SELECT COUNT(*) FROM crawl_blobs').fetchone()[0]
+        crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0)
+        self.assertEqual(self.service.stats()['crawls'], 2)
+        source, crawl_id = self.conn.execute(
+            'SELECT source_crawl_id, id FROM crawled_data ORDER BY id DESC').fetchone()
+        self.assertEqual(source, 1)
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM crawl_blobs').fetchone()[0], blobs)
+        entry = crawl_cache.lookup(self.conn, 1, 'https://a.com/')
+        self.assertEqual(entry['crawl_id'], 1)
+        self.assertTrue(entry['fresh'])
+
+    def test_changed_recrawl_becomes_cached_copy(self):
+        crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0)
+        self.conn.execute("UPDATE crawl_cache SET content_hash = 'old'")
+        self.conn.commit()
+        crawler.crawl_batch(self.conn, 1, ['https://a.com/'], domain_delay=0, refresh=True)
+        self.assertEqual(crawl_cache.lookup(self.conn, 1, 'https://a.com/')['crawl_id'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from csv_import import REPORT_MAX_AGE, import_inventory_csv, report_path
+from database import migrate
+
+
+class CsvImportTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, 'test.db'))
+        migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def run_import(self, text, chunk_size=2):
+        return import_inventory_csv(
+            self.conn, io.BytesIO(text.encode('utf-8')), 1,
+            chunk_size=chunk_size, report_dir=self.tmpdir.name,
+        )
+
+    def test_imports_in_chunks_and_skips_header(self):
+        result = self.run_import(
+            'name,quantity,category,sector,application\n'
+            'a,1,c,s,x\nb,2,c,s,x\nc,3,c,s,x\n'
+        )
+        self.assertEqual(result['imported'], 3)
+        self.assertEqual(result['failed'], 0)
+        self.assertIsNone(result['report_id'])
+        count = self.conn.execute('SELECT COUNT(*) FROM inventory').fetchone()[0]
+        self.assertEqual(count, 3)
+
+    def test_error_report_has_line_numbers(self):
+        result = self.run_import('a,1,c,s,x\nb,many,c,s,x\nshort,1\nd,4,c,s,x\n')
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['failed'], 2)
+        with open(report_path(1, result['report_id'], self.tmpdir.name)) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines[1].startswith('2,'))
+        self.assertIn('not an integer', lines[1])
+        self.assertTrue(lines[2].startswith('3,'))
+
+    def test_new_report_prunes_expired_ones(self):
+        stale = report_path(1, 'a' * 32, self.tmpdir.name)
+        fresh = report_path(2, 'b' * 32, self.tmpdir.name)
+        for path in (stale, fresh):
+            open(path, 'w').close()
+        expired = time.time() - REPORT_MAX_AGE - 60
+        os.utime(stale, (expired, expired))
+        result = self.run_import('b,many,c,s,x\n')
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(report_path(1, result['report_id'], self.tmpdir.name)))
+
+    def test_stream_without_readable(self):
+        # SpooledTemporaryFile before Python 3.11 has read() but no readable()
+        class Upload:
+            def __init__(self, data):
+                self.read = io.BytesIO(data).read
+
+        result = import_inventory_csv(
+            self.conn, Upload('\ufeffa,1,c,s,x\r\n"b, quoted",2,c,s,x\r\n'.encode('utf-8')), 1,
+            report_dir=self.tmpdir.name,
+        )
+        self.assertEqual(result['imported'], 2)
+        names = [row[0] for row in self.conn.execute('SELECT name FROM inventory ORDER BY id')]
+        self.assertEqual(names, ['a', 'b, quoted'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from database import ConnectionPool, LATEST_VERSION, init_db, schema_version
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'test.db')
+        self.pool = ConnectionPool(self.db_path, max_size=2, timeout=1)
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.tmpdir.cleanup()
+
+    def test_wal_mode_and_pragmas(self):
+        with self.pool.acquire() as conn:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+
+    def test_close_returns_connection_to_pool(self):
+        conn = self.pool.acquire()
+        conn.close()
+        self.assertIs(self.pool.acquire(), conn)
+        stats = self.pool.stats()
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['opened'], 1)
+
+    def test_double_close_releases_once(self):
+        conn = self.pool.acquire()
+        conn.close()
+        conn.close()
+        self.assertEqual(self.pool.stats()['idle'], 1)
+        first, second = self.pool.acquire(), self.pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(self.pool.stats()['in_use'], 2)
+
+    def test_close_after_with_block_is_a_no_op(self):
+        with self.pool.acquire() as conn:
+            pass
+        conn.close()
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_with_block_commits_and_releases(self):
+        with self.pool.acquire() as conn:
+            conn.execute('CREATE TABLE t (x INTEGER)')
+            conn.execute('INSERT INTO t VALUES (1)')
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+        with self.pool.acquire() as conn:
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM t').fetchone()[0], 1)
+
+    def test_waits_when_exhausted(self):
+        first = self.pool.acquire()
+        self.pool.acquire()
+        threading.Timer(0.1, first.close).start()
+        self.assertIs(self.pool.acquire(), first)
+        self.assertEqual(self.pool.stats()['waits'], 1)
+
+
+class MigrationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'test.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_applies_all_migrations_once(self):
+        self.assertEqual(len(init_db(self.db_path)), LATEST_VERSION)
+        self.assertEqual(init_db(self.db_path), [])
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(schema_version(conn), LATEST_VERSION)
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('idx_youtube_data_user_video', indexes)
+        conn.close()
+
+    def test_dedupes_youtube_data_before_unique_index(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''CREATE TABLE youtube_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+            video_id TEXT NOT NULL, title TEXT NOT NULL, url TEXT NOT NULL,
+            thumbnail_url TEXT, channel_name TEXT,
+            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        conn.executemany(
+            "INSERT INTO youtube_data (user_id, video_id, title, url) VALUES (1, 'v', 't', 'u')",
+            [(), ()])
+        conn.commit()
+        conn.close()
+
+        init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM youtube_data').fetchone()[0], 1)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from dubbing import DubbingTrack, fit_to_window, stretch
+
+
+class FitTests(unittest.TestCase):
+    def test_stretch_keeps_endpoints(self):
+        out = stretch(np.linspace(0, 1, 100, dtype=np.float32), 50)
+        self.assertEqual(len(out), 50)
+        self.assertAlmostEqual(out[0], 0.0)
+        self.assertAlmostEqual(out[-1], 1.0)
+
+    def test_short_speech_is_untouched_and_long_speech_capped(self):
+        samples = np.ones(80, np.float32)
+        self.assertIs(fit_to_window(samples, 100), samples)
+        self.assertEqual(len(fit_to_window(np.ones(120, np.float32), 100)), 100)
+        self.assertEqual(len(fit_to_window(np.ones(300, np.float32), 100, max_speedup=1.5)), 200)
+
+
+class DubbingTrackTests(unittest.TestCase):
+    def test_places_segments_on_the_timeline(self):
+        track = DubbingTrack(duration=3.0, sample_rate=10)
+        first = track.place(np.full(5, 0.5, np.float32), start=0.0, end=1.0)
+        second = track.place(np.full(15, 0.5, np.float32), start=1.0, end=2.0)
+        self.assertEqual((first['start_sample'], first['end_sample']), (0, 5))
+        self.assertEqual((second['start_sample'], second['end_sample']), (10, 20))
+        self.assertEqual(second['speedup'], 1.5)
+        self.assertEqual(second['overrun'], 0.0)
+        audio = track.audio()
+        self.assertEqual(len(audio), 30)
+        self.assertTrue(np.all(audio[5:10] == 0))
+
+    def test_overrun_mixes_into_next_gap_and_extends_buffer(self):
+        track = DubbingTrack(duration=1.0, sample_rate=10)
+        placed = track.place(np.full(30, 0.8, np.float32), start=0.5, end=1.0)
+        self.assertEqual(placed['overrun'], 1.5)
+        self.assertEqual(len(track.audio()), 25)
+        track.place(np.full(5, 0.8, np.float32), start=0.5, end=1.0)
+        self.assertEqual(track.audio().max(), 1.0)
+
+    def test_overlapping_segments_are_clipped_to_full_scale(self):
+        track = DubbingTrack(duration=2.0, sample_rate=10)
+        track.place(np.full(10, 0.7, np.float32), start=0.0, end=1.0)
+        track.place(np.full(10, 0.6, np.float32), start=0.5, end=1.5)
+        track.place(np.full(10, -0.9, np.float32), start=1.0, end=2.0)
+        track.place(np.full(5, -0.4, np.float32), start=1.5, end=2.0)
+        audio = track.audio()
+        np.testing.assert_allclose(audio[:5], 0.7)
+        np.testing.assert_allclose(audio[5:10], 1.0)  # 0.7 + 0.6
+        np.testing.assert_allclose(audio[10:15], -0.3, rtol=1e-6)  # 0.6 - 0.9
+        np.testing.assert_allclose(audio[15:20], -1.0)  # -0.9 - 0.4
+        self.assertAlmostEqual(float(track.buffer[5]), 1.3, places=5)  # the mix itself isn't clipped
+
+
+if __name__ == '__main__':
+    unittest.main()
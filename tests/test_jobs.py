@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import jobs
+from database import ConnectionPool, init_db
+
+
+class JobQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'test.db')
+        init_db(self.db_path)
+        self.pool = ConnectionPool(self.db_path, max_size=1)
+        self.conn = self.pool.acquire()
+        self.calls = []
+
+        @jobs.job_handler('test_echo')
+        def echo(conn, job, payload, progress):
+            progress(0.5, 'halfway')
+            self.calls.append(payload)
+            if payload.get('fail'):
+                raise RuntimeError('boom')
+            return {'message': 'done', 'value': payload['value']}
+
+    def tearDown(self):
+        jobs.HANDLERS.pop('test_echo', None)
+        self.conn.close()
+        self.pool.close_all()
+        self.tmpdir.cleanup()
+
+    def test_worker_runs_job_to_completion(self):
+        job_id = jobs.enqueue(self.conn, 1, 'test_echo', {'value': 7})
+        jobs.run_worker(self.db_path, kinds=['test_echo'], once=True)
+        job = jobs.get_job(self.conn, job_id, 1)
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['progress'], 1)
+        self.assertEqual(job['message'], 'done')
+        self.assertEqual(self.calls, [{'value': 7}])
+
+    def test_failed_job_is_retried_then_failed(self):
+        job_id = jobs.enqueue(self.conn, 1, 'test_echo', {'fail': True}, max_attempts=2)
+        job = jobs.claim_job(self.conn, 'test', ['test_echo'])
+        jobs.run_job(self.conn, job)
+        job = jobs.get_job(self.conn, job_id, 1)
+        self.assertEqual(job['status'], 'queued')
+        self.assertIsNone(jobs.claim_job(self.conn, 'test', ['test_echo']))
+
+        self.conn.execute("UPDATE jobs SET run_after = datetime('now', '-1 seconds')")
+        self.conn.commit()
+        jobs.run_job(self.conn, jobs.claim_job(self.conn, 'test', ['test_echo']))
+        self.assertEqual(jobs.get_job(self.conn, job_id, 1)['status'], 'failed')
+
+    def test_failing_handler_leaves_no_partial_rows(self):
+        @jobs.job_handler('test_partial')
+        def partial(conn, job, payload, progress):
+            conn.execute(
+                "INSERT INTO youtube_data (user_id, video_id, title, url) "
+                "VALUES (1, 'abc', 'A video', 'https://youtu.be/abc')")
+            progress(0.5, 'half imported')
+            raise RuntimeError('listing failed')
+        self.addCleanup(jobs.HANDLERS.pop, 'test_partial', None)
+
+        job_id = jobs.enqueue(self.conn, 1, 'test_partial', {}, max_attempts=1)
+        jobs.run_job(self.conn, jobs.claim_job(self.conn, 'test', ['test_partial']))
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM youtube_data').fetchone()[0], 0)
+        self.assertEqual(jobs.get_job(self.conn, job_id, 1)['status'], 'failed')
+
+    def test_progress_between_transactions_is_committed(self):
+        job_id = jobs.enqueue(self.conn, 1, 'test_echo', {'value': 1})
+        job = jobs.claim_job(self.conn, 'test', ['test_echo'])
+        seen = []
+
+        @jobs.job_handler('test_echo')
+        def echo(conn, job, payload, progress):
+            progress(0.5, 'halfway')
+            other = sqlite3.connect(self.db_path)
+            seen.append(other.execute(
+                'SELECT message FROM jobs WHERE id = ?', (job_id,)).fetchone()[0])
+            other.close()
+            return {}
+
+        jobs.run_job(self.conn, job)
+        self.assertEqual(seen, ['halfway'])
+
+    def test_heartbeat_keeps_long_job_from_being_requeued(self):
+        requeued = []
+
+        @jobs.job_handler('test_slow')
+        def slow(conn, job, payload, progress):
+            # No progress calls; only the heartbeat thread can refresh the job
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = datetime('now', '-1 hours') WHERE id = ?",
+                (job['id'],),
+            )
+            conn.commit()
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                if not conn.execute(
+                    "SELECT 1 FROM jobs WHERE id = ? AND heartbeat_at < datetime('now', '-60 seconds')",
+                    (job['id'],),
+                ).fetchone():
+                    break
+            requeued.append(jobs.requeue_stale(conn, stale_after=60))
+        self.addCleanup(jobs.HANDLERS.pop, 'test_slow')
+
+        job_id = jobs.enqueue(self.conn, 1, 'test_slow', {})
+        jobs.run_job(self.conn, jobs.claim_job(self.conn, 'test', ['test_slow']),
+                     heartbeat_interval=0.05)
+        self.assertEqual(requeued, [0])
+        self.assertEqual(jobs.get_job(self.conn, job_id, 1)['status'], 'completed')
+
+    def test_stale_job_without_attempts_left_fails(self):
+        retry = jobs.enqueue(self.conn, 1, 'test_echo', {}, max_attempts=2)
+        exhausted = jobs.enqueue(self.conn, 1, 'test_echo', {}, max_attempts=1)
+        for _ in range(2):
+            jobs.claim_job(self.conn, 'test', ['test_echo'])
+        self.conn.execute("UPDATE jobs SET heartbeat_at = datetime('now', '-1 hours')")
+        self.conn.commit()
+        self.assertEqual(jobs.requeue_stale(self.conn, stale_after=60), 2)
+        self.assertEqual(jobs.get_job(self.conn, retry, 1)['status'], 'queued')
+        self.assertEqual(jobs.get_job(self.conn, exhausted, 1)['status'], 'failed')
+
+    def test_kind_limit_caps_running_jobs(self):
+        jobs.KIND_LIMITS['test_echo'] = 1
+        self.addCleanup(jobs.KIND_LIMITS.pop, 'test_echo')
+        jobs.enqueue(self.conn, 1, 'test_echo', {'value': 1})
+        jobs.enqueue(self.conn, 1, 'test_echo', {'value': 2})
+        self.assertIsNotNone(jobs.claim_job(self.conn, 'a', ['test_echo']))
+        self.assertIsNone(jobs.claim_job(self.conn, 'b', ['test_echo']))
+
+    def test_schedules_stale_channels_once(self):
+        self.conn.executemany(
+            'INSERT INTO youtube_channels (user_id, channel_url, last_synced_at) VALUES (1, ?, ?)',
+            [('https://youtube.com/c/old', '2000-01-01'),
+             ('https://youtube.com/c/new', '2999-01-01')],
+        )
+        self.conn.commit()
+        self.assertEqual(jobs.schedule_channel_syncs(self.conn, interval=3600), 1)
+        self.assertEqual(jobs.schedule_channel_syncs(self.conn, interval=3600), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
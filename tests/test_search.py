@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import search
+from crawl_store import save_crawl_record
+from database import migrate
+
+
+class SearchIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, 'test.db'))
+        migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def add_video(self, user_id, title, transcript):
+        return self.conn.execute(
+            'INSERT INTO videos (user_id, url, title, transcript) VALUES (?, ?, ?, ?)',
+            (user_id, 'https://youtu.be/x', title, transcript),
+        ).lastrowid
+
+    def kinds(self, user_id, query, **kwargs):
+        results, _ = search.search(self.conn, user_id, query, **kwargs)
+        return [(r['kind'], r['ref_id']) for r in results]
+
+    def test_triggers_keep_index_in_sync(self):
+        video_id = self.add_video(1, 'Soldering basics', 'flux and solder')
+        self.assertEqual(self.kinds(1, 'flux'), [('video', video_id)])
+        self.conn.execute("UPDATE videos SET transcript = 'tin the tip' WHERE id = ?", (video_id,))
+        self.assertEqual(self.kinds(1, 'flux'), [])
+        self.assertEqual(self.kinds(1, 'tin'), [('video', video_id)])
+        self.conn.execute('DELETE FROM videos WHERE id = ?', (video_id,))
+        self.assertEqual(self.kinds(1, 'tin'), [])
+
+    def test_only_indexed_columns_reindex_on_update(self):
+        item_id = self.conn.execute(
+            "INSERT INTO inventory (user_id, name, quantity, category, sector, application) "
+            "VALUES (1, 'Hex wrench', 3, 'Tools', 'Workshop', 'Assembly')").lastrowid
+        rowid = item_id * 4 + search.KINDS['inventory']
+        # Drop the entry by hand so a re-index would be visible
+        self.conn.execute('DELETE FROM search_index WHERE rowid = ?', (rowid,))
+        self.conn.execute('UPDATE inventory SET quantity = 4 WHERE id = ?', (item_id,))
+        self.assertEqual(self.kinds(1, 'wrench'), [])
+        self.conn.execute("UPDATE inventory SET category = 'Hand tools' WHERE id = ?", (item_id,))
+        self.assertEqual(self.kinds(1, 'hand wrench'), [('inventory', item_id)])
+
+    def test_upgrade_narrows_existing_update_triggers(self):
+        self.conn.execute('DROP TRIGGER inventory_search_update')
+        self.conn.execute(
+            'CREATE TRIGGER inventory_search_update AFTER UPDATE ON inventory BEGIN SELECT 1; END')
+        for statement in search.NARROW_UPDATE_TRIGGER_STATEMENTS:
+            self.conn.execute(statement)
+        sql = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'inventory_search_update'").fetchone()[0]
+        self.assertIn('AFTER UPDATE OF user_id, name, category, application ON inventory', sql)
+
+    def test_results_are_per_user_ranked_and_highlighted(self):
+        self.add_video(2, 'Resistors', 'resistor colour codes')
+        item_id = self.conn.execute(
+            "INSERT INTO inventory (user_id, name, quantity, category, sector, application) "
+            "VALUES (1, 'Resistor 10k', 5, 'passive', 'electronics', 'pull-up')"
+        ).lastrowid
+        video_id = self.add_video(1, 'Capacitors', 'a resistor in series')
+        self.assertEqual(self.kinds(1, 'resist'), [('inventory', item_id), ('video', video_id)])
+        self.assertEqual(self.kinds(1, 'resist', kind='video'), [('video', video_id)])
+        results, _ = search.search(self.conn, 1, 'series')
+        self.assertIn('<mark>series</mark>', results[0]['snippet'])
+
+    def test_crawls_and_pagination(self):
+        for i in range(3):
+            save_crawl_record(self.conn, 1, f'https://example.com/{i}',
+                              {'markdown': f'widget page {i}', 'links': []})
+        page, has_more = search.search(self.conn, 1, 'widget', per_page=2)
+        self.assertEqual([r['kind'] for r in page], ['crawl', 'crawl'])
+        self.assertTrue(has_more)
+        page, has_more = search.search(self.conn, 1, 'widget', page=2, per_page=2)
+        self.assertEqual(len(page), 1)
+        self.assertFalse(has_more)
+
+    def test_query_syntax_is_escaped(self):
+        self.add_video(1, 'AND OR', 'quote "me" (please)')
+        self.assertEqual(len(self.kinds(1, '"me" OR (')), 1)
+        self.assertEqual(self.kinds(1, '*** ""'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
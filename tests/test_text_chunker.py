@@ -0,0 +1,68 @@
+import unittest
+
+from text_chunker import chunk_text, split_sentences
+
+
+class SplitSentencesTests(unittest.TestCase):
+    def test_splits_on_all_terminators(self):
+        self.assertEqual(
+            split_sentences('Is it late? Yes! It was... Really late. "Quoted." Done'),
+            ['Is it late?', 'Yes!', 'It was...', 'Really late.', '"Quoted."', 'Done.'],
+        )
+
+    def test_keeps_abbreviations_initials_and_numbers(self):
+        self.assertEqual(
+            split_sentences('Dr. Smith paid $3.50 at 5 p.m. on Jan. 5th, e.g. for J. K. Rowling. Next.'),
+            ['Dr. Smith paid $3.50 at 5 p.m. on Jan. 5th, e.g. for J. K. Rowling.', 'Next.'],
+        )
+
+    def test_no_stray_periods(self):
+        self.assertEqual(split_sentences('One. . . Two.\n\n.\n\nTitle'), ['One.', 'Two.', 'Title.'])
+        self.assertEqual(split_sentences('  \n. '), [])
+
+
+class ChunkTextTests(unittest.TestCase):
+    def test_respects_limit_and_sentence_boundaries(self):
+        text = ' '.join(f'Sentence number {i} is here.' for i in range(40))
+        chunks = chunk_text(text, max_tokens=100)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertTrue(all(chunk.endswith('.') for chunk in chunks))
+        self.assertEqual(' '.join(chunks), text)
+
+    def test_balances_chunk_sizes(self):
+        text = ' '.join(['A short sentence here.'] * 10)  # 229 characters
+        unbalanced = chunk_text(text, max_tokens=200, balance=False)
+        balanced = chunk_text(text, max_tokens=200)
+        self.assertEqual([len(c) for c in unbalanced], [183, 45])
+        self.assertEqual([len(c) for c in balanced], [114, 114])
+
+    def test_long_sentences_split_at_clauses_then_words(self):
+        text = 'first clause here, second clause here, ' + 'word ' * 30 + 'end'
+        chunks = chunk_text(text, max_tokens=40)
+        self.assertTrue(all(len(chunk) <= 40 for chunk in chunks))
+        self.assertEqual(chunks[0], 'first clause here, second clause here,')
+        self.assertEqual(chunk_text('x' * 90, max_tokens=40), ['x' * 40, 'x' * 40, 'x' * 10 + '.'])
+
+    def test_long_sentence_is_balanced_not_filled(self):
+        chunks = chunk_text(' '.join(['word'] * 200), max_tokens=300)
+        sizes = [len(chunk) for chunk in chunks]
+        self.assertEqual(len(sizes), 4)
+        self.assertLessEqual(max(sizes), 300)
+        self.assertLessEqual(max(sizes) - min(sizes), 10)
+
+    def test_last_resort_slices_use_the_counter(self):
+        with_eos = lambda chunk: len(chunk) + 1  # like SpeechT5's end-of-sequence token
+        chunks = chunk_text('x' * 90, max_tokens=40, count=with_eos)
+        self.assertTrue(all(with_eos(chunk) <= 40 for chunk in chunks))
+        self.assertEqual(''.join(chunks), 'x' * 90 + '.')
+
+    def test_custom_counter(self):
+        words = lambda chunk: len(chunk.split())
+        self.assertEqual(
+            chunk_text('One two three. Four five six. Seven eight.', max_tokens=3, count=words),
+            ['One two three.', 'Four five six.', 'Seven eight.'],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+try:
+    import torch
+    import text_to_speech_hf as tts
+except ImportError:  # torch and transformers come from requirements_tts.txt
+    tts = None
+
+HOP = 256  # samples per spectrogram frame from the stub vocoder
+FRAMES_PER_TOKEN = 3
+
+
+class StubProcessor:
+    """One token per word, every token of a text set to the text's length"""
+
+    def __call__(self, text, return_tensors, padding):
+        width = max(len(t.split()) for t in text)
+        ids = torch.zeros(len(text), width, dtype=torch.long)
+        mask = torch.zeros(len(text), width, dtype=torch.long)
+        for row, t in enumerate(text):
+            ids[row, :len(t.split())] = len(t)
+            mask[row, :len(t.split())] = 1
+        return StubEncoding(input_ids=ids, attention_mask=mask)
+
+
+class StubEncoding(dict):
+    def to(self, device):
+        return self
+
+
+class StubModel:
+    """Spectrogram frames filled with the token value, padded to the longest"""
+
+    def __init__(self):
+        self.batches = []
+
+    def generate_speech(self, input_ids, embeddings, attention_mask=None,
+                        vocoder=None, return_output_lengths=False):
+        self.batches.append(len(input_ids))
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        lengths = attention_mask.sum(dim=1) * FRAMES_PER_TOKEN
+        spectrograms = torch.zeros(len(input_ids), int(lengths.max()), 80)
+        for row, length in enumerate(lengths):
+            spectrograms[row, :length] = float(input_ids[row, 0])
+        if vocoder is not None:
+            return vocoder(spectrograms)[0]
+        return spectrograms, lengths
+
+
+def stub_vocoder(spectrograms):
+    return spectrograms[:, :, 0].repeat_interleave(HOP, dim=1)
+
+
+@unittest.skipIf(tts is None, 'TTS dependencies are not installed')
+class LazyLoadingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.voice_dir = Path(self.tmpdir.name, 'voices')
+        for patcher in (
+            mock.patch.dict(tts._models, clear=True),
+            mock.patch.dict(tts._voices, clear=True),
+            mock.patch.dict(tts.VOICES),
+            mock.patch.object(tts, 'VOICE_DIR', self.voice_dir),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.loaders = {}
+        for name in ('SpeechT5Processor', 'SpeechT5ForTextToSpeech', 'SpeechT5HifiGan'):
+            patcher = mock.patch.object(tts, name)
+            self.loaders[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.dataset = mock.Mock()
+        patcher = mock.patch.dict('sys.modules', {'datasets': self.dataset})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make(self, **kwargs):
+        return tts.TextToSpeechHF(output_dir=os.path.join(self.tmpdir.name, 'out'), **kwargs)
+
+    def test_models_load_on_first_use_and_are_shared(self):
+        first = self.make()
+        for loader in self.loaders.values():
+            loader.from_pretrained.assert_not_called()
+        first.model
+        first.vocoder
+        second = self.make()
+        second.processor
+        for loader in self.loaders.values():
+            loader.from_pretrained.assert_called_once()
+        self.assertEqual(first.timings['models']['load'], 'cold')
+        self.assertEqual(second.timings['models']['load'], 'warm')
+        self.dataset.load_dataset.assert_not_called()
+
+    def test_instances_leave_torch_threads_alone(self):
+        with mock.patch.object(tts.torch, 'set_num_threads') as set_num_threads:
+            self.make().model
+        set_num_threads.assert_not_called()
+
+    def test_dataset_voice_streams_its_row_and_is_saved(self):
+        tts.register_voice('third', 2)
+        rows = [{'xvector': [float(i)] * 512} for i in range(5)]
+        self.dataset.load_dataset.return_value = iter(rows)
+        embedding, _, origin = tts.load_voice('third')
+        self.assertEqual(origin, 'dataset')
+        self.assertEqual(tuple(embedding.shape), (1, 512))
+        self.assertEqual(float(embedding[0, 0]), 2.0)
+        self.dataset.load_dataset.assert_called_once_with(
+            tts.XVECTOR_DATASET, split='validation', streaming=True)
+        np.testing.assert_array_equal(np.load(self.voice_dir / 'xvector_2.npy'), rows[2]['xvector'])
+
+    def test_cached_voice_skips_the_dataset(self):
+        self.voice_dir.mkdir()
+        np.save(self.voice_dir / 'xvector_7306.npy', np.full(512, 0.25, np.float32))
+        speaker = self.make().speaker_embeddings
+        self.assertEqual(float(speaker[0, 0]), 0.25)
+        self.dataset.load_dataset.assert_not_called()
+        self.assertEqual(tts.load_voice('default')[2], 'memory')
+
+    def test_unknown_voice_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.make(voice='nobody')
+        with self.assertRaises(ValueError):
+            tts.load_voice('nobody')
+        self.dataset.load_dataset.assert_not_called()
+
+
+@unittest.skipIf(tts is None, 'TTS dependencies are not installed')
+class BatchSynthesisTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.model = StubModel()
+        patcher = mock.patch.object(
+            tts, 'load_models',
+            return_value=((StubProcessor(), self.model, stub_vocoder), 0.0, False))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.texts = ['one', 'two words', 'a text of five words', 'four words in here', 'x y']
+
+    def synthesize(self, batch_size):
+        engine = tts.TextToSpeechHF(output_dir=self.tmpdir.name, batch_size=batch_size)
+        return list(engine._synthesize(self.texts, torch.zeros(1, 512)))
+
+    def assert_waveforms(self, waveforms):
+        self.assertEqual(len(waveforms), len(self.texts))
+        for text, waveform in zip(self.texts, waveforms):
+            self.assertEqual(len(waveform), len(text.split()) * FRAMES_PER_TOKEN * HOP)
+            # every sample carries the value of the text it was made from
+            np.testing.assert_array_equal(np.unique(waveform), [len(text)])
+
+    def test_batches_are_trimmed_per_chunk_in_input_order(self):
+        self.assert_waveforms(self.synthesize(batch_size=2))
+        self.assertEqual(self.model.batches, [2, 2, 1])
+
+    def test_one_batch_matches_unbatched_output(self):
+        self.assert_waveforms(self.synthesize(batch_size=8))
+        self.assertEqual(self.model.batches, [5])
+        self.assert_waveforms(self.synthesize(batch_size=1))
+        self.assertEqual(self.model.batches, [5, 1, 1, 1, 1, 1])
+
+
+    def test_dub_warns_once_per_overrun_segment(self):
+        engine = tts.TextToSpeechHF(output_dir=self.tmpdir.name)
+        entries = [
+            {'segment': 0, 'text': 'one', 'start': 0.0, 'end': 0.01},
+            {'segment': 1, 'text': 'x y', 'start': 1.0, 'end': 2.0},
+            {'segment': 2, 'text': 'two words', 'start': 2.0, 'end': 2.01},
+        ]
+        with mock.patch.object(engine, '_synthesize', return_value=iter(
+                np.zeros(len(e['text'].split()) * FRAMES_PER_TOKEN * HOP, np.float32)
+                for e in entries)), \
+                self.assertLogs(engine.logger, 'WARNING') as logs:
+            engine._write_dub(entries, None, Path(self.tmpdir.name), 'now')
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('Segment 0 ', logs.output[0])
+        self.assertIn('Segment 2 ', logs.output[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
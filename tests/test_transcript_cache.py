@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from transcript_cache import TranscriptCache, hash_file, transcript_key, video_id
+
+TRANSCRIPTION = {
+    'text': 'Hello there. General Kenobi.',
+    'language': 'en',
+    'segments': [
+        {'start': 0.0, 'end': 1.5, 'text': ' Hello there.'},
+        {'start': 61.2, 'end': 63.0, 'text': ' General Kenobi.'},
+    ],
+}
+
+
+class TranscriptCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = TranscriptCache(os.path.join(self.tmp.name, 'cache'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_writes_all_formats_once(self):
+        entry = self.cache.put('whisper:base', 'a' * 64, TRANSCRIPTION, 'Clip', 63.0, 'dQw4w9WgXcQ')
+        self.assertEqual(entry['key'], transcript_key('whisper:base', 'a' * 64))
+        with open(entry['paths']['srt_path'], encoding='utf-8') as f:
+            self.assertEqual(
+                f.read(),
+                '1\n0:00:00,000 --> 0:00:01,000\nHello there.\n\n'
+                '2\n0:01:01,000 --> 0:01:03,000\nGeneral Kenobi.\n\n',
+            )
+        with open(entry['paths']['text_path'], encoding='utf-8') as f:
+            self.assertEqual(f.readline(), '[0:00:00 --> 0:00:01] Hello there.\n')
+        self.assertEqual(self.cache.load(entry['key']), TRANSCRIPTION)
+        leftovers = [name for name in os.listdir(os.path.dirname(entry['paths']['json_path']))
+                     if name.endswith('.tmp') or '.tmp.' in name]
+        self.assertEqual(leftovers, [])
+
+    def test_lookup_by_video_and_audio(self):
+        entry = self.cache.put('whisper:base', 'a' * 64, TRANSCRIPTION, 'Clip', 63.0, 'dQw4w9WgXcQ')
+        self.assertEqual(self.cache.lookup_video('dQw4w9WgXcQ', 'whisper:base')['key'], entry['key'])
+        self.assertIsNone(self.cache.lookup_video('dQw4w9WgXcQ', 'openai:whisper-1'))
+        self.assertIsNone(self.cache.lookup_video('otherVideo1', 'whisper:base'))
+
+        # A re-upload with identical audio is found by hash and linked to its id
+        reused = self.cache.lookup_audio('a' * 64, 'whisper:base')
+        self.cache.link('otherVideo1', 'whisper:base', reused['key'])
+        self.assertEqual(self.cache.lookup_video('otherVideo1', 'whisper:base')['key'], entry['key'])
+        self.assertEqual(self.cache.stats()['hits'], 3)
+
+    def test_missing_files_are_a_miss(self):
+        entry = self.cache.put('whisper:base', 'b' * 64, TRANSCRIPTION, 'Clip', 63.0, 'dQw4w9WgXcQ')
+        os.remove(entry['paths']['srt_path'])
+        self.assertIsNone(self.cache.lookup_video('dQw4w9WgXcQ', 'whisper:base'))
+
+    def test_helpers(self):
+        self.assertEqual(video_id('https://youtu.be/dQw4w9WgXcQ?t=3'), 'dQw4w9WgXcQ')
+        self.assertIsNone(video_id('https://example.com/audio.mp3'))
+        path = os.path.join(self.tmp.name, 'audio.bin')
+        with open(path, 'wb') as f:
+            f.write(b'abc')
+        self.assertEqual(
+            hash_file(path), 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
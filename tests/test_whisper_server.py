@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from whisper_server import ModelPool, TranscriptionServer, WhisperClient, WhisperServerError, make_server
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def transcribe(self, audio, **options):
+        if isinstance(audio, str) and audio.endswith('.bad'):
+            raise RuntimeError('cannot decode')
+        samples = len(audio) if not isinstance(audio, str) else 0
+        return {
+            'text': f'{self.name} heard {samples} samples',
+            'segments': [{'start': 0.0, 'end': np.float32(1.5), 'text': 'hi'}],
+            'options': sorted(options),
+        }
+
+
+class ModelPoolTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        loaded = []
+        pool = ModelPool(max_models=2, loader=lambda name: loaded.append(name) or FakeModel(name))
+        pool.get('tiny')
+        pool.get('base')
+        self.assertEqual(pool.get('tiny')[1], 0.0)
+        pool.get('small')
+        self.assertEqual(pool.loaded(), ['tiny', 'small'])
+        self.assertEqual(loaded, ['tiny', 'base', 'small'])
+        self.assertEqual(pool.evictions, 1)
+
+
+class ServerTests(unittest.TestCase):
+    def setUp(self):
+        transcriber = TranscriptionServer(ModelPool(loader=FakeModel))
+        self.httpd = make_server('127.0.0.1', 0, transcriber)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.client = WhisperClient(f'http://127.0.0.1:{self.httpd.server_address[1]}')
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.tmp.cleanup()
+
+    def test_transcribes_paths_and_pcm(self):
+        path = os.path.join(self.tmp.name, 'audio.m4a')
+        open(path, 'wb').close()
+        result, timings = self.client.transcribe(path, 'base', word_timestamps=True)
+        self.assertEqual(result['text'], 'base heard 0 samples')
+        self.assertEqual(result['segments'][0]['end'], 1.5)
+        self.assertEqual(result['options'], ['verbose', 'word_timestamps'])
+        self.assertEqual(set(timings), {'queued_seconds', 'load_seconds', 'inference_seconds'})
+
+        result, timings = self.client.transcribe(np.zeros(16000, np.float32), 'base')
+        self.assertEqual(result['text'], 'base heard 16000 samples')
+        self.assertEqual(timings['load_seconds'], 0.0)
+
+        status = self.client.status()
+        self.assertEqual(status['models'], ['base'])
+        self.assertEqual(status['requests'], 2)
+
+    def test_errors_are_reported(self):
+        with self.assertRaises(WhisperServerError):
+            self.client.transcribe(os.path.join(self.tmp.name, 'missing.m4a'))
+        path = os.path.join(self.tmp.name, 'audio.bad')
+        open(path, 'wb').close()
+        with self.assertRaisesRegex(WhisperServerError, 'cannot decode'):
+            self.client.transcribe(path)
+        self.assertEqual(self.client.status()['failed'], 1)
+
+    def test_unreachable_server_raises_oserror(self):
+        with self.assertRaises(OSError):
+            WhisperClient('http://127.0.0.1:9', timeout=2).transcribe(np.zeros(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import youtube_extractor
+from youtube_extractor import YouTubeExtractor, read_jsonl
+
+
+class ResumeTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.extractor = YouTubeExtractor(self.tmpdir.name, titles=False)
+        patcher = mock.patch.object(
+            youtube_extractor, 'resolve_channel',
+            return_value=('https://youtube.com/@chan', 'Chan', {}),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def extract(self, ids, **kwargs):
+        entries = lambda channel_url: ({'id': i, 'title': f'Video {i}'} for i in ids)
+        with mock.patch.object(youtube_extractor, 'iter_channel_entries', entries):
+            return self.extractor.extract_channel_data('https://youtube.com/@chan', **kwargs)
+
+    def interrupted_cursor(self, ids, stop_after):
+        # A run that died after checkpointing ``stop_after`` videos
+        with mock.patch.object(youtube_extractor, 'CHECKPOINT_EVERY', 1):
+            result = self.extract(ids, max_videos=stop_after)
+        with open(result['cursor_file'], encoding='utf-8') as f:
+            cursor = json.load(f)
+        cursor['complete'] = False
+        with open(result['cursor_file'], 'w', encoding='utf-8') as f:
+            json.dump(cursor, f)
+        return result
+
+    def test_resumes_after_last_video(self):
+        self.interrupted_cursor(['a', 'b', 'c', 'd'], 2)
+        result = self.extract(['a', 'b', 'c', 'd'])
+        videos = [v['video_id'] for v in read_jsonl(result['jsonl_file'])]
+        self.assertEqual(videos, ['a', 'b', 'c', 'd'])
+
+    def test_restarts_when_last_video_is_gone(self):
+        self.interrupted_cursor(['a', 'b', 'c', 'd'], 2)
+        result = self.extract(['a', 'c', 'd'])
+        videos = [v['video_id'] for v in read_jsonl(result['jsonl_file'])]
+        self.assertEqual(videos, ['a', 'c', 'd'])
+        self.assertEqual(result['video_count'], 3)
+        self.assertTrue(os.path.exists(result['cursor_file']))
+
+
+class ExtractChannelsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.extractor = YouTubeExtractor(self.tmpdir.name, titles=False)
+
+    def test_urls_for_the_same_channel_are_extracted_once(self):
+        channels = {
+            'https://youtube.com/@chan': 'Chan',
+            'https://youtube.com/watch?v=aaaaaaaaaaa': 'Chan',
+            'https://youtube.com/@other': 'Other',
+        }
+        walked = []
+
+        def resolve(url):
+            return f'https://youtube.com/@{channels[url]}', channels[url], {}
+
+        def entries(channel_url):
+            walked.append(channel_url)
+            for i in range(3):
+                time.sleep(0.01)  # keep the extractions overlapping
+                yield {'id': f'{channel_url[-5:]}{i}', 'title': f'Video {i}'}
+
+        with mock.patch.object(youtube_extractor, 'resolve_channel', resolve), \
+                mock.patch.object(youtube_extractor, 'iter_channel_entries', entries):
+            summary = self.extractor.extract_channels(list(channels), workers=3)
+
+        self.assertEqual((summary['completed'], summary['duplicates'], summary['failed']),
+                         (2, 1, 0))
+        self.assertEqual(summary['video_count'], 6)
+        self.assertEqual(sorted(walked), ['https://youtube.com/@Chan', 'https://youtube.com/@Other'])
+        duplicate = next(c for c in summary['channels'] if c['status'] == 'duplicate')
+        completed = {c['url']: c for c in summary['channels'] if c['status'] == 'completed'}
+        self.assertIn(duplicate['duplicate_of'], completed)
+        videos = list(read_jsonl(completed[duplicate['duplicate_of']]['jsonl_file']))
+        self.assertEqual(len(videos), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import youtube_import
+from database import migrate
+from youtube_import import import_videos
+
+
+def video(video_id, title, thumbnail='https://i.ytimg.com/a.jpg'):
+    return {
+        'video_id': video_id,
+        'title': title,
+        'url': f'https://youtube.com/watch?v={video_id}',
+        'thumbnail_url': thumbnail,
+        'channel_name': 'Channel',
+    }
+
+
+class ImportVideosTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, 'test.db'))
+        migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_counts_added_updated_unchanged(self):
+        first = import_videos(self.conn, 1, [video('a', 'A'), video('b', 'B'), video('a', 'A')])
+        self.assertEqual(first, {'added': 2, 'updated': 0, 'unchanged': 0})
+
+        second = import_videos(self.conn, 1, [
+            video('a', 'A'), video('b', 'B renamed'), video('c', 'C'),
+        ])
+        self.assertEqual(second, {'added': 1, 'updated': 1, 'unchanged': 1})
+        self.assertEqual(
+            self.conn.execute("SELECT title FROM youtube_data WHERE video_id = 'b'").fetchone()[0],
+            'B renamed',
+        )
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM youtube_data').fetchone()[0], 3)
+
+    def test_large_channel_is_batched(self):
+        videos = [video(f'v{i}', f'Video {i}') for i in range(5000)]
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        self.assertEqual(import_videos(self.conn, 1, videos)['added'], 5000)
+        self.conn.set_trace_callback(None)
+        # Lookups in chunks of 500 plus a single executemany
+        lookups = [s for s in statements if s.lstrip().startswith('SELECT') and 'youtube_data' in s]
+        self.assertEqual(len(lookups), 10)
+
+
+class ChannelSyncTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, 'test.db'))
+        migrate(self.conn)
+        self.walked = []
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def sync(self, ids, titles=None, refresh=1, limit=youtube_import.CHANNEL_SYNC_LIMIT,
+             page_size=1):
+        titles = titles or {}
+
+        def entries(channel_url):
+            for video_id in ids:
+                self.walked.append(video_id)
+                yield {'id': video_id, 'title': titles.get(video_id, f'Video {video_id}')}
+
+        # One entry per page so ``walked`` shows exactly where a walk stopped
+        with mock.patch.object(youtube_import, 'iter_channel_entries', entries), \
+                mock.patch.object(youtube_import, 'CHANNEL_PAGE_SIZE', page_size):
+            return youtube_import.sync_channel_videos(
+                self.conn, 1, 'https://youtube.com/channel/UC1', 'Channel', refresh=refresh,
+                limit=limit)
+
+    def test_stops_after_newest_synced_video(self):
+        first = self.sync(['c', 'b', 'a'])
+        self.assertEqual((first['added'], first['new']), (3, 3))
+
+        self.walked.clear()
+        second = self.sync(['e', 'd', 'c', 'b', 'a'])
+        self.assertEqual((second['added'], second['unchanged']), (2, 1))
+        self.assertEqual(self.walked, ['e', 'd', 'c'])
+        newest, count = self.conn.execute(
+            'SELECT newest_video_id, video_count FROM youtube_channels').fetchone()
+        self.assertEqual((newest, count), ('e', 5))
+
+    def test_refreshes_recent_known_videos(self):
+        self.sync(['c', 'b', 'a'])
+        self.walked.clear()
+        counts = self.sync(['d', 'c', 'b', 'a'], titles={'b': 'B renamed'}, refresh=2)
+        self.assertEqual(
+            (counts['added'], counts['updated'], counts['unchanged']), (1, 1, 1))
+        self.assertEqual(self.walked, ['d', 'c', 'b'])
+        self.assertEqual(
+            self.conn.execute("SELECT title FROM youtube_data WHERE video_id = 'b'").fetchone()[0],
+            'B renamed',
+        )
+
+    def test_first_sync_stops_at_video_imported_elsewhere(self):
+        import_videos(self.conn, 1, [video('b', 'Video b')])
+        counts = self.sync(['c', 'b', 'a'], refresh=0)
+        self.assertEqual((counts['added'], self.walked), (1, ['c', 'b']))
+
+    def stored_ids(self):
+        return {row[0] for row in self.conn.execute('SELECT video_id FROM youtube_data')}
+
+    def test_capped_sync_is_backfilled_by_later_syncs(self):
+        first = self.sync(['e', 'd', 'c', 'b', 'a'], refresh=0, limit=2)
+        self.assertTrue(first['backfill_pending'])
+        self.assertEqual(self.stored_ids(), {'e', 'd'})
+
+        second = self.sync(['f', 'e', 'd', 'c', 'b', 'a'], refresh=0, limit=2)
+        self.assertEqual(second['added'], 2)
+        self.assertTrue(second['backfill_pending'])
+        self.assertEqual(self.stored_ids(), {'f', 'e', 'd', 'c'})
+
+        third = self.sync(['f', 'e', 'd', 'c', 'b', 'a'], refresh=0, limit=2)
+        self.assertFalse(third['backfill_pending'])
+        self.assertEqual(self.stored_ids(), {'f', 'e', 'd', 'c', 'b', 'a'})
+        newest, pending = self.conn.execute(
+            'SELECT newest_video_id, backfill_pending FROM youtube_channels').fetchone()
+        self.assertEqual((newest, pending), ('f', 0))
+
+        self.walked.clear()
+        self.sync(['f', 'e', 'd', 'c', 'b', 'a'], refresh=0, limit=2)
+        self.assertEqual(self.walked, ['f'])
+
+    def test_existence_is_checked_once_per_listing_page(self):
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        ids = [f'v{i:03d}' for i in range(65)]
+        self.sync(ids, refresh=0, page_size=30)
+        lookups = [sql for sql in statements if 'FROM youtube_data' in sql]
+        # three listing pages in the walk plus import_videos' own lookup
+        self.assertEqual(len(lookups), 4)
+        self.assertEqual(len(self.stored_ids()), 65)
+
+    def test_channel_of_exactly_the_limit_is_not_backfilled(self):
+        counts = self.sync(['b', 'a'], limit=2)
+        self.assertFalse(counts['backfill_pending'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import ffmpeg
+import numpy as np
+import yt_dlp
+
+import audio_chunks
+from transcript_cache import hash_file
+from whisper_server import ModelPool, TranscriptionServer, make_server
+from youtube_transcriber import YouTubeTranscriber
+
+
+def transcribe_in_daemon(results):
+    transcriber = YouTubeTranscriber(
+        output_dir=tempfile.mkdtemp(), use_openai=False, use_cache=False,
+        chunk_seconds=600, chunk_workers=2, server_url=None,
+    )
+    transcriber.transcribe_local = lambda path: {
+        'language': 'en',
+        'segments': [{'start': 10.0, 'end': 12.0, 'text': f' {path[-8:-4]}'}],
+    }
+    try:
+        results.put(transcriber.transcribe_chunked('audio.m4a', 2000)['text'])
+    except Exception as e:
+        results.put(repr(e))
+
+
+class ChunkedTranscriptionTests(unittest.TestCase):
+    @mock.patch.object(audio_chunks, 'extract_chunk', lambda path, start, end, out: out)
+    @mock.patch.object(audio_chunks, 'detect_silences', lambda path: [])
+    def test_daemon_process_transcribes_chunks_in_process(self):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        worker = context.Process(target=transcribe_in_daemon, args=(results,), daemon=True)
+        worker.start()
+        worker.join(30)
+        self.assertEqual(results.get(timeout=5), '0000 0001 0002')
+
+
+class BatchPipelineTests(unittest.TestCase):
+    def setUp(self):
+        self.transcriber = YouTubeTranscriber(
+            output_dir=tempfile.mkdtemp(), use_openai=False, use_cache=False, server_url=None)
+        self.transcriber.cache = mock.Mock()
+        self.transcriber.fetch_audio = mock.Mock(side_effect=OSError('offline'))
+
+    def test_cache_errors_still_produce_a_result(self):
+        self.transcriber.cache.lookup_video.side_effect = RuntimeError('index locked')
+        results, stats = self.transcriber.transcribe_videos(
+            ['https://youtube.com/watch?v=aaaaaaaaaaa'])
+        self.assertEqual(results[0]['error'], 'download: offline')
+        self.assertEqual(stats['download']['failed'], 1)
+
+    def test_unreadable_cached_transcript_is_ignored(self):
+        self.transcriber.cache.lookup_video.return_value = {'key': 'k'}
+        self.transcriber.cached_result = mock.Mock(side_effect=FileNotFoundError('k.json'))
+        results, _ = self.transcriber.transcribe_videos(
+            ['https://youtube.com/watch?v=aaaaaaaaaaa'])
+        self.assertEqual(results[0]['error'], 'download: offline')
+
+    def test_local_model_uses_one_transcribe_worker(self):
+        with mock.patch('youtube_transcriber.threading.Thread', wraps=threading.Thread) as thread:
+            self.transcriber.transcribe_videos([], transcribe_workers=4)
+        names = [call.kwargs['name'] for call in thread.call_args_list]
+        self.assertEqual([name for name in names if name.startswith('transcribe')],
+                         ['transcribe-0'])
+
+
+INFO = {
+    'title': 'A talk',
+    'duration': 120,
+    'url': 'https://media.example/audio',
+    'http_headers': {'User-Agent': 'yt'},
+}
+
+
+class FakeYoutubeDL:
+    """Writes the files yt-dlp would into the outtmpl directory"""
+
+    writes = [('audio.m4a', None)]
+    report = True
+
+    def __init__(self, opts):
+        self.opts = opts
+        FakeYoutubeDL.temp_dir = os.path.dirname(opts['outtmpl'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def process_ie_result(self, info, download=True):
+        path = None
+        for name, error in self.writes:
+            path = os.path.join(self.temp_dir, name)
+            with open(path, 'wb') as f:
+                f.write(b'audio')
+            if error is not None:
+                raise error
+        return {'requested_downloads': [{'filepath': path}] if self.report else []}
+
+
+@mock.patch('youtube_transcriber.extract_info', lambda url, opts: dict(INFO))
+@mock.patch('youtube_transcriber.yt_dlp.YoutubeDL', FakeYoutubeDL)
+class DownloadAudioTests(unittest.TestCase):
+    def setUp(self):
+        self.transcriber = YouTubeTranscriber(
+            output_dir=tempfile.mkdtemp(), use_openai=False, use_cache=False, server_url=None)
+        FakeYoutubeDL.writes = [('audio.m4a', None)]
+        FakeYoutubeDL.report = True
+
+    def test_returns_the_written_file_and_discard_removes_its_dir(self):
+        path, title, duration = self.transcriber.download_audio('https://youtu.be/x')
+        self.assertEqual(path, os.path.join(FakeYoutubeDL.temp_dir, 'audio.m4a'))
+        self.assertTrue(os.path.basename(FakeYoutubeDL.temp_dir).startswith('yt_audio_'))
+        self.assertEqual((title, duration), ('A talk', 120))
+        self.assertTrue(os.path.exists(path))
+        self.transcriber.discard_audio(path)
+        self.assertFalse(os.path.exists(FakeYoutubeDL.temp_dir))
+
+    def test_mp3_keeps_a_single_extension(self):
+        FakeYoutubeDL.writes = [('audio.mp3', None)]
+        FakeYoutubeDL.report = False
+        self.transcriber.audio_format = 'mp3'
+        path, _, _ = self.transcriber.download_audio('https://youtu.be/x')
+        self.assertEqual(os.path.basename(path), 'audio.mp3')
+        self.transcriber.discard_audio(path)
+
+    def test_failed_download_removes_partial_files(self):
+        FakeYoutubeDL.writes = [('audio.m4a.part', RuntimeError('connection reset'))]
+        with self.assertRaises(RuntimeError):
+            self.transcriber.download_audio('https://youtu.be/x')
+        self.assertFalse(os.path.exists(FakeYoutubeDL.temp_dir))
+
+    @mock.patch('youtube_transcriber.get_cache')
+    def test_retry_after_expired_url_starts_clean(self, get_cache):
+        error = yt_dlp.utils.DownloadError('HTTP Error 403')
+        FakeYoutubeDL.writes = [('audio.m4a.part', error)]
+        calls = []
+        original = FakeYoutubeDL.process_ie_result
+
+        def once(ydl, info, download=True):
+            calls.append(sorted(os.listdir(ydl.temp_dir)))
+            if len(calls) == 2:
+                FakeYoutubeDL.writes = [('audio.webm', None)]
+                FakeYoutubeDL.report = False
+            return original(ydl, info, download)
+
+        with mock.patch.object(FakeYoutubeDL, 'process_ie_result', once):
+            path, _, _ = self.transcriber.download_audio('https://youtu.be/x')
+        self.assertEqual(calls, [[], []])
+        self.assertEqual(os.path.basename(path), 'audio.webm')
+        get_cache.return_value.invalidate.assert_called_once()
+        self.transcriber.discard_audio(path)
+
+    def test_batch_discards_audio_when_hashing_fails(self):
+        self.transcriber.lookup_audio = mock.Mock(side_effect=OSError('disk error'))
+        results, _ = self.transcriber.transcribe_videos(['https://youtu.be/x'])
+        self.assertEqual(results[0]['error'], 'download: disk error')
+        self.assertFalse(os.path.exists(FakeYoutubeDL.temp_dir))
+
+
+class StreamAudioTests(unittest.TestCase):
+    def setUp(self):
+        self.transcriber = YouTubeTranscriber(
+            output_dir=tempfile.mkdtemp(), use_openai=False, use_cache=False,
+            stream=True, chunk_seconds=600, server_url=None)
+
+    @mock.patch('youtube_transcriber.extract_info', lambda url, opts: dict(INFO))
+    @mock.patch.object(audio_chunks, 'load_pcm')
+    def test_decodes_the_stream_url_with_its_headers(self, load_pcm):
+        samples = np.zeros(16000, np.float32)
+        load_pcm.return_value = samples
+        audio, title, duration = self.transcriber.fetch_audio('https://youtu.be/x')
+        self.assertIs(audio, samples)
+        self.assertEqual((title, duration), ('A talk', 120))
+        load_pcm.assert_called_once_with(INFO['url'], INFO['http_headers'])
+        self.transcriber.discard_audio(audio)  # PCM needs no cleanup
+
+    @mock.patch('youtube_transcriber.get_cache')
+    @mock.patch('youtube_transcriber.extract_info', lambda url, opts: dict(INFO))
+    @mock.patch.object(audio_chunks, 'load_pcm')
+    def test_expired_stream_url_is_refreshed_once(self, load_pcm, get_cache):
+        load_pcm.side_effect = [ffmpeg.Error('ffmpeg', b'', b'403'), np.zeros(10, np.float32)]
+        audio, _, _ = self.transcriber.stream_audio('https://youtu.be/x')
+        self.assertEqual(len(audio), 10)
+        self.assertEqual(load_pcm.call_count, 2)
+        get_cache.return_value.invalidate.assert_called_once()
+
+    @mock.patch('youtube_transcriber.extract_info', lambda url, opts: dict(INFO, duration=2000))
+    def test_long_videos_are_downloaded_for_chunking(self):
+        self.transcriber.download_audio = mock.Mock(return_value=('audio.m4a', 'A talk', 2000))
+        self.transcriber.stream_audio = mock.Mock()
+        self.assertEqual(self.transcriber.fetch_audio('https://youtu.be/x')[0], 'audio.m4a')
+        self.transcriber.stream_audio.assert_not_called()
+
+
+class AudioHashTests(unittest.TestCase):
+    def setUp(self):
+        self.transcriber = YouTubeTranscriber(
+            output_dir=tempfile.mkdtemp(), use_openai=False, use_cache=False, server_url=None)
+        self.path = os.path.join(tempfile.mkdtemp(), 'audio.m4a')
+        with open(self.path, 'wb') as f:
+            f.write(b'm4a bytes')
+        self.samples = np.zeros(16000, np.float32)
+
+    def hashes(self, info):
+        with mock.patch('youtube_transcriber.extract_info', lambda url, opts: info):
+            return (self.transcriber.audio_hash('https://youtu.be/abcdefghijk', self.path),
+                    self.transcriber.audio_hash('https://youtu.be/abcdefghijk', self.samples))
+
+    def test_download_and_stream_share_a_hash(self):
+        downloaded, streamed = self.hashes(
+            dict(INFO, id='abcdefghijk', format_id='140', filesize=1234))
+        self.assertEqual(downloaded, streamed)
+        other_format, _ = self.hashes(dict(INFO, id='abcdefghijk', format_id='251', filesize=999))
+        self.assertNotEqual(downloaded, other_format)
+
+    def test_falls_back_to_content_without_format_info(self):
+        downloaded, streamed = self.hashes(dict(INFO))
+        self.assertEqual(downloaded, hash_file(self.path))
+        self.assertNotEqual(downloaded, streamed)
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def transcribe(self, audio, **options):
+        return {'text': f'{self.name} heard {len(audio) if not isinstance(audio, str) else 0} samples'}
+
+
+class WhisperServerFallbackTests(unittest.TestCase):
+    def transcriber(self, url):
+        return YouTubeTranscriber(
+            output_dir=tempfile.mkdtemp(), use_openai=False, use_cache=False, server_url=url)
+
+    def test_uses_running_server(self):
+        httpd = make_server('127.0.0.1', 0, TranscriptionServer(ModelPool(loader=FakeModel)))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        transcriber = self.transcriber(f'http://127.0.0.1:{httpd.server_address[1]}')
+        self.assertEqual(transcriber.transcribe_local('/dev/null')['text'], 'base heard 0 samples')
+        self.assertIsNone(transcriber._model)
+
+    def test_falls_back_to_local_model_when_nothing_answers(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        transcriber = self.transcriber(f'http://127.0.0.1:{port}')
+        transcriber._model = FakeModel('local')
+        self.assertEqual(transcriber.transcribe_local('/dev/null')['text'], 'local heard 0 samples')
+        self.assertIsNone(transcriber.client)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import ytdlp_cache
+from yt_dlp.utils import DownloadError, ExtractorError
+
+
+class FakeYoutubeDL:
+    calls = []
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        FakeYoutubeDL.calls.append(url)
+        if 'private' in url:
+            error = ExtractorError('Private video', expected=True)
+            raise DownloadError(f'ERROR: {error.msg}', (type(error), error, None))
+        if 'timeout' in url:
+            error = ExtractorError('Unable to download webpage', cause=TimeoutError())
+            raise DownloadError(f'ERROR: {error.msg}', (type(error), error, None))
+        return {'id': 'abcdefghijk', 'title': 'A video'}
+
+    def sanitize_info(self, info):
+        return info
+
+
+class MetadataCacheTests(unittest.TestCase):
+    def setUp(self):
+        FakeYoutubeDL.calls = []
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = ytdlp_cache.MetadataCache(os.path.join(self.tmpdir.name, 'cache.db'))
+        patcher = mock.patch.object(ytdlp_cache, 'YoutubeDL', FakeYoutubeDL)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_video_from_any_url_hits_cache(self):
+        first = self.cache.extract_info('https://www.youtube.com/watch?v=abcdefghijk')
+        second = self.cache.extract_info('https://youtu.be/abcdefghijk', {'quiet': True})
+        self.assertEqual(first, second)
+        self.assertEqual(len(FakeYoutubeDL.calls), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def stored_counters(self):
+        with sqlite3.connect(self.cache.path) as conn:
+            return dict(conn.execute('SELECT name, value FROM counters').fetchall())
+
+    def test_lookups_count_in_memory_until_flushed(self):
+        self.cache.set('info:yt:abcdefghijk', {'title': 'A video'})
+        for _ in range(3):
+            self.cache.get('info:yt:abcdefghijk')
+        self.assertEqual(self.stored_counters(), {})
+        with mock.patch.object(ytdlp_cache, 'COUNTER_FLUSH_SECONDS', 0):
+            self.cache.get('info:yt:abcdefghijk')
+        self.assertEqual(self.stored_counters(), {'hits': 4})
+        self.cache.get('info:missing')
+        self.cache.set('info:missing', {})  # writes carry pending counts along
+        self.assertEqual(self.stored_counters(), {'hits': 4, 'misses': 1})
+
+    def test_extraction_options_change_the_key(self):
+        self.cache.extract_info('https://youtu.be/abcdefghijk')
+        self.cache.extract_info('https://youtu.be/abcdefghijk', {'extract_flat': True})
+        self.assertEqual(len(FakeYoutubeDL.calls), 2)
+
+    def test_failures_are_cached_negatively(self):
+        url = 'https://youtube.com/private'
+        with self.assertRaises(DownloadError):
+            self.cache.extract_info(url)
+        with self.assertRaises(ytdlp_cache.CachedExtractionError):
+            self.cache.extract_info(url)
+        self.assertEqual(FakeYoutubeDL.calls, [url])
+        self.assertEqual(self.cache.stats()['negative_hits'], 1)
+
+    def test_network_errors_are_not_cached(self):
+        url = 'https://youtube.com/timeout'
+        for _ in range(2):
+            with self.assertRaises(DownloadError):
+                self.cache.extract_info(url)
+        self.assertEqual(FakeYoutubeDL.calls, [url, url])
+        self.assertEqual(self.cache.stats()['negative_entries'], 0)
+
+    def test_other_exceptions_are_not_cached(self):
+        def producer():
+            raise OSError('disk full')
+
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                self.cache.fetch('info:key', producer)
+        self.assertEqual(self.cache.stats()['errors'], 0)
+
+    def test_expired_entries_are_refetched(self):
+        self.cache.ttl = -1
+        self.cache.extract_info('https://youtu.be/abcdefghijk')
+        self.cache.extract_info('https://youtu.be/abcdefghijk')
+        self.assertEqual(len(FakeYoutubeDL.calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""Sentence segmentation and length-aware chunking for text-to-speech.
+
+``chunk_text`` splits text into sentences (on ``.``, ``?``, ``!`` and
+ellipses, but not after common abbreviations, initials or inside numbers
+like ``3.14``), breaks any sentence longer than the limit at commas or
+semicolons and then between words, and packs the pieces into chunks of
+roughly equal size that never exceed ``max_tokens``. Length is measured by
+``count``, which defaults to characters and can be a tokenizer's count.
+"""
+import math
+import re
+
+MAX_TOKENS = 300
+
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'vs', 'etc',
+    'e.g', 'i.e', 'cf', 'al', 'approx', 'dept', 'est', 'fig', 'inc', 'ltd',
+    'co', 'corp', 'vol', 'u.s', 'u.k', 'a.m', 'p.m',
+    'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+}
+
+# Terminal punctuation, any closing quotes or brackets, then whitespace
+_BOUNDARY = re.compile(r'(?:[.!?]+|…)["\'”’)\]]*\s+')
+_CLOSERS = '.!?…"\'”’)]:;'
+_SEPARATORS = (r'(?<=[,;:])\s+', r'\s+')
+
+
+def _is_boundary(paragraph, match):
+    following = paragraph[match.end():match.end() + 1]
+    if following.islower():
+        return False
+    punctuation = match.group().strip()
+    if not punctuation.startswith('.') or punctuation.startswith('..'):
+        return True
+    before = paragraph[:match.start()].split()
+    word = before[-1].lstrip('("\'“‘[').lower() if before else ''
+    return not (word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()))
+
+
+def _terminate(sentence):
+    # A final stop helps the model end the utterance cleanly
+    return sentence if sentence[-1] in _CLOSERS else sentence + '.'
+
+
+def split_sentences(text):
+    """Sentences of ``text``; blank lines always end a sentence and
+    fragments without any letters or digits are dropped"""
+    sentences = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = ' '.join(paragraph.split())
+        start = 0
+        for match in _BOUNDARY.finditer(paragraph + ' '):
+            if _is_boundary(paragraph, match):
+                sentence = paragraph[start:match.end()].strip()
+                if re.search(r'\w', sentence):
+                    sentences.append(sentence)
+                start = match.end()
+        tail = paragraph[start:].strip()
+        if re.search(r'\w', tail):
+            sentences.append(_terminate(tail))
+    return sentences
+
+
+def _split_long(text, max_tokens, count, separators=_SEPARATORS):
+    """Pieces of ``text`` within the limit: split at clause punctuation, then
+    between words, and as a last resort into the longest slices ``count``
+    allows. Pieces are left unpacked so the final pass can balance them."""
+    if count(text) <= max_tokens:
+        return [text]
+    if not separators:
+        return _slice(text, max_tokens, count)
+    parts = [part for part in re.split(separators[0], text) if part]
+    if len(parts) == 1:
+        return _split_long(text, max_tokens, count, separators[1:])
+    pieces = []
+    for part in parts:
+        pieces.extend(_split_long(part, max_tokens, count, separators[1:]))
+    return pieces
+
+
+def _slice(text, max_tokens, count):
+    """Cut ``text`` into the longest prefixes that ``count`` keeps within
+    the limit, so a tokenizer's special tokens are accounted for"""
+    slices = []
+    while text:
+        low, high = 1, len(text)  # the longest fitting prefix, at least 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        slices.append(text[:low])
+        text = text[low:]
+    return slices
+
+
+def _pack(pieces, sizes, max_tokens, balance=False):
+    """Join consecutive pieces into chunks of at most ``max_tokens``.
+
+    With ``balance``, each chunk aims for an equal share of the text still
+    to be packed and closes early when that keeps it nearer that share.
+    """
+    chunks = []
+    current, current_size = [], 0
+    remaining = sum(sizes) + len(sizes) - 1
+    share = lambda: remaining / math.ceil(remaining / max_tokens) if balance else None
+    target = share()
+    for piece, size in zip(pieces, sizes):
+        joined = current_size + 1 + size if current else size
+        if current and (
+            joined > max_tokens
+            or (balance and joined - target > target - current_size)
+        ):
+            chunks.append(' '.join(current))
+            remaining -= current_size + 1
+            target = share()
+            current, joined = [], size
+        current.append(piece)
+        current_size = joined
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def chunk_text(text, max_tokens=MAX_TOKENS, count=len, balance=True):
+    """Split ``text`` into sentence-aligned chunks of at most ``max_tokens``.
+
+    With ``balance``, chunks aim for an equal share of the text rather than
+    filling each one up and leaving a short remainder, which keeps batches
+    evenly padded.
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        pieces.extend(_split_long(sentence, max_tokens, count))
+    if not pieces:
+        return []
+    return _pack(pieces, [count(piece) for piece in pieces], max_tokens, balance)
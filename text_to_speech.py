@@ -9,15 +9,21 @@ import numpy as np
 import soundfile as sf
 import tempfile
 
+from audio_writer import ChunkWriter
+from text_chunker import MAX_TOKENS, chunk_text
+
 class TextToSpeech:
     def __init__(self, model_name="tts_models/en/ljspeech/tacotron2-DDC", 
-                 output_dir='tts_output'):
+                 output_dir='tts_output', max_chunk_chars=MAX_TOKENS):
         """
         Initialize TTS with specified model.
         Available models can be listed using: TTS.list_models()
+        Text files are synthesized in sentence-aligned chunks of at most
+        max_chunk_chars characters.
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_chunk_chars = max_chunk_chars
         
         # Setup logging
         logging.basicConfig(level=logging.INFO,
@@ -73,10 +79,14 @@ class TextToSpeech:
                 os.remove(temp_file.name)
             raise
 
-    def process_file(self, input_file, output_dir=None, speaker=None, language=None):
+    def process_file(self, input_file, output_dir=None, speaker=None, language=None,
+                     single_file=False, audio_format='wav', silence=0.0):
         """
         Process a text file and convert to speech.
-        Supports txt and json files.
+        Supports txt and json files. Text is always written to one audio
+        file; with single_file, JSON segments are too. Chunks are streamed
+        into the file (wav, flac, ogg or opus) separated by ``silence``
+        seconds, and the metadata records each chunk's offsets.
         """
         try:
             input_path = Path(input_file)
@@ -92,9 +102,11 @@ class TextToSpeech:
 
             # Process based on file type
             if input_path.suffix.lower() == '.txt':
-                return self._process_txt_file(input_path, output_dir, speaker, language)
+                return self._process_txt_file(input_path, output_dir, speaker, language,
+                                              audio_format, silence)
             elif input_path.suffix.lower() == '.json':
-                return self._process_json_file(input_path, output_dir, speaker, language)
+                return self._process_json_file(input_path, output_dir, speaker, language,
+                                               single_file, audio_format, silence)
             else:
                 raise ValueError(f"Unsupported file type: {input_path.suffix}")
 
@@ -102,22 +114,39 @@ class TextToSpeech:
             self.logger.error(f"Error processing file: {str(e)}")
             raise
 
-    def _process_txt_file(self, input_path, output_dir, speaker=None, language=None):
-        """Process a plain text file"""
+    def _process_txt_file(self, input_path, output_dir, speaker=None, language=None,
+                          audio_format='wav', silence=0.0):
+        """Process a plain text file chunk by chunk into one audio file"""
         try:
             with open(input_path, 'r', encoding='utf-8') as f:
                 text = f.read().strip()
 
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_path = output_dir / f"tts_{timestamp}.wav"
-            
-            return self.process_text(text, output_path, speaker, language)
+            output_path = output_dir / f"tts_{timestamp}.{audio_format}"
+            sample_rate = self.tts.synthesizer.output_sample_rate
+            chunks = []
+
+            with ChunkWriter(output_path, sample_rate, audio_format, silence) as writer:
+                for i, chunk in enumerate(chunk_text(text, self.max_chunk_chars)):
+                    samples = self.tts.tts(text=chunk, speaker=speaker, language=language)
+                    entry = {'chunk': i, 'text': chunk}
+                    entry.update(writer.write(samples))
+                    chunks.append(entry)
+
+            # Save metadata
+            metadata_path = output_dir / f"tts_metadata_{timestamp}.json"
+            with open(metadata_path, 'w', encoding='utf-8') as f:
+                json.dump(chunks, f, ensure_ascii=False, indent=2)
+
+            self.logger.info(f"Audio saved to: {output_path}")
+            return str(output_path)
 
         except Exception as e:
             self.logger.error(f"Error processing text file: {str(e)}")
             raise
 
-    def _process_json_file(self, input_path, output_dir, speaker=None, language=None):
+    def _process_json_file(self, input_path, output_dir, speaker=None, language=None,
+                           single_file=False, audio_format='wav', silence=0.0):
         """Process a JSON file with timestamps"""
         try:
             with open(input_path, 'r', encoding='utf-8') as f:
@@ -127,7 +156,25 @@ class TextToSpeech:
             output_paths = []
 
             # Handle different JSON formats
-            if isinstance(data, dict) and 'segments' in data:
+            if isinstance(data, dict) and 'segments' in data and single_file:
+                # Stream segments into one file as they are generated
+                output_path = output_dir / f"tts_{timestamp}.{audio_format}"
+                sample_rate = self.tts.synthesizer.output_sample_rate
+                with ChunkWriter(output_path, sample_rate, audio_format, silence) as writer:
+                    for i, segment in enumerate(data['segments']):
+                        text = segment.get('text', '').strip()
+                        if text:
+                            samples = self.tts.tts(text=text, speaker=speaker, language=language)
+                            entry = {
+                                'segment': i,
+                                'text': text,
+                                'start': segment.get('start'),
+                                'end': segment.get('end')
+                            }
+                            entry.update(writer.write(samples))
+                            output_paths.append(entry)
+                self.logger.info(f"Audio saved to: {output_path}")
+            elif isinstance(data, dict) and 'segments' in data:
                 # Process segments
                 for i, segment in enumerate(data['segments']):
                     text = segment.get('text', '').strip()
@@ -190,8 +237,10 @@ def main():
                     output_paths = tts.process_file(file_path)
                     print("\nProcessing complete!")
                     print("Generated audio files:")
-                    for item in output_paths:
-                        print(f"- {item['audio_path']}")
+                    if isinstance(output_paths, str):
+                        output_paths = [{'audio_path': output_paths}]
+                    for path in dict.fromkeys(item['audio_path'] for item in output_paths):
+                        print(f"- {path}")
                 except Exception as e:
                     print(f"Error: {str(e)}")
                     
@@ -1,22 +1,122 @@
 from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
 import torch
 import soundfile as sf
-from datasets import load_dataset
 import numpy as np
 import os
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime
 import json
 import tempfile
-from typing import Optional, List, Dict, Union
+import time
+from itertools import islice
+from typing import Optional, List, Dict, Tuple, Union
+
+from audio_writer import ChunkWriter
+from dubbing import DubbingTrack
+from text_chunker import MAX_TOKENS, chunk_text
+
+XVECTOR_DATASET = "Matthijs/cmu-arctic-xvectors"
+VOICE_DIR = Path(os.getenv('TTS_VOICE_DIR', 'tts_voices'))
+
+# Named voices: a row of XVECTOR_DATASET's validation split, or the path of
+# a saved 512-dim x-vector (.npy). Add more with register_voice().
+VOICES: Dict[str, Union[int, str]] = {
+    'default': 7306,
+    'slt': 7306,
+}
+
+# Loaded once per process and shared by every TextToSpeechHF instance
+_models: Dict[Tuple[str, str, str], tuple] = {}
+_voices: Dict[str, torch.Tensor] = {}
+_load_lock = threading.Lock()
+
+
+def register_voice(name: str, source: Union[int, str]) -> None:
+    """Add or replace a named voice (dataset row index or .npy path)"""
+    VOICES[name] = source
+    _voices.pop(name, None)
+
+
+def set_torch_threads(num_threads: int) -> None:
+    """
+    Set how many CPU threads torch uses for inference.
+    This is process-wide torch state shared by every model in the process,
+    so call it once from a script's entry point, never from library code
+    running inside the web app or job workers.
+    """
+    torch.set_num_threads(num_threads)
+
+
+def load_models(model_name: str, vocoder_name: str, device: str):
+    """
+    Return the process-wide (processor, model, vocoder), loading them on
+    first use.
+    Returns:
+        (models, seconds spent, True if this call loaded them)
+    """
+    key = (model_name, vocoder_name, device)
+    began = time.monotonic()
+    with _load_lock:
+        cold = key not in _models
+        if cold:
+            processor = SpeechT5Processor.from_pretrained(model_name)
+            model = SpeechT5ForTextToSpeech.from_pretrained(model_name).to(device)
+            vocoder = SpeechT5HifiGan.from_pretrained(vocoder_name).to(device)
+            _models[key] = (processor, model, vocoder)
+        return _models[key], time.monotonic() - began, cold
+
+
+def load_voice(name: str):
+    """
+    Speaker embedding of a named voice as a (1, 512) tensor.
+    Dataset voices are saved to VOICE_DIR as .npy the first time; the
+    dataset is streamed up to their row rather than downloaded whole.
+    Returns:
+        (embedding, seconds spent, where it came from: memory/disk/file/dataset)
+    """
+    began = time.monotonic()
+    with _load_lock:
+        if name in _voices:
+            return _voices[name], time.monotonic() - began, 'memory'
+        if name not in VOICES:
+            raise ValueError(f"Unknown voice: {name}. Available: {', '.join(sorted(VOICES))}")
+
+        source = VOICES[name]
+        if isinstance(source, str):
+            vector, origin = np.load(source), 'file'
+        else:
+            cache_path = VOICE_DIR / f"xvector_{source}.npy"
+            if cache_path.exists():
+                vector, origin = np.load(cache_path), 'disk'
+            else:
+                from datasets import load_dataset
+
+                rows = load_dataset(XVECTOR_DATASET, split="validation", streaming=True)
+                row = next(islice(rows, source, None), None)
+                if row is None:
+                    raise ValueError(f"Voice {name}: no row {source} in {XVECTOR_DATASET}")
+                vector, origin = np.asarray(row["xvector"], dtype=np.float32), 'dataset'
+                VOICE_DIR.mkdir(parents=True, exist_ok=True)
+                staged = cache_path.with_suffix('.tmp.npy')
+                np.save(staged, vector)
+                os.replace(staged, cache_path)
+
+        embedding = torch.tensor(vector, dtype=torch.float32).reshape(1, -1)
+        _voices[name] = embedding
+        return embedding, time.monotonic() - began, origin
+
 
 class TextToSpeechHF:
     def __init__(
         self, 
         model_name: str = "microsoft/speecht5_tts",
         vocoder_name: str = "microsoft/speecht5_hifigan",
-        output_dir: str = 'tts_output'
+        output_dir: str = 'tts_output',
+        batch_size: int = 8,
+        voice: str = 'default',
+        max_chunk_tokens: int = MAX_TOKENS
     ):
         """
         Initialize TTS with Hugging Face models.
@@ -24,9 +124,17 @@ class TextToSpeechHF:
             model_name: Name of the TTS model from Hugging Face
             vocoder_name: Name of the vocoder model
             output_dir: Directory to save output files
+            batch_size: Chunks synthesized together when processing files
+            voice: Name of the speaker voice (see VOICES)
+            max_chunk_tokens: Longest chunk, in tokens, that files are split into
+
+        Models and the speaker embedding load on first use and are shared
+        across instances; load timings are kept in ``self.timings``.
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(1, batch_size)
+        self.max_chunk_tokens = max_chunk_tokens
         
         # Setup logging
         logging.basicConfig(
@@ -34,29 +142,56 @@ class TextToSpeechHF:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
-        
+
+        if voice not in VOICES:
+            raise ValueError(f"Unknown voice: {voice}. Available: {', '.join(sorted(VOICES))}")
+        self.model_name = model_name
+        self.vocoder_name = vocoder_name
+        self.voice = voice
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.timings: Dict[str, Dict[str, Union[float, str]]] = {}
+        self._speaker_embeddings: Optional[torch.Tensor] = None
+
+    def _loaded_models(self):
         try:
-            # Load models and processor
-            self.logger.info(f"Loading TTS model: {model_name}")
-            self.processor = SpeechT5Processor.from_pretrained(model_name)
-            self.model = SpeechT5ForTextToSpeech.from_pretrained(model_name)
-            self.vocoder = SpeechT5HifiGan.from_pretrained(vocoder_name)
-            
-            # Load speaker embeddings
-            self.logger.info("Loading speaker embeddings...")
-            dataset = load_dataset("Matthijs/cmu-arctic-xvectors", split="validation")
-            self.speaker_embeddings = torch.tensor(dataset[7306]["xvector"]).unsqueeze(0)
-            
-            # Set device
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.model.to(self.device)
-            self.vocoder.to(self.device)
-            
-            self.logger.info(f"Models loaded successfully. Using device: {self.device}")
-            
+            models, seconds, cold = load_models(self.model_name, self.vocoder_name, self.device)
         except Exception as e:
-            self.logger.error(f"Error initializing models: {str(e)}")
+            self.logger.error(f"Error loading TTS models: {str(e)}")
             raise
+        if 'models' not in self.timings:
+            state = 'cold' if cold else 'warm'
+            self.timings['models'] = {'seconds': round(seconds, 3), 'load': state}
+            self.logger.info(
+                f"TTS models ready in {seconds:.2f}s ({state}). Using device: {self.device}"
+            )
+        return models
+
+    @property
+    def processor(self) -> SpeechT5Processor:
+        return self._loaded_models()[0]
+
+    @property
+    def model(self) -> SpeechT5ForTextToSpeech:
+        return self._loaded_models()[1]
+
+    @property
+    def vocoder(self) -> SpeechT5HifiGan:
+        return self._loaded_models()[2]
+
+    @property
+    def speaker_embeddings(self) -> torch.Tensor:
+        if self._speaker_embeddings is None:
+            embedding, seconds, origin = load_voice(self.voice)
+            self.timings['voice'] = {'seconds': round(seconds, 3), 'load': origin}
+            self.logger.info(f"Voice '{self.voice}' ready in {seconds:.2f}s (from {origin})")
+            self._speaker_embeddings = embedding
+        return self._speaker_embeddings
+
+    def preload(self) -> Dict[str, Dict[str, Union[float, str]]]:
+        """Load models and voice now; returns the load timings"""
+        self._loaded_models()
+        self.speaker_embeddings
+        return self.timings
 
     def process_text(
         self, 
@@ -80,22 +215,8 @@ class TextToSpeechHF:
             with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
                 self.logger.info("Generating speech...")
                 
-                # Process text
-                inputs = self.processor(text=text, return_tensors="pt").to(self.device)
-                
-                # Use provided or default speaker embeddings
-                embeddings = (speaker_embeddings if speaker_embeddings is not None 
-                            else self.speaker_embeddings.to(self.device))
-                
                 # Generate speech
-                speech = self.model.generate_speech(
-                    inputs["input_ids"],
-                    embeddings,
-                    vocoder=self.vocoder
-                )
-                
-                # Convert to numpy and save
-                speech = speech.cpu().numpy()
+                speech = self._synthesize_batch([text], speaker_embeddings)[0]
                 
                 # If no output path specified, create one
                 if output_path is None:
@@ -115,11 +236,71 @@ class TextToSpeechHF:
                 os.remove(temp_file.name)
             raise
 
+    def _synthesize_batch(
+        self,
+        texts: List[str],
+        speaker_embeddings: Optional[torch.Tensor] = None
+    ) -> List[np.ndarray]:
+        """
+        Run several texts through the model and vocoder in one pass.
+        Inputs are padded to the longest text; each output is trimmed back
+        to its own spectrogram length.
+        Returns:
+            One waveform per text, in input order
+        """
+        inputs = self.processor(text=texts, return_tensors="pt", padding=True).to(self.device)
+        embeddings = (speaker_embeddings if speaker_embeddings is not None
+                      else self.speaker_embeddings).to(self.device)
+        if embeddings.size(0) == 1:
+            embeddings = embeddings.expand(len(texts), -1)
+
+        with torch.inference_mode():
+            if len(texts) == 1:
+                speech = self.model.generate_speech(
+                    inputs["input_ids"],
+                    embeddings,
+                    vocoder=self.vocoder
+                )
+                return [speech.cpu().numpy()]
+
+            spectrograms, lengths = self.model.generate_speech(
+                inputs["input_ids"],
+                embeddings,
+                attention_mask=inputs["attention_mask"],
+                return_output_lengths=True
+            )
+            waveforms = self.vocoder(spectrograms)
+
+        # Samples per spectrogram frame (the vocoder's hop length)
+        hop = waveforms.size(1) // spectrograms.size(1)
+        waveforms = waveforms.cpu().numpy()
+        return [waveforms[i, :int(length) * hop] for i, length in enumerate(lengths)]
+
+    def _synthesize(
+        self,
+        texts: List[str],
+        speaker_embeddings: Optional[torch.Tensor] = None
+    ):
+        """Yield one waveform per text, in order, batch_size texts at a time"""
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            began = time.monotonic()
+            waveforms = self._synthesize_batch(batch, speaker_embeddings)
+            self.logger.info(
+                f"Synthesized chunks {start + 1}-{start + len(batch)} of {len(texts)} "
+                f"in {time.monotonic() - began:.1f}s"
+            )
+            yield from waveforms
+
     def process_file(
         self, 
         input_file: str, 
         output_dir: Optional[str] = None,
-        sample_rate: int = 16000
+        sample_rate: int = 16000,
+        single_file: bool = False,
+        audio_format: str = 'wav',
+        silence: float = 0.0,
+        dub: bool = False
     ) -> List[Dict[str, str]]:
         """
         Process a text file and convert to speech.
@@ -127,6 +308,12 @@ class TextToSpeechHF:
             input_file: Path to input text or JSON file
             output_dir: Optional custom output directory
             sample_rate: Audio sample rate
+            single_file: Stream all chunks into one audio file instead of
+                one .wav per chunk; metadata records each chunk's offsets
+            audio_format: wav, flac, ogg or opus (single_file only)
+            silence: Seconds of silence between chunks (single_file only)
+            dub: For JSON transcripts, mix every segment into one track at
+                its start time, sped up where needed to end by its end time
         Returns:
             List of dictionaries containing file metadata
         """
@@ -143,10 +330,16 @@ class TextToSpeechHF:
             output_dir.mkdir(parents=True, exist_ok=True)
 
             # Process based on file type
+            output_options = {
+                'single_file': single_file,
+                'audio_format': audio_format,
+                'silence': silence,
+            }
             if input_path.suffix.lower() == '.txt':
-                return self._process_txt_file(input_path, output_dir, sample_rate)
+                return self._process_txt_file(input_path, output_dir, sample_rate, **output_options)
             elif input_path.suffix.lower() == '.json':
-                return self._process_json_file(input_path, output_dir, sample_rate)
+                return self._process_json_file(input_path, output_dir, sample_rate,
+                                               dub=dub, **output_options)
             else:
                 raise ValueError(f"Unsupported file type: {input_path.suffix}")
 
@@ -154,11 +347,81 @@ class TextToSpeechHF:
             self.logger.error(f"Error processing file: {str(e)}")
             raise
 
+    def _write_speech(
+        self,
+        entries: List[Dict],
+        output_dir: Path,
+        kind: str,
+        timestamp: str,
+        sample_rate: int = 16000,
+        single_file: bool = False,
+        audio_format: str = 'wav',
+        silence: float = 0.0
+    ) -> List[Dict]:
+        """
+        Synthesize each entry's text and record where its audio went: a
+        ``tts_{kind}_NNNN`` .wav per entry, or sample offsets into one
+        combined file written as chunks are generated.
+        """
+        speech = self._synthesize([entry['text'] for entry in entries])
+        if single_file:
+            output_path = output_dir / f"tts_{timestamp}.{audio_format}"
+            with ChunkWriter(output_path, sample_rate, audio_format, silence) as writer:
+                for entry, samples in zip(entries, speech):
+                    entry.update(writer.write(samples))
+            self.logger.info(f"Audio saved to: {output_path}")
+            return entries
+
+        for entry, samples in zip(entries, speech):
+            output_path = output_dir / f"tts_{kind}_{entry[kind]:04d}_{timestamp}.wav"
+            sf.write(str(output_path), samples, sample_rate)
+            entry['audio_path'] = str(output_path)
+        return entries
+
+    def _write_dub(
+        self,
+        entries: List[Dict],
+        duration: Optional[float],
+        output_dir: Path,
+        timestamp: str,
+        sample_rate: int = 16000,
+        audio_format: str = 'wav'
+    ) -> List[Dict]:
+        """
+        Synthesize segments and mix them into one track aligned to their
+        [start, end] windows, written as ``tts_dub_<timestamp>``.
+        """
+        if any(entry['start'] is None or entry['end'] is None for entry in entries):
+            raise ValueError("Dubbing needs start and end times on every segment")
+        duration = max([duration or 0.0] + [entry['end'] for entry in entries])
+        track = DubbingTrack(duration, sample_rate)
+
+        speech = self._synthesize([entry['text'] for entry in entries])
+        for entry, samples in zip(entries, speech):
+            entry.update(track.place(samples, entry['start'], entry['end']))
+
+        output_path = output_dir / f"tts_dub_{timestamp}.{audio_format}"
+        with ChunkWriter(output_path, sample_rate, audio_format) as writer:
+            writer.write(track.audio())
+        for entry in entries:
+            entry['audio_path'] = str(output_path)
+
+        for entry in entries:
+            if entry['overrun']:
+                self.logger.warning(
+                    f"Segment {entry['segment']} ({entry['start']:.2f}-{entry['end']:.2f}s) "
+                    f"runs {entry['overrun']:.2f}s past its window even at "
+                    f"{entry['speedup']}x; it overlaps what follows"
+                )
+        self.logger.info(f"Dubbed audio saved to: {output_path}")
+        return entries
+
     def _process_txt_file(
         self, 
         input_path: Path, 
         output_dir: Path,
-        sample_rate: int = 16000
+        sample_rate: int = 16000,
+        **output_options
     ) -> List[Dict[str, str]]:
         """Process a plain text file"""
         try:
@@ -167,23 +430,11 @@ class TextToSpeechHF:
 
             # Split text into manageable chunks (e.g., by sentences)
             chunks = self._split_text(text)
-            output_paths = []
-
-            for i, chunk in enumerate(chunks):
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                output_path = output_dir / f"tts_chunk_{i:04d}_{timestamp}.wav"
-                
-                path = self.process_text(
-                    chunk, 
-                    str(output_path),
-                    sample_rate=sample_rate
-                )
-                
-                output_paths.append({
-                    'chunk': i,
-                    'text': chunk,
-                    'audio_path': path
-                })
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            output_paths = self._write_speech(
+                [{'chunk': i, 'text': chunk} for i, chunk in enumerate(chunks)],
+                output_dir, 'chunk', timestamp, sample_rate, **output_options
+            )
 
             # Save metadata
             metadata_path = output_dir / f"tts_metadata_{timestamp}.json"
@@ -200,7 +451,9 @@ class TextToSpeechHF:
         self, 
         input_path: Path, 
         output_dir: Path,
-        sample_rate: int = 16000
+        sample_rate: int = 16000,
+        dub: bool = False,
+        **output_options
     ) -> List[Dict[str, str]]:
         """Process a JSON file with timestamps"""
         try:
@@ -211,23 +464,26 @@ class TextToSpeechHF:
             output_paths = []
 
             if isinstance(data, dict) and 'segments' in data:
-                # Process segments
-                for i, segment in enumerate(data['segments']):
-                    text = segment.get('text', '').strip()
-                    if text:
-                        output_path = output_dir / f"tts_segment_{i:04d}_{timestamp}.wav"
-                        path = self.process_text(
-                            text, 
-                            str(output_path),
-                            sample_rate=sample_rate
-                        )
-                        output_paths.append({
-                            'segment': i,
-                            'text': text,
-                            'audio_path': path,
-                            'start': segment.get('start'),
-                            'end': segment.get('end')
-                        })
+                # Process segments, skipping empty ones
+                entries = [
+                    {
+                        'segment': i,
+                        'text': segment.get('text', '').strip(),
+                        'start': segment.get('start'),
+                        'end': segment.get('end')
+                    }
+                    for i, segment in enumerate(data['segments'])
+                ]
+                entries = [entry for entry in entries if entry['text']]
+                if dub:
+                    output_paths = self._write_dub(
+                        entries, data.get('duration'), output_dir, timestamp,
+                        sample_rate, output_options.get('audio_format', 'wav')
+                    )
+                else:
+                    output_paths = self._write_speech(
+                        entries, output_dir, 'segment', timestamp, sample_rate, **output_options
+                    )
             else:
                 # Process as single text
                 text = str(data)
@@ -253,34 +509,21 @@ class TextToSpeechHF:
             self.logger.error(f"Error processing JSON file: {str(e)}")
             raise
 
-    @staticmethod
-    def _split_text(text: str, max_length: int = 200) -> List[str]:
-        """Split text into manageable chunks"""
-        # Simple sentence splitting
-        sentences = text.replace('\n', ' ').split('.')
-        chunks = []
-        current_chunk = []
-        current_length = 0
-
-        for sentence in sentences:
-            sentence = sentence.strip() + '.'
-            sentence_length = len(sentence)
-            
-            if current_length + sentence_length > max_length and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = []
-                current_length = 0
-            
-            current_chunk.append(sentence)
-            current_length += sentence_length
-
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-
-        return chunks
+    def _split_text(self, text: str, max_length: Optional[int] = None) -> List[str]:
+        """
+        Split text into balanced, sentence-aligned chunks. Length is counted
+        with the model's tokenizer and capped at its maximum input length.
+        """
+        tokenizer = self.processor.tokenizer
+        limit = min(max_length or self.max_chunk_tokens, tokenizer.model_max_length)
+        return chunk_text(text, limit, count=lambda chunk: len(tokenizer(chunk).input_ids))
 
 def main():
     try:
+        # CPU threads for torch; the CLI owns the process, so it may set them
+        if os.getenv('TTS_NUM_THREADS'):
+            set_torch_threads(int(os.getenv('TTS_NUM_THREADS')))
+
         # Initialize TTS
         tts = TextToSpeechHF()
         
@@ -306,8 +549,8 @@ def main():
                     output_paths = tts.process_file(file_path)
                     print("\nProcessing complete!")
                     print("Generated audio files:")
-                    for item in output_paths:
-                        print(f"- {item['audio_path']}")
+                    for path in dict.fromkeys(item['audio_path'] for item in output_paths):
+                        print(f"- {path}")
                 except Exception as e:
                     print(f"Error: {str(e)}")
                     
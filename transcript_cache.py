@@ -0,0 +1,233 @@
+"""Content-addressed store for finished transcriptions.
+
+Each transcription is written once as JSON, TXT and SRT under
+``<root>/<key[:2]>/<key>.*``, where the key is a SHA-256 of the model name
+and an audio hash. For YouTube audio that hash fingerprints the source
+stream yt-dlp selected (video id, format id and size), so the same audio
+gets the same key whether it was downloaded or streamed as PCM; other audio
+is hashed by content. ``index.db`` in the same directory records every
+stored transcript and maps YouTube video ids to keys, so asking for the
+same video and model again is answered without downloading or running
+inference. The app's ``videos.transcript_key`` column points at these keys
+so transcripts can be served straight from the store.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from ytdlp_cache import VIDEO_ID
+
+TRANSCRIPT_CACHE_DIR = os.getenv('TRANSCRIPT_CACHE_DIR', 'transcriptions/cache')
+FORMATS = {'json': 'json_path', 'txt': 'text_path', 'srt': 'srt_path'}
+HASH_BLOCK = 1 << 20
+
+
+def video_id(url):
+    match = VIDEO_ID.search(url or '')
+    return match.group(1) if match else None
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stream_fingerprint(info):
+    """Hash identifying the audio stream behind yt-dlp ``info``, or None
+    when the info doesn't name a format"""
+    size = info.get('filesize') or info.get('filesize_approx')
+    if not (info.get('id') and info.get('format_id')):
+        return None
+    parts = (info.get('extractor_key') or 'Youtube', info['id'], info['format_id'], size)
+    return hashlib.sha256('\0'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+def transcript_key(model, audio_hash):
+    return hashlib.sha256(f'{model}\0{audio_hash}'.encode('utf-8')).hexdigest()
+
+
+def format_timestamp(seconds):
+    """Convert seconds to HH:MM:SS format"""
+    return str(timedelta(seconds=int(seconds)))
+
+
+def write_transcript(transcription, base_path):
+    """Write JSON, timestamped text and SRT next to ``base_path``; returns the paths"""
+    base_path = Path(base_path)
+    paths = {name: str(base_path.with_suffix('.' + ext)) for ext, name in FORMATS.items()}
+
+    with open(paths['json_path'], 'w', encoding='utf-8') as f:
+        json.dump(transcription, f, ensure_ascii=False, indent=2)
+
+    with open(paths['text_path'], 'w', encoding='utf-8') as txt_file, \
+         open(paths['srt_path'], 'w', encoding='utf-8') as srt_file:
+        for i, segment in enumerate(transcription.get('segments', []), 1):
+            start_time = format_timestamp(segment['start'])
+            end_time = format_timestamp(segment['end'])
+            text = segment['text'].strip()
+
+            txt_file.write(f"[{start_time} --> {end_time}] {text}\n")
+
+            srt_file.write(f"{i}\n")
+            srt_file.write(f"{start_time},000 --> {end_time},000\n")
+            srt_file.write(f"{text}\n\n")
+    return paths
+
+
+class TranscriptCache:
+    def __init__(self, root=TRANSCRIPT_CACHE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    audio_hash TEXT NOT NULL,
+                    title TEXT,
+                    duration REAL,
+                    language TEXT,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS video_transcripts (
+                    video_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    key TEXT NOT NULL REFERENCES transcripts(key),
+                    PRIMARY KEY (video_id, model)
+                );
+            ''')
+
+    def _conn(self):
+        # One connection per thread; the batch pipeline saves from its own thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.root / 'index.db', timeout=15)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def base_path(self, key):
+        return self.root / key[:2] / key
+
+    def paths(self, key):
+        base = self.base_path(key)
+        return {name: str(base.with_suffix('.' + ext)) for ext, name in FORMATS.items()}
+
+    def _entry(self, row):
+        """Index row as a result dict, or None if its files have gone missing"""
+        if row is None:
+            return None
+        paths = self.paths(row['key'])
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        with self._conn() as conn:
+            conn.execute('UPDATE transcripts SET hits = hits + 1 WHERE key = ?', (row['key'],))
+        return {
+            'key': row['key'],
+            'title': row['title'],
+            'duration': row['duration'],
+            'paths': paths,
+        }
+
+    def get(self, key):
+        return self._entry(self._conn().execute(
+            'SELECT * FROM transcripts WHERE key = ?', (key,)
+        ).fetchone())
+
+    def lookup_video(self, video_id, model):
+        """Stored transcript of a YouTube video for ``model``, or None"""
+        if not video_id:
+            return None
+        return self._entry(self._conn().execute(
+            '''
+            SELECT t.* FROM video_transcripts v JOIN transcripts t ON t.key = v.key
+            WHERE v.video_id = ? AND v.model = ?
+            ''',
+            (video_id, model),
+        ).fetchone())
+
+    def lookup_audio(self, audio_hash, model):
+        return self.get(transcript_key(model, audio_hash))
+
+    def link(self, video_id, model, key):
+        if not video_id:
+            return
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO video_transcripts (video_id, model, key) VALUES (?, ?, ?)',
+                (video_id, model, key),
+            )
+
+    def load(self, key):
+        """The stored transcription dict for ``key``"""
+        with open(self.paths(key)['json_path'], encoding='utf-8') as f:
+            return json.load(f)
+
+    def put(self, model, audio_hash, transcription, title=None, duration=None, video_id=None):
+        """Store a transcription and return its entry.
+
+        Files are written under a temporary name and renamed into place, so a
+        concurrent reader never sees a half-written transcript.
+        """
+        key = transcript_key(model, audio_hash)
+        base = self.base_path(key)
+        base.parent.mkdir(parents=True, exist_ok=True)
+        staged = write_transcript(transcription, base.with_name(f'{key}.{os.getpid()}.tmp'))
+        for name, path in self.paths(key).items():
+            os.replace(staged[name], path)
+
+        with self._conn() as conn:
+            conn.execute(
+                '''
+                INSERT OR REPLACE INTO transcripts
+                    (key, model, audio_hash, title, duration, language, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (key, model, audio_hash, title, duration,
+                 transcription.get('language'), time.time()),
+            )
+        self.link(video_id, model, key)
+        return {'key': key, 'title': title, 'duration': duration, 'paths': self.paths(key)}
+
+    def stats(self):
+        conn = self._conn()
+        transcripts, hits, audio_seconds = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(duration), 0) FROM transcripts'
+        ).fetchone()
+        videos = conn.execute('SELECT COUNT(*) FROM video_transcripts').fetchone()[0]
+        return {
+            'transcripts': transcripts,
+            'videos': videos,
+            'hits': hits,
+            'audio_hours': round(audio_seconds / 3600, 2),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache():
+    """Process-wide TranscriptCache at TRANSCRIPT_CACHE_DIR"""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache._pid != os.getpid():
+            _cache = TranscriptCache()
+        return _cache
+
+
+if __name__ == '__main__':
+    print(json.dumps(get_transcript_cache().stats(), indent=2))
@@ -0,0 +1,336 @@
+"""Long-lived local Whisper transcription server.
+
+Loading a Whisper model costs seconds and hundreds of MB, so instead of
+every CLI run and job worker loading its own copy, one server process keeps
+models in memory and transcribes queued requests one at a time. Models load
+on first use; when more than ``--max-models`` are loaded the least recently
+used one is evicted.
+
+    python whisper_server.py --port 8765 --preload base
+
+POST /transcribe?model=base   JSON ``{"path": ..., "options": {...}}`` for a
+                              file the server can read, or a float32 16 kHz
+                              PCM body (``application/octet-stream``) with
+                              options in the ``options`` query parameter
+GET  /status                  loaded models, queue depth and timings
+
+``YouTubeTranscriber`` talks to the server through ``WhisperClient`` at
+``WHISPER_SERVER_URL`` (default: this server's bind address,
+``http://127.0.0.1:8765``) and loads a model of its own only when nothing
+answers there. Set ``WHISPER_SERVER_URL=`` (empty) to always use a local model.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.getenv('WHISPER_SERVER_PORT', 8765))
+WHISPER_SERVER_URL = os.getenv('WHISPER_SERVER_URL', f'http://{DEFAULT_HOST}:{DEFAULT_PORT}') or None
+DEFAULT_MODEL = 'base'
+MAX_MODELS = int(os.getenv('WHISPER_MAX_MODELS', 2))
+MAX_QUEUE = 32
+REQUEST_TIMEOUT = 6 * 60 * 60  # a long video on CPU
+
+logger = logging.getLogger(__name__)
+
+
+class WhisperServerError(Exception):
+    """The server answered but could not transcribe the request"""
+
+
+def _load_whisper(name):
+    import whisper
+
+    return whisper.load_model(name)
+
+
+def _model_names():
+    try:
+        import whisper
+    except ImportError:
+        return None
+    available = getattr(whisper, 'available_models', None)
+    return set(available()) if available else None
+
+
+def _release_memory():
+    gc.collect()
+    try:
+        import torch
+    except ImportError:
+        return
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _to_json(value):
+    # Whisper results can carry NumPy scalars and arrays
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class ModelPool:
+    """Loaded models by name, evicting the least recently used"""
+
+    def __init__(self, max_models=MAX_MODELS, loader=_load_whisper):
+        self.max_models = max(1, max_models)
+        self._loader = loader
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.load_seconds = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name):
+        """Return (model, seconds spent loading it; 0.0 when already loaded)"""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name], 0.0
+            while len(self._models) >= self.max_models:
+                evicted, _ = self._models.popitem(last=False)
+                self.evictions += 1
+                logger.info(f"Evicted Whisper model {evicted}")
+                _release_memory()
+            began = time.monotonic()
+            model = self._loader(name)
+            elapsed = time.monotonic() - began
+            self._models[name] = model
+            self.loads += 1
+            self.load_seconds[name] = round(elapsed, 3)
+            logger.info(f"Loaded Whisper model {name} in {elapsed:.1f}s")
+            return model, elapsed
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+
+class TranscriptionServer:
+    """Request queue in front of a ModelPool, drained by one worker thread"""
+
+    def __init__(self, pool=None, max_queue=MAX_QUEUE):
+        self.pool = pool or ModelPool()
+        self.requests = queue.Queue(max_queue)
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._totals = {
+            'requests': 0,
+            'failed': 0,
+            'queued_seconds': 0.0,
+            'load_seconds': 0.0,
+            'inference_seconds': 0.0,
+        }
+        self._worker = threading.Thread(target=self._run, name='whisper-worker', daemon=True)
+        self._worker.start()
+
+    def submit(self, model, audio, options=None):
+        """Queue a request and wait for it; returns (result, timings).
+
+        Raises queue.Full when the queue is at capacity.
+        """
+        request = {
+            'model': model,
+            'audio': audio,
+            'options': options or {},
+            'queued_at': time.monotonic(),
+            'done': threading.Event(),
+        }
+        self.requests.put_nowait(request)
+        request['done'].wait()
+        if 'error' in request:
+            raise WhisperServerError(request['error'])
+        return request['result'], request['timings']
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            began = time.monotonic()
+            timings = {'queued_seconds': round(began - request['queued_at'], 3)}
+            try:
+                model, load_seconds = self.pool.get(request['model'])
+                timings['load_seconds'] = round(load_seconds, 3)
+                began = time.monotonic()
+                request['result'] = model.transcribe(request['audio'], **request['options'])
+                timings['inference_seconds'] = round(time.monotonic() - began, 3)
+            except Exception as e:
+                logger.error(f"Transcription failed: {str(e)}")
+                request['error'] = str(e)
+            request['timings'] = timings
+            with self._lock:
+                self._totals['requests'] += 1
+                self._totals['failed'] += 'error' in request
+                for name, seconds in timings.items():
+                    self._totals[name] += seconds
+            request['done'].set()
+
+    def status(self):
+        with self._lock:
+            totals = dict(self._totals)
+        completed = totals['requests'] - totals['failed']
+        return {
+            'models': self.pool.loaded(),
+            'max_models': self.pool.max_models,
+            'model_loads': self.pool.loads,
+            'evictions': self.pool.evictions,
+            'load_seconds': self.pool.load_seconds,
+            'queue_depth': self.requests.qsize(),
+            'queue_capacity': self.requests.maxsize,
+            'requests': totals['requests'],
+            'failed': totals['failed'],
+            'avg_queued_seconds': round(totals['queued_seconds'] / totals['requests'], 3)
+            if totals['requests'] else None,
+            'avg_inference_seconds': round(totals['inference_seconds'] / completed, 3)
+            if completed else None,
+            'uptime_seconds': round(time.time() - self.started),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'WhisperServer/1.0'
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/status':
+            return self._send(404, {'error': 'Not found'})
+        self._send(200, self.server.transcriber.status())
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        if parts.path != '/transcribe':
+            return self._send(404, {'error': 'Not found'})
+        params = dict(parse_qsl(parts.query))
+        model = params.get('model', DEFAULT_MODEL)
+        if self.server.model_names and model not in self.server.model_names:
+            return self._send(400, {'error': f'Unknown model {model}'})
+
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/octet-stream'):
+                audio = np.frombuffer(body, np.float32)
+                options = json.loads(params.get('options') or '{}')
+            else:
+                payload = json.loads(body or b'{}')
+                audio = payload.get('path')
+                options = payload.get('options') or {}
+        except ValueError:
+            return self._send(400, {'error': 'Malformed request'})
+        if isinstance(audio, str) and not os.path.exists(audio):
+            return self._send(400, {'error': f'No such file: {audio}'})
+        if audio is None or not len(audio):
+            return self._send(400, {'error': 'No audio in request'})
+        options['verbose'] = None  # never print transcripts in the server
+
+        try:
+            result, timings = self.server.transcriber.submit(model, audio, options)
+        except queue.Full:
+            return self._send(503, {'error': 'Transcription queue is full'})
+        except WhisperServerError as e:
+            return self._send(500, {'error': str(e)})
+        self._send(200, {'result': result, 'timings': timings})
+
+    def _send(self, status, body):
+        data = json.dumps(body, default=_to_json, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, transcriber=None):
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.daemon_threads = True
+    httpd.transcriber = transcriber or TranscriptionServer()
+    httpd.model_names = _model_names() if transcriber is None else None
+    return httpd
+
+
+class WhisperClient:
+    """Talks to a running whisper_server"""
+
+    def __init__(self, url=WHISPER_SERVER_URL, timeout=REQUEST_TIMEOUT):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def status(self, timeout=5):
+        with urllib.request.urlopen(f'{self.url}/status', timeout=timeout) as response:
+            return json.load(response)
+
+    def transcribe(self, audio, model=DEFAULT_MODEL, **options):
+        """Transcribe a file path or float32 16 kHz samples; returns (result, timings).
+
+        Connection problems raise OSError so callers can fall back to a
+        local model; failures reported by the server raise WhisperServerError.
+        """
+        query = {'model': model}
+        if isinstance(audio, str):
+            body = json.dumps({'path': os.path.abspath(audio), 'options': options}).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            body = np.ascontiguousarray(audio, np.float32).tobytes()
+            content_type = 'application/octet-stream'
+            query['options'] = json.dumps(options)
+        request = urllib.request.Request(
+            f'{self.url}/transcribe?{urlencode(query)}',
+            data=body,
+            headers={'Content-Type': content_type},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.load(response)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.load(e).get('error')
+            except ValueError:
+                message = None
+            raise WhisperServerError(message or f'HTTP {e.code}') from e
+        return payload['result'], payload['timings']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve Whisper transcription on localhost')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-models', type=int, default=MAX_MODELS,
+                        help='models kept loaded before the least recently used is evicted')
+    parser.add_argument('--queue-size', type=int, default=MAX_QUEUE)
+    parser.add_argument('--preload', action='append', default=[],
+                        help='model to load at startup (repeatable)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    transcriber = TranscriptionServer(ModelPool(args.max_models), args.queue_size)
+    for name in args.preload:
+        transcriber.pool.get(name)
+    httpd = make_server(args.host, args.port, transcriber)
+    httpd.model_names = _model_names()
+    print(f"Whisper server listening on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
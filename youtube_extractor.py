@@ -1,110 +1,286 @@
-from yt_dlp import YoutubeDL
+import argparse
+import gzip
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import os
+import threading
+
+from youtube_import import iter_channel_entries, resolve_channel
+
+MAX_VIDEOS = 1000
+CHECKPOINT_EVERY = 50  # videos between cursor updates
+
+
+class JsonlSink:
+    """Append-only JSON lines file, optionally gzip compressed.
+
+    ``checkpoint()`` makes everything written so far durable and returns the
+    byte offset to resume from. With gzip each checkpoint closes the current
+    member, so a file truncated to a checkpoint is always a valid gzip.
+    """
+
+    def __init__(self, path, compress=False, offset=0):
+        self.path = path
+        self.compress = compress
+        if os.path.exists(path):
+            # Drop a partial line or gzip member left after the last checkpoint
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self._raw = open(path, 'ab')
+        self._file = None
+        self._open_member()
+
+    def _open_member(self):
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='ab') if self.compress else self._raw
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        self._file.write(line.encode('utf-8'))
+
+    def checkpoint(self):
+        if self.compress:
+            self._file.close()  # writes the member trailer, leaves _raw open
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        offset = self._raw.tell()
+        if self.compress:
+            self._open_member()
+        return offset
+
+    def close(self):
+        offset = self.checkpoint()
+        if self.compress:
+            self._file.close()
+        self._raw.close()
+        return offset
+
+
+def read_jsonl(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_titles(jsonl_path, txt_path):
+    """Derived pass: one title per line from a channel's JSONL file"""
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        for video in read_jsonl(jsonl_path):
+            f.write(f"{video['title']}\n")
+    return txt_path
+
 
 class YouTubeExtractor:
-    def __init__(self, output_dir='youtube_data'):
+    def __init__(self, output_dir='youtube_data', compress=False, titles=True):
         self.output_dir = output_dir
+        self.compress = compress
+        self.titles = titles
+        self._claims_lock = threading.Lock()
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-    def extract_channel_data(self, url):
+    def _load_cursor(self, path):
         try:
-            # First get the channel URL
-            with YoutubeDL({
-                'quiet': True,
-                'extract_flat': True
-            }) as ydl:
-                info = ydl.extract_info(url, download=False)
-                channel_url = info.get('channel_url') or info.get('uploader_url')
-                channel_name = info.get('uploader') or info.get('channel')
-                
-                if not channel_url:
-                    print("Could not find channel URL")
-                    return None
-
-            # Configure YoutubeDL for channel extraction
-            ydl_opts = {
-                'quiet': True,
-                'extract_flat': True,
-                'force_generic_extractor': False,
-                'ignoreerrors': True,
-                'extract_flat_playlist': True,
-                'playlist_items': '1-1000',  # Try to get up to 1000 videos
-                'max_downloads': 1000,
-                'break_on_reject': False,
-                'no_warnings': True
-            }
-            
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cursor(self, path, cursor):
+        cursor['updated_at'] = datetime.now().isoformat()
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(cursor, f, ensure_ascii=False, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def extract_channel_data(self, url, max_videos=MAX_VIDEOS, claims=None):
+        """Stream a channel's videos to ``<channel>_<timestamp>.jsonl[.gz]``.
+
+        Videos are written one compact line at a time as yt-dlp pages through
+        the channel, so memory stays flat however large the channel is. A
+        cursor file next to the output is updated every CHECKPOINT_EVERY
+        videos; if a run dies, the next run for the same channel truncates
+        the output to the last checkpoint and continues after the last
+        video it recorded, or starts over if that video is no longer listed.
+
+        ``claims`` maps channel names to the URL extracting them; a URL for
+        a channel already claimed returns ``{'duplicate_of': url}`` instead
+        of writing to the same cursor and output files.
+        """
+        try:
+            # First get the channel URL, without listing the channel
+            channel_url, channel_name, _ = resolve_channel(url)
+            channel_name = channel_name or channel_url
+
+            if not channel_url:
+                print("Could not find channel URL")
+                return None
+
+            safe_channel_name = "".join(x for x in channel_name if x.isalnum() or x in (' ', '-', '_'))
+            if claims is not None:
+                with self._claims_lock:
+                    owner = claims.setdefault(safe_channel_name, url)
+                if owner != url:
+                    print(f"{url} is the same channel as {owner}; skipping")
+                    return {'channel_name': channel_name, 'duplicate_of': owner}
+            cursor_file = os.path.join(self.output_dir, f"{safe_channel_name}.cursor.json")
+            cursor = self._load_cursor(cursor_file)
+            if cursor and not cursor['complete'] and os.path.exists(cursor['output']):
+                print(f"Resuming {channel_name} after {cursor['count']} videos")
+            else:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                suffix = '.jsonl.gz' if self.compress else '.jsonl'
+                cursor = {
+                    'channel_url': channel_url,
+                    'channel_name': channel_name,
+                    'output': os.path.join(self.output_dir, f"{safe_channel_name}_{timestamp}{suffix}"),
+                    'offset': 0,
+                    'count': 0,
+                    'last_video_id': None,
+                    'complete': False,
+                    'extraction_date': datetime.now().isoformat(),
+                }
+            jsonl_file = cursor['output']
+            sink = JsonlSink(jsonl_file, jsonl_file.endswith('.gz'), cursor['offset'])
+
             print(f"Fetching all videos from channel: {channel_url}")
-            with YoutubeDL(ydl_opts) as ydl:
-                channel_info = ydl.extract_info(channel_url, download=False)
-                
-                if not channel_info:
-                    print("No channel information found")
-                    return None
-
-                videos = []
-                if 'entries' in channel_info:
-                    # Process all videos in the channel
-                    for entry in channel_info['entries']:
-                        if entry and entry.get('title') and entry.get('id'):
-                            video = {
-                                'video_id': entry.get('id'),
-                                'title': entry.get('title'),
-                                'url': f'https://youtube.com/watch?v={entry.get("id")}',
-                                'channel_name': channel_name,
-                                'upload_date': entry.get('upload_date', ''),
-                                'duration': entry.get('duration', 0),
-                                'view_count': entry.get('view_count', 0)
-                            }
-                            videos.append(video)
-                            print(f"Found video: {video['title']}")
-
-                    if videos:
-                        # Save the data
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        safe_channel_name = "".join(x for x in channel_name if x.isalnum() or x in (' ', '-', '_'))
-                        
-                        # Save JSON with all video data
-                        json_file = os.path.join(self.output_dir, f"{safe_channel_name}_{timestamp}.json")
-                        with open(json_file, 'w', encoding='utf-8') as f:
-                            json.dump({
-                                'channel_name': channel_name,
-                                'video_count': len(videos),
-                                'extraction_date': datetime.now().isoformat(),
-                                'videos': videos
-                            }, f, ensure_ascii=False, indent=2)
-
-                        # Save titles to text file
-                        txt_file = os.path.join(self.output_dir, f"{safe_channel_name}_{timestamp}_titles.txt")
-                        with open(txt_file, 'w', encoding='utf-8') as f:
-                            for video in videos:
-                                f.write(f"{video['title']}\n")
-
-                        print(f"\nExtracted {len(videos)} videos from {channel_name}")
-                        print(f"JSON saved to: {json_file}")
-                        print(f"Titles saved to: {txt_file}")
-
-                        return {
+            try:
+                while True:
+                    skipping = cursor['last_video_id'] is not None
+                    for entry in iter_channel_entries(channel_url):
+                        if skipping:
+                            skipping = entry['id'] != cursor['last_video_id']
+                            continue
+                        if cursor['count'] >= max_videos:
+                            break
+                        sink.write({
+                            'video_id': entry.get('id'),
+                            'title': entry.get('title'),
+                            'url': f'https://youtube.com/watch?v={entry.get("id")}',
                             'channel_name': channel_name,
-                            'video_count': len(videos),
-                            'videos': videos,
-                            'json_file': json_file,
-                            'txt_file': txt_file
-                        }
-                
+                            'upload_date': entry.get('upload_date', ''),
+                            'duration': entry.get('duration', 0),
+                            'view_count': entry.get('view_count', 0)
+                        })
+                        cursor['count'] += 1
+                        cursor['last_video_id'] = entry['id']
+                        if cursor['count'] % CHECKPOINT_EVERY == 0:
+                            cursor['offset'] = sink.checkpoint()
+                            self._save_cursor(cursor_file, cursor)
+                    if not skipping:
+                        break
+                    # The last recorded video was deleted or made private, so
+                    # there is no position to resume from: start over
+                    print(f"Video {cursor['last_video_id']} is no longer listed; "
+                          f"restarting {channel_name} from the beginning")
+                    sink.close()
+                    cursor.update(offset=0, count=0, last_video_id=None)
+                    sink = JsonlSink(jsonl_file, jsonl_file.endswith('.gz'), 0)
+                cursor['complete'] = True
+            finally:
+                cursor['offset'] = sink.close()
+                self._save_cursor(cursor_file, cursor)
+
+            if not cursor['count']:
                 print("No videos found in channel")
                 return None
 
+            txt_file = None
+            if self.titles:
+                txt_file = write_titles(jsonl_file, jsonl_file.split('.jsonl')[0] + '_titles.txt')
+
+            print(f"\nExtracted {cursor['count']} videos from {channel_name}")
+            print(f"JSONL saved to: {jsonl_file}")
+            if txt_file:
+                print(f"Titles saved to: {txt_file}")
+
+            return {
+                'channel_name': channel_name,
+                'video_count': cursor['count'],
+                'jsonl_file': jsonl_file,
+                'txt_file': txt_file,
+                'cursor_file': cursor_file
+            }
+
         except Exception as e:
             print(f"Error extracting channel data: {str(e)}")
             return None
 
+    def extract_channels(self, urls, workers=4):
+        """Extract many channels concurrently and write a combined summary.
+
+        Channel listings are network bound, so a thread pool is enough; each
+        channel's files are written as soon as that channel finishes.
+        """
+        urls = list(dict.fromkeys(url.strip() for url in urls if url.strip()))
+        started = time.monotonic()
+        channels = []
+        claims = {}  # URLs that resolve to the same channel are extracted once
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(self._extract_timed, url, claims): url for url in urls}
+            for done, future in enumerate(as_completed(futures), 1):
+                url = futures[future]
+                result, seconds = future.result()
+                status = 'failed'
+                if result:
+                    status = 'duplicate' if 'duplicate_of' in result else 'completed'
+                channel = {'url': url, 'status': status, 'seconds': round(seconds, 2)}
+                if result:
+                    channel.update(result)
+                channels.append(channel)
+                print(f"[{done}/{len(urls)}] {channel['status']}: {url}")
+
+        summary = {
+            'extraction_date': datetime.now().isoformat(),
+            'channel_count': len(urls),
+            'completed': sum(1 for c in channels if c['status'] == 'completed'),
+            'failed': sum(1 for c in channels if c['status'] == 'failed'),
+            'duplicates': sum(1 for c in channels if c['status'] == 'duplicate'),
+            'video_count': sum(c.get('video_count', 0) for c in channels),
+            'seconds': round(time.monotonic() - started, 2),
+            'channels': channels,
+        }
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        summary_file = os.path.join(self.output_dir, f"summary_{timestamp}.json")
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        summary['summary_file'] = summary_file
+        return summary
+
+    def _extract_timed(self, url, claims=None):
+        started = time.monotonic()
+        result = self.extract_channel_data(url, claims=claims)
+        return result, time.monotonic() - started
+
+
+def read_url_file(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
 def main():
-    extractor = YouTubeExtractor()
-    
+    parser = argparse.ArgumentParser(description='Extract video lists from YouTube channels')
+    parser.add_argument('urls', nargs='*', help='channel or video URLs')
+    parser.add_argument('--file', help='file with one URL per line')
+    parser.add_argument('--workers', type=int, default=4, help='channels extracted in parallel')
+    parser.add_argument('--output-dir', default='youtube_data')
+    parser.add_argument('--gzip', action='store_true', help='compress the JSONL output')
+    parser.add_argument('--no-titles', action='store_true', help='skip the titles text file')
+    args = parser.parse_args()
+
+    extractor = YouTubeExtractor(args.output_dir, compress=args.gzip, titles=not args.no_titles)
+    urls = args.urls + (read_url_file(args.file) if args.file else [])
+    if urls:
+        summary = extractor.extract_channels(urls, workers=args.workers)
+        print(f"\nExtracted {summary['video_count']} videos from {summary['completed']} of "
+              f"{summary['channel_count']} channels in {summary['seconds']}s "
+              f"({summary['failed']} failed, {summary['duplicates']} duplicate)")
+        print(f"Summary saved to: {summary['summary_file']}")
+        return
+
     while True:
         url = input("\nEnter YouTube channel or video URL (or 'quit' to exit): ")
         if url.lower() == 'quit':
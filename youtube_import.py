@@ -0,0 +1,262 @@
+import re
+
+from yt_dlp import YoutubeDL
+
+from ytdlp_cache import cache_key, get_cache
+
+CHANNEL_SYNC_LIMIT = 5000  # safety cap on videos walked in one sync
+# Already-imported videos re-checked per sync for title/thumbnail changes;
+# one listing page, so refreshing them usually costs no extra requests
+CHANNEL_REFRESH_WINDOW = 30
+# Entries checked against the database together, about one listing page
+CHANNEL_PAGE_SIZE = 30
+CHANNEL_TAB = re.compile(r'/(videos|shorts|streams|playlists)/?$')
+
+
+def best_thumbnail(entry):
+    thumbnail_url = entry.get('thumbnail')
+    if isinstance(entry.get('thumbnails'), list):
+        thumbnails = sorted(
+            entry['thumbnails'],
+            key=lambda x: (x.get('height') or 0) * (x.get('width') or 0),
+            reverse=True
+        )
+        if thumbnails:
+            thumbnail_url = thumbnails[0].get('url')
+    return thumbnail_url
+
+
+def video_from_entry(entry, channel_name=None):
+    """youtube_data fields from a (flat) playlist entry"""
+    return {
+        'video_id': entry.get('id'),
+        'title': entry.get('title'),
+        'url': entry.get('webpage_url') or f'https://youtube.com/watch?v={entry.get("id")}',
+        'thumbnail_url': best_thumbnail(entry),
+        'channel_name': entry.get('uploader') or entry.get('channel') or channel_name
+    }
+
+
+UPSERT_VIDEO = '''
+    INSERT INTO youtube_data
+    (user_id, video_id, title, url, thumbnail_url, channel_name)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, video_id) DO UPDATE SET
+        title = excluded.title,
+        url = excluded.url,
+        thumbnail_url = excluded.thumbnail_url,
+        channel_name = excluded.channel_name
+'''
+LOOKUP_CHUNK = 500  # stays well under SQLite's bound-parameter limit
+
+
+def existing_videos(conn, user_id, video_ids):
+    """Map video_id -> (title, thumbnail_url) for ids the user already has"""
+    existing = {}
+    for start in range(0, len(video_ids), LOOKUP_CHUNK):
+        chunk = video_ids[start:start + LOOKUP_CHUNK]
+        placeholders = ', '.join('?' for _ in chunk)
+        for video_id, title, thumbnail_url in conn.execute(
+            f'''
+            SELECT video_id, title, thumbnail_url FROM youtube_data
+            WHERE user_id = ? AND video_id IN ({placeholders})
+            ''',
+            [user_id] + chunk,
+        ):
+            existing[video_id] = (title, thumbnail_url)
+    return existing
+
+
+def import_videos(conn, user_id, videos):
+    """Upsert a channel's videos into the user's collection.
+
+    Existing rows are looked up in bulk, then new and changed videos (title
+    or thumbnail) are written with one batched upsert on the unique
+    (user_id, video_id) index. Unchanged rows aren't touched, so the search
+    index triggers don't fire for them. The caller commits.
+
+    Returns {'added', 'updated', 'unchanged'} counts.
+    """
+    # A channel listing can repeat a video; keep the last copy
+    latest = {video['video_id']: video for video in videos}
+    existing = existing_videos(conn, user_id, list(latest))
+
+    rows = []
+    added = updated = unchanged = 0
+    for video_id, video in latest.items():
+        current = existing.get(video_id)
+        if current is None:
+            added += 1
+        elif current != (video['title'], video['thumbnail_url']):
+            updated += 1
+        else:
+            unchanged += 1
+            continue
+        rows.append((
+            user_id,
+            video_id,
+            video['title'],
+            video['url'],
+            video['thumbnail_url'],
+            video['channel_name'],
+        ))
+
+    conn.executemany(UPSERT_VIDEO, rows)
+    return {'added': added, 'updated': updated, 'unchanged': unchanged}
+
+
+VIDEO_FIELDS = ('id', 'title', 'webpage_url', 'thumbnail', 'thumbnails', 'uploader', 'channel')
+
+
+def resolve_channel(url):
+    """Return (channel_url, channel_name, info) for a channel or video URL.
+
+    channel_url is None when the video has no channel, e.g. a bare upload.
+    Only the fields needed here are cached, never the channel's entries.
+    """
+    def resolve():
+        with YoutubeDL({'quiet': True, 'extract_flat': True}) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+        channel_url = info.get('channel_url') or info.get('uploader_url')
+        if not channel_url and info.get('_type') in ('playlist', 'url', 'url_transparent'):
+            channel_url = url  # already a channel page
+        return {
+            'channel_url': channel_url,
+            'channel_name': info.get('channel') or info.get('uploader'),
+            'info': {field: info.get(field) for field in VIDEO_FIELDS},
+        }
+
+    resolved = get_cache().fetch(cache_key(url, namespace='channel'), resolve)
+    return resolved['channel_url'], resolved['channel_name'], resolved['info']
+
+
+def iter_channel_entries(channel_url):
+    """Yield a channel's uploads newest first, fetching pages only as needed.
+
+    With process=False yt-dlp hands back the tab's entries as a generator
+    that requests each continuation page lazily, so stopping early stops
+    the network traffic too.
+    """
+    if not CHANNEL_TAB.search(channel_url):
+        channel_url = channel_url.rstrip('/') + '/videos'
+    opts = {'quiet': True, 'extract_flat': True, 'ignoreerrors': True, 'no_warnings': True}
+    with YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(channel_url, download=False, process=False)
+        for entry in (info or {}).get('entries') or []:
+            if entry and entry.get('id') and entry.get('title'):
+                yield entry
+
+
+def sync_channel(conn, user_id, url, progress=None, limit=CHANNEL_SYNC_LIMIT):
+    """Import new videos from the channel behind a channel or video URL"""
+    channel_url, channel_name, info = resolve_channel(url)
+    if not channel_url:
+        # A video without a channel page: import just that video
+        if not info.get('id'):
+            raise ValueError('No videos found or invalid URL')
+        counts = import_videos(conn, user_id, [video_from_entry(info)])
+        return dict(counts, channel_id=None, new=counts['added'])
+    return sync_channel_videos(conn, user_id, channel_url, channel_name, progress, limit)
+
+
+def sync_channel_videos(conn, user_id, channel_url, channel_name=None, progress=None,
+                        limit=CHANNEL_SYNC_LIMIT, refresh=CHANNEL_REFRESH_WINDOW):
+    """Import a channel's videos that aren't stored yet.
+
+    Walks the channel newest first until the newest video recorded at the
+    last sync (or, without one, the first video the user already has), then
+    keeps going for ``refresh`` already-stored videos so their titles and
+    thumbnails are updated, so repeat imports cost O(new videos). The
+    channel is remembered in youtube_channels for scheduled refreshes. The
+    caller commits.
+
+    When ``limit`` cuts a walk short the channel is marked for backfill, and
+    later syncs carry on past the stored videos, importing older ones up to
+    ``limit`` per sync until the end of the channel is reached.
+    """
+    conn.execute(
+        """
+        INSERT INTO youtube_channels (user_id, channel_url, channel_name) VALUES (?, ?, ?)
+        ON CONFLICT(user_id, channel_url) DO UPDATE SET
+            channel_name = COALESCE(excluded.channel_name, channel_name)
+        """,
+        (user_id, channel_url, channel_name),
+    )
+    channel = conn.execute(
+        """
+        SELECT id, newest_video_id, backfill_pending FROM youtube_channels
+        WHERE user_id = ? AND channel_url = ?
+        """,
+        (user_id, channel_url),
+    ).fetchone()
+
+    def walk():
+        """Yield (entry, already stored) with one lookup per listing page"""
+        page = []
+        for entry in iter_channel_entries(channel_url):
+            page.append(entry)
+            if len(page) == CHANNEL_PAGE_SIZE:
+                yield from checked(page)
+                page = []
+        yield from checked(page)
+
+    def checked(page):
+        known = set(existing_videos(conn, user_id, [entry['id'] for entry in page]))
+        known.add(channel[1])
+        for entry in page:
+            yield entry, entry['id'] in known
+
+    def add(entry):
+        video = video_from_entry(entry, channel_name)
+        video['upload_date'] = entry.get('upload_date')
+        videos.append(video)
+
+    entries = walk()
+    videos = []
+    refreshed = 0
+    truncated = False
+    for entry, known in entries:
+        if len(videos) >= limit:
+            truncated = True
+            break
+        if refreshed or known:
+            if refreshed >= refresh:
+                break
+            refreshed += 1
+        add(entry)
+        if refreshed and refreshed >= refresh:
+            break  # don't request another page just to stop
+        if progress and len(videos) % 100 == 0:
+            progress(0.1, f"Found {len(videos) - refreshed} new videos")
+    newest = videos[0] if videos else {}
+
+    if channel[2] and not truncated:
+        # Continue the same walk into the older videos an earlier capped
+        # sync never reached
+        backfilled = 0
+        for entry, known in entries:
+            if known:
+                continue
+            if len(videos) >= limit:
+                truncated = True
+                break
+            add(entry)
+            backfilled += 1
+            if progress and backfilled % 100 == 0:
+                progress(0.1, f"Backfilled {backfilled} older videos")
+
+    counts = import_videos(conn, user_id, videos)
+    conn.execute(
+        """
+        UPDATE youtube_channels SET
+            newest_video_id = COALESCE(?, newest_video_id),
+            newest_upload_date = COALESCE(?, newest_upload_date),
+            video_count = video_count + ?,
+            backfill_pending = ?,
+            last_synced_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """,
+        (newest.get('video_id'), newest.get('upload_date'), counts['added'], int(truncated),
+         channel[0]),
+    )
+    return dict(counts, channel_id=channel[0], new=counts['added'], backfill_pending=truncated)
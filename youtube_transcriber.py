@@ -1,4 +1,6 @@
+import argparse
 import yt_dlp
+import ffmpeg
 import os
 import openai
 import whisper
@@ -6,13 +8,115 @@ import json
 from datetime import datetime, timedelta
 from pathlib import Path
 import tempfile
+import hashlib
 import logging
+import shutil
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import audio_chunks
+
+from whisper_server import WHISPER_SERVER_URL, WhisperClient
+from transcript_cache import (
+    get_transcript_cache, hash_file, stream_fingerprint, video_id, write_transcript,
+)
+from ytdlp_cache import cache_key, extract_info, get_cache
+
+class StageStats:
+    """Throughput counters for one stage of the batch pipeline"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.items += 1
+            self.failed += 0 if ok else 1
+            self.busy += seconds
+
+    def as_dict(self, wall_seconds):
+        return {
+            'items': self.items,
+            'failed': self.failed,
+            'busy_seconds': round(self.busy, 2),
+            'items_per_minute': round(self.items / wall_seconds * 60, 2) if wall_seconds else None,
+            'avg_seconds': round(self.busy / self.items, 2) if self.items else None,
+        }
+
+
+class MonitoredQueue(queue.Queue):
+    """Bounded queue that samples its depth on every put"""
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.max_depth = 0
+        self._samples = 0
+        self._depth_total = 0
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        depth = self.qsize()
+        with self.mutex:
+            self.max_depth = max(self.max_depth, depth)
+            self._samples += 1
+            self._depth_total += depth
+
+    def depth_stats(self):
+        return {
+            'depth': self.qsize(),
+            'max_depth': self.max_depth,
+            'avg_depth': round(self._depth_total / self._samples, 2) if self._samples else 0,
+            'capacity': self.maxsize,
+        }
+
+
+_DONE = object()
+
+# Native audio streams need no re-encode: Whisper and the API decode m4a/webm
+AUDIO_FORMATS = {
+    'native': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best',
+    'mp3': 'bestaudio/best',
+}
+
+_worker_model = None
+
+
+def _load_worker_model(model_name):
+    global _worker_model
+    _worker_model = whisper.load_model(model_name)
+
+
+def _transcribe_chunk_local(audio_file):
+    # Runs in a chunk worker process holding its own copy of the model
+    return _worker_model.transcribe(audio_file, word_timestamps=True, verbose=False)
+
 
 class YouTubeTranscriber:
-    def __init__(self, output_dir='transcriptions', use_openai=True, api_key=None):
+    def __init__(self, output_dir='transcriptions', use_openai=True, api_key=None,
+                 model_name='base', chunk_seconds=audio_chunks.CHUNK_TARGET, chunk_workers=2,
+                 use_cache=True, audio_format='native', stream=False, server_url=WHISPER_SERVER_URL):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.use_openai = use_openai
+        self.model_name = model_name
+        # Audio longer than chunk_seconds * 1.5 is split and transcribed in parallel
+        self.chunk_seconds = chunk_seconds
+        self.chunk_workers = chunk_workers
+        # Finished transcripts are reused per video id + model + audio hash
+        self.cache = get_transcript_cache() if use_cache else None
+        self._model = None
+        self._model_lock = threading.Lock()  # one local model, not thread-safe
+        # 'native' keeps YouTube's m4a/opus stream, 'mp3' re-encodes as before
+        self.audio_format = audio_format
+        # Local model only: decode the stream URL to PCM in memory, no temp file
+        self.stream = stream
         
         # Setup logging
         logging.basicConfig(level=logging.INFO,
@@ -30,44 +134,144 @@ class YouTubeTranscriber:
                 self.logger.error(f"Error initializing OpenAI: {str(e)}")
                 self.use_openai = False
                 self.logger.info("Falling back to local Whisper model")
-        
-        # Initialize local Whisper model if not using OpenAI
-        if not self.use_openai:
+
+        # A running whisper_server keeps models loaded across runs and workers
+        self.client = WhisperClient(server_url) if server_url and not self.use_openai else None
+        self._server_checked = False
+
+    def _use_server(self):
+        """True if the Whisper server answers; otherwise drop to the local model.
+
+        Checked once per transcriber, so a missing server costs one refused
+        connection rather than a failed request per file or chunk.
+        """
+        if self.client is not None and not self._server_checked:
+            self._server_checked = True
+            try:
+                self.client.status()
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Whisper server unavailable at {self.client.url} "
+                                    f"({str(e)}), using a local model")
+                self.client = None
+        return self.client is not None
+
+    @property
+    def model(self):
+        """Local Whisper model, loaded on first use so cache hits never pay for it"""
+        if self._model is None:
             try:
                 self.logger.info("Loading local Whisper model...")
-                self.model = whisper.load_model("base")
+                self._model = whisper.load_model(self.model_name)
                 self.logger.info("Local Whisper model loaded successfully")
             except Exception as e:
                 self.logger.error(f"Error loading local Whisper model: {str(e)}")
                 raise
+        return self._model
+
+    @property
+    def model_id(self):
+        """Identifies the model in transcript cache keys"""
+        return 'openai:whisper-1' if self.use_openai else f'whisper:{self.model_name}'
 
     def format_timestamp(self, seconds):
         """Convert seconds to HH:MM:SS format"""
         return str(timedelta(seconds=int(seconds)))
 
+    def _info_opts(self):
+        return {'format': AUDIO_FORMATS[self.audio_format], 'quiet': True}
+
+    def _with_fresh_info(self, url, action):
+        """Run ``action(info)`` with cached video info; if the cached stream
+        URLs have expired the entry is refreshed once and the action retried"""
+        info_opts = self._info_opts()
+        info = extract_info(url, info_opts)
+        try:
+            return action(info)
+        except (yt_dlp.utils.DownloadError, ffmpeg.Error):
+            self.logger.info("Cached stream URL failed, refreshing video info")
+            get_cache().invalidate(cache_key(url, info_opts))
+            return action(extract_info(url, info_opts))
+
     def download_audio(self, url):
-        """Download audio from YouTube video"""
+        """Download audio from YouTube video into its own temp directory.
+
+        Returns (path, title, duration). The file keeps the extension of
+        what was actually written; release it with ``discard_audio``.
+        """
+        temp_dir = tempfile.mkdtemp(prefix='yt_audio_')
+        ydl_opts = {
+            'format': AUDIO_FORMATS[self.audio_format],
+            'outtmpl': os.path.join(temp_dir, 'audio.%(ext)s'),
+            'quiet': True,
+        }
+        if self.audio_format == 'mp3':
+            ydl_opts['postprocessors'] = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }]
+
+        def download(info):
+            # A retry after an expired stream URL starts from an empty dir
+            for name in os.listdir(temp_dir):
+                os.remove(os.path.join(temp_dir, name))
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                self.logger.info("Downloading audio...")
+                result = ydl.process_ie_result(info, download=True)
+            downloads = result.get('requested_downloads') or []
+            path = downloads[0].get('filepath') if downloads else None
+            if not path or not os.path.exists(path):
+                files = os.listdir(temp_dir)
+                if len(files) != 1:
+                    raise RuntimeError(f"Expected one audio file, found {files}")
+                path = os.path.join(temp_dir, files[0])
+            return path, info.get('title', 'Unknown Title'), info.get('duration', 0)
+
         try:
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '192',
-                    }],
-                    'outtmpl': temp_file.name,
-                    'quiet': True
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    self.logger.info("Downloading audio...")
-                    info = ydl.extract_info(url, download=True)
-                    return temp_file.name, info.get('title', 'Unknown Title'), info.get('duration', 0)
+            return self._with_fresh_info(url, download)
         except Exception as e:
+            shutil.rmtree(temp_dir, ignore_errors=True)
             self.logger.error(f"Error downloading audio: {str(e)}")
             raise
 
+    def stream_audio(self, url):
+        """Decode the audio stream straight to 16 kHz PCM in memory.
+
+        Returns (samples, title, duration); nothing is written to disk.
+        """
+        def decode(info):
+            self.logger.info("Streaming audio...")
+            samples = audio_chunks.load_pcm(info['url'], info.get('http_headers'))
+            return samples, info.get('title', 'Unknown Title'), info.get('duration', 0)
+
+        try:
+            return self._with_fresh_info(url, decode)
+        except Exception as e:
+            self.logger.error(f"Error streaming audio: {str(e)}")
+            raise
+
+    def fetch_audio(self, url):
+        """Audio for ``url``: PCM samples when streaming is possible, else a
+        downloaded file. Long videos are always downloaded so they can be
+        chunked from disk."""
+        if self.stream and not self.use_openai:
+            info = extract_info(url, self._info_opts())
+            duration = info.get('duration') or 0
+            if not (self.chunk_seconds and duration > self.chunk_seconds * 1.5):
+                return self.stream_audio(url)
+        return self.download_audio(url)
+
+    @staticmethod
+    def discard_audio(audio):
+        """Delete a downloaded file and the temp directory it was written to"""
+        if not isinstance(audio, str):
+            return
+        temp_dir = os.path.dirname(audio)
+        if os.path.basename(temp_dir).startswith('yt_audio_'):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        elif os.path.exists(audio):
+            os.remove(audio)
+
     def transcribe_openai(self, audio_file):
         """Transcribe audio using OpenAI's Whisper API"""
         try:
@@ -85,122 +289,385 @@ class YouTubeTranscriber:
             raise
 
     def transcribe_local(self, audio_file):
-        """Transcribe audio using local Whisper model"""
+        """Transcribe audio using local Whisper model, on the model server
+        when one is configured and reachable"""
+        if self._use_server():
+            try:
+                self.logger.info("Transcribing on Whisper server...")
+                result, timings = self.client.transcribe(
+                    audio_file, self.model_name, word_timestamps=True)
+                self.logger.info(f"Whisper server timings: {timings}")
+                return result
+            except OSError as e:
+                self.logger.warning(f"Whisper server unavailable ({str(e)}), loading model locally")
+                self.client = None
         try:
             self.logger.info("Transcribing with local Whisper model...")
-            result = self.model.transcribe(
-                audio_file,
-                word_timestamps=True,
-                verbose=True
-            )
+            with self._model_lock:
+                result = self.model.transcribe(
+                    audio_file,
+                    word_timestamps=True,
+                    verbose=True
+                )
             return result
         except Exception as e:
             self.logger.error(f"Error transcribing with local Whisper: {str(e)}")
             raise
 
+    def transcribe_audio(self, audio_file, duration=None):
+        """Transcribe a file or PCM samples, chunking long audio files"""
+        if not isinstance(audio_file, str):
+            return self.transcribe_local(audio_file)
+        duration = duration or audio_chunks.probe_duration(audio_file)
+        if self.chunk_seconds and duration > self.chunk_seconds * 1.5:
+            return self.transcribe_chunked(audio_file, duration)
+        if self.use_openai:
+            return self.transcribe_openai(audio_file)
+        return self.transcribe_local(audio_file)
+
+    def transcribe_chunked(self, audio_file, duration, workers=None):
+        """Split at silences, transcribe chunks in parallel and stitch.
+
+        API and model server chunks are sent from threads; otherwise local
+        chunks run in worker processes that each load the model, so memory
+        per worker is one model plus one chunk. With a single worker, or
+        inside a daemonic process (such as a job worker) that may not start
+        children, the loaded model transcribes the chunks in turn.
+        """
+        workers = workers or self.chunk_workers
+        remote = self.use_openai or self._use_server()
+        if multiprocessing.current_process().daemon and not remote:
+            workers = 1
+        cuts = audio_chunks.plan_chunks(
+            duration, audio_chunks.detect_silences(audio_file),
+            target=self.chunk_seconds, max_length=self.chunk_seconds * 1.5,
+        )
+        windows = audio_chunks.chunk_windows(cuts)
+        self.logger.info(f"Transcribing {len(windows)} chunks with {workers} workers...")
+
+        # Only API uploads need mp3's size; local models get lossless PCM
+        ext = 'mp3' if self.use_openai else 'wav'
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            paths = [
+                audio_chunks.extract_chunk(
+                    audio_file, start, end, os.path.join(chunk_dir, f"chunk_{i:04d}.{ext}"))
+                for i, (start, end, _cut) in enumerate(windows)
+            ]
+            if remote:
+                transcribe = self.transcribe_openai if self.use_openai else self.transcribe_local
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(transcribe, paths))
+            elif workers > 1:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_load_worker_model,
+                                         initargs=(self.model_name,)) as pool:
+                    results = list(pool.map(_transcribe_chunk_local, paths))
+            else:
+                results = [self.transcribe_local(path) for path in paths]
+
+        return audio_chunks.stitch(results, windows)
+
     def save_transcription(self, transcription, video_title, duration):
         """Save transcription to files with timestamps"""
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             safe_title = "".join(x for x in video_title if x.isalnum() or x in (' ', '-', '_'))
-            base_path = self.output_dir / f"{safe_title}_{timestamp}"
-
-            # Save JSON with full transcription data
-            json_path = base_path.with_suffix('.json')
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(transcription, f, ensure_ascii=False, indent=2)
-
-            # Save timestamped transcription
-            text_path = base_path.with_suffix('.txt')
-            srt_path = base_path.with_suffix('.srt')
-
-            with open(text_path, 'w', encoding='utf-8') as txt_file, \
-                 open(srt_path, 'w', encoding='utf-8') as srt_file:
-                
-                if self.use_openai:
-                    # Process OpenAI response
-                    segments = transcription.get('segments', [])
-                    for i, segment in enumerate(segments, 1):
-                        start_time = self.format_timestamp(segment['start'])
-                        end_time = self.format_timestamp(segment['end'])
-                        text = segment['text'].strip()
-
-                        # Write to text file with timestamps
-                        txt_file.write(f"[{start_time} --> {end_time}] {text}\n")
-
-                        # Write to SRT file
-                        srt_file.write(f"{i}\n")
-                        srt_file.write(f"{start_time},000 --> {end_time},000\n")
-                        srt_file.write(f"{text}\n\n")
-                else:
-                    # Process local Whisper response
-                    segments = transcription.get('segments', [])
-                    for i, segment in enumerate(segments, 1):
-                        start_time = self.format_timestamp(segment['start'])
-                        end_time = self.format_timestamp(segment['end'])
-                        text = segment['text'].strip()
-
-                        # Write to text file with timestamps
-                        txt_file.write(f"[{start_time} --> {end_time}] {text}\n")
-
-                        # Write to SRT file
-                        srt_file.write(f"{i}\n")
-                        srt_file.write(f"{start_time},000 --> {end_time},000\n")
-                        srt_file.write(f"{text}\n\n")
-
-            return {
-                'json_path': str(json_path),
-                'text_path': str(text_path),
-                'srt_path': str(srt_path)
-            }
+            return write_transcript(transcription, self.output_dir / f"{safe_title}_{timestamp}")
         except Exception as e:
             self.logger.error(f"Error saving transcription: {str(e)}")
             raise
 
+    def cached_result(self, entry, url=None):
+        """Result dict for a transcript served from the cache"""
+        self.logger.info(f"Using cached transcript: {entry['paths']['text_path']}")
+        result = {
+            'title': entry['title'],
+            'duration': entry['duration'],
+            'paths': entry['paths'],
+            'transcription': self.cache.load(entry['key']),
+            'cache_key': entry['key'],
+            'cached': True,
+        }
+        if url is not None:
+            result['url'] = url
+        return result
+
+    def audio_hash(self, url, audio_file):
+        """Fingerprint of the source stream, the same whether ``audio_file``
+        is a download or streamed PCM; content hash when the video info
+        names no format"""
+        audio_hash = stream_fingerprint(extract_info(url, self._info_opts()))
+        if audio_hash is not None:
+            return audio_hash
+        if isinstance(audio_file, str):
+            return hash_file(audio_file)
+        return hashlib.sha256(audio_file.data).hexdigest()
+
+    def lookup_audio(self, url, audio_file):
+        """Hash fetched audio (a file or PCM samples) and return
+        (audio_hash, cached entry or None)"""
+        if self.cache is None:
+            return None, None
+        audio_hash = self.audio_hash(url, audio_file)
+        entry = self.cache.lookup_audio(audio_hash, self.model_id)
+        if entry is not None:
+            self.cache.link(video_id(url), self.model_id, entry['key'])
+        return audio_hash, entry
+
+    def store_transcription(self, url, transcription, video_title, duration, audio_hash):
+        """Save into the transcript cache when enabled; returns (paths, cache key)"""
+        if self.cache is None:
+            return self.save_transcription(transcription, video_title, duration), None
+        entry = self.cache.put(self.model_id, audio_hash, transcription,
+                               video_title, duration, video_id(url))
+        return entry['paths'], entry['key']
+
     def transcribe_video(self, url):
         """Main method to transcribe a YouTube video"""
         try:
+            if self.cache is not None:
+                entry = self.cache.lookup_video(video_id(url), self.model_id)
+                if entry is not None:
+                    return self.cached_result(entry)
+
             # Download audio
-            audio_file, video_title, duration = self.download_audio(url)
+            audio_file, video_title, duration = self.fetch_audio(url)
             self.logger.info(f"Audio downloaded: {video_title}")
 
             try:
+                audio_hash, entry = self.lookup_audio(url, audio_file)
+                if entry is not None:
+                    return self.cached_result(entry)
+
                 # Transcribe audio
-                if self.use_openai:
-                    transcription = self.transcribe_openai(audio_file)
-                else:
-                    transcription = self.transcribe_local(audio_file)
+                transcription = self.transcribe_audio(audio_file, duration)
 
                 # Save transcription
-                paths = self.save_transcription(transcription, video_title, duration)
+                paths, key = self.store_transcription(
+                    url, transcription, video_title, duration, audio_hash)
                 self.logger.info(f"Transcription saved: {paths['text_path']}")
 
                 return {
                     'title': video_title,
                     'duration': duration,
                     'paths': paths,
-                    'transcription': transcription
+                    'transcription': transcription,
+                    'cache_key': key,
+                    'cached': False,
                 }
 
             finally:
                 # Clean up temporary audio file
-                if os.path.exists(audio_file):
-                    os.remove(audio_file)
+                self.discard_audio(audio_file)
 
         except Exception as e:
             self.logger.error(f"Error transcribing video: {str(e)}")
             raise
 
+    def transcribe_videos(self, urls, download_workers=3, transcribe_workers=None, queue_size=4):
+        """Transcribe many videos with downloads overlapping inference.
+
+        Downloads run on ``download_workers`` threads and feed a bounded queue
+        (so at most ``queue_size`` audio files wait on disk); transcription
+        runs on one thread for the local model, which holds a single model
+        per process (larger ``transcribe_workers`` are ignored), or several
+        for API calls or a Whisper server; a save thread writes the files.
+        Returns (results in input order, per-stage stats).
+        """
+        local = not (self.use_openai or self._use_server())
+        if transcribe_workers is None:
+            transcribe_workers = 4 if self.use_openai else 1
+        elif transcribe_workers > 1 and local:
+            self.logger.warning("The local Whisper model transcribes one file at a time; "
+                                "ignoring transcribe_workers")
+            transcribe_workers = 1
+        urls = list(urls)
+        results = [None] * len(urls)
+        stages = {name: StageStats(name) for name in ('download', 'transcribe', 'save')}
+        cached = 0
+        cached_lock = threading.Lock()
+        to_transcribe = MonitoredQueue(queue_size)
+        to_save = MonitoredQueue(queue_size)
+        started = time.monotonic()
+
+        def fail(index, url, stage, error, audio_file=None):
+            self.logger.error(f"{stage} failed for {url}: {str(error)}")
+            results[index] = {'url': url, 'error': f"{stage}: {error}"}
+            if audio_file is not None:
+                self.discard_audio(audio_file)
+
+        def from_cache(index, url, entry):
+            """Use a stored transcript; False if it can't be read"""
+            nonlocal cached
+            try:
+                results[index] = self.cached_result(entry, url)
+            except Exception as e:
+                self.logger.warning(f"Ignoring cached transcript for {url}: {str(e)}")
+                return False
+            with cached_lock:
+                cached += 1
+            return True
+
+        def download(index, url):
+            if self.cache is not None:
+                try:
+                    entry = self.cache.lookup_video(video_id(url), self.model_id)
+                except Exception as e:
+                    self.logger.warning(f"Transcript cache lookup failed for {url}: {str(e)}")
+                    entry = None
+                if entry is not None and from_cache(index, url, entry):
+                    return
+            began = time.monotonic()
+            audio_file = None
+            try:
+                audio_file, title, duration = self.fetch_audio(url)
+                audio_hash, entry = self.lookup_audio(url, audio_file)
+            except Exception as e:
+                stages['download'].record(time.monotonic() - began, ok=False)
+                fail(index, url, 'download', e, audio_file)
+                return
+            stages['download'].record(time.monotonic() - began)
+            if entry is not None and from_cache(index, url, entry):
+                self.discard_audio(audio_file)
+                return
+            to_transcribe.put((index, url, audio_file, title, duration, audio_hash))
+
+        def transcribe_stage():
+            while True:
+                item = to_transcribe.get()
+                if item is _DONE:
+                    return
+                index, url, audio_file, title, duration, audio_hash = item
+                began = time.monotonic()
+                try:
+                    transcription = self.transcribe_audio(audio_file, duration)
+                except Exception as e:
+                    stages['transcribe'].record(time.monotonic() - began, ok=False)
+                    fail(index, url, 'transcribe', e, audio_file)
+                    continue
+                stages['transcribe'].record(time.monotonic() - began)
+                to_save.put((index, url, audio_file, title, duration, audio_hash, transcription))
+
+        def save_stage():
+            while True:
+                item = to_save.get()
+                if item is _DONE:
+                    return
+                index, url, audio_file, title, duration, audio_hash, transcription = item
+                began = time.monotonic()
+                try:
+                    paths, key = self.store_transcription(url, transcription, title, duration, audio_hash)
+                except Exception as e:
+                    stages['save'].record(time.monotonic() - began, ok=False)
+                    fail(index, url, 'save', e, audio_file)
+                    continue
+                stages['save'].record(time.monotonic() - began)
+                self.discard_audio(audio_file)
+                results[index] = {
+                    'url': url,
+                    'title': title,
+                    'duration': duration,
+                    'paths': paths,
+                    'transcription': transcription,
+                    'cache_key': key,
+                    'cached': False,
+                }
+
+        transcribers = [threading.Thread(target=transcribe_stage, name=f'transcribe-{i}')
+                        for i in range(max(1, transcribe_workers))]
+        saver = threading.Thread(target=save_stage, name='save')
+        for thread in transcribers + [saver]:
+            thread.start()
+
+        with ThreadPoolExecutor(max_workers=max(1, download_workers),
+                                thread_name_prefix='download') as pool:
+            downloads = [pool.submit(download, index, url) for index, url in enumerate(urls)]
+        for index, future in enumerate(downloads):
+            # Anything download() didn't handle itself still gets a result
+            if future.exception() is not None:
+                fail(index, urls[index], 'download', future.exception())
+
+        for _ in transcribers:
+            to_transcribe.put(_DONE)
+        for thread in transcribers:
+            thread.join()
+        to_save.put(_DONE)
+        saver.join()
+
+        wall = time.monotonic() - started
+        stats = {name: stage.as_dict(wall) for name, stage in stages.items()}
+        stats['queues'] = {
+            'transcribe': to_transcribe.depth_stats(),
+            'save': to_save.depth_stats(),
+        }
+        stats['cached'] = cached
+        stats['wall_seconds'] = round(wall, 2)
+        return results, stats
+
+
+def read_url_file(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def run_batch(args, api_key):
+    transcriber = YouTubeTranscriber(
+        use_openai=bool(api_key), api_key=api_key,
+        chunk_seconds=args.chunk_seconds, chunk_workers=args.chunk_workers,
+        use_cache=not args.no_cache, audio_format=args.audio_format, stream=args.stream,
+        server_url=args.server,
+    )
+    urls = args.urls + (read_url_file(args.file) if args.file else [])
+    results, stats = transcriber.transcribe_videos(
+        urls,
+        download_workers=args.download_workers,
+        transcribe_workers=args.transcribe_workers,
+        queue_size=args.queue_size,
+    )
+    for result in results:
+        if 'error' in result:
+            print(f"FAILED {result['url']}: {result['error']}")
+        else:
+            label = 'CACHED' if result.get('cached') else 'OK    '
+            print(f"{label} {result['url']} -> {result['paths']['text_path']}")
+    print(json.dumps(stats, indent=2))
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Transcribe YouTube videos')
+    parser.add_argument('urls', nargs='*', help='video URLs to transcribe as a batch')
+    parser.add_argument('--file', help='file with one URL per line')
+    parser.add_argument('--download-workers', type=int, default=3)
+    parser.add_argument('--transcribe-workers', type=int,
+                        help='default: 1 for the local model, 4 for the API')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='downloaded files allowed to wait for transcription')
+    parser.add_argument('--chunk-seconds', type=int, default=audio_chunks.CHUNK_TARGET,
+                        help='split audio into chunks of about this length (0 to disable)')
+    parser.add_argument('--chunk-workers', type=int, default=2,
+                        help='chunks of one long video transcribed in parallel')
+    parser.add_argument('--audio-format', choices=sorted(AUDIO_FORMATS), default='native',
+                        help='native keeps the m4a/opus stream; mp3 re-encodes (slower)')
+    parser.add_argument('--stream', action='store_true',
+                        help='local model: decode audio to PCM in memory instead of downloading')
+    parser.add_argument('--server', default=WHISPER_SERVER_URL,
+                        help='whisper_server URL for local transcription '
+                             '(default: $WHISPER_SERVER_URL or the local server)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always download and transcribe, writing timestamped files')
+    args = parser.parse_args()
+
     # Get API key from environment or user input
     api_key = os.getenv('OPENAI_API_KEY')
+    if args.urls or args.file:
+        run_batch(args, api_key)
+        return
     if not api_key:
         api_key = input("Enter your OpenAI API key (press Enter to use local model): ").strip()
     
     use_openai = bool(api_key)
     
     try:
-        transcriber = YouTubeTranscriber(use_openai=use_openai, api_key=api_key)
+        transcriber = YouTubeTranscriber(use_openai=use_openai, api_key=api_key, server_url=args.server)
         
         while True:
             url = input("\nEnter YouTube URL (or 'quit' to exit): ")
@@ -0,0 +1,248 @@
+"""Shared on-disk cache for yt-dlp metadata.
+
+Channel listings and video info are cached in a small SQLite file keyed by
+video id (or URL) plus the options that change what yt-dlp extracts, so the
+app's importer, the standalone extractor and the transcriber all share
+lookups. URLs that fail permanently (private, removed or unavailable
+videos) are cached too, for a shorter time, and re-raise without touching
+the extractor; network errors and timeouts are never cached.
+
+Hit/miss counters are kept in the same file so every process contributes
+to one set of metrics. Lookups are counted in memory and written with the
+next cache write or every COUNTER_FLUSH_SECONDS, not in a write
+transaction per lookup.
+"""
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadError, ExtractorError, UnavailableVideoError
+
+CACHE_PATH = os.getenv('YTDLP_CACHE_PATH', 'ytdlp_cache.db')
+DEFAULT_TTL = int(os.getenv('YTDLP_CACHE_TTL', 60 * 60))  # seconds
+NEGATIVE_TTL = int(os.getenv('YTDLP_CACHE_NEGATIVE_TTL', 10 * 60))
+COUNTER_FLUSH_SECONDS = 30
+
+# Options that change the extracted info; everything else (output paths,
+# quiet, postprocessors) is ignored when building the cache key
+KEY_OPTIONS = ('extract_flat', 'format', 'playlist_items', 'playliststart', 'playlistend')
+
+VIDEO_ID = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|live/|embed/)|youtu\.be/)([\w-]{11})'
+)
+
+
+class CachedExtractionError(Exception):
+    """A URL that failed recently; raised from the cache without retrying"""
+
+
+def is_permanent(error):
+    """True for yt-dlp errors that retrying won't fix.
+
+    yt-dlp marks user-facing extractor errors (private, removed or
+    unavailable videos, unsupported URLs) as ``expected``; failed requests
+    are raised unexpected, with the network error as their cause.
+    """
+    if isinstance(error, DownloadError) and error.exc_info:
+        error = error.exc_info[1]
+    if isinstance(error, UnavailableVideoError):
+        return True
+    return isinstance(error, ExtractorError) and error.expected
+
+
+def cache_key(url, opts=None, namespace='info'):
+    match = VIDEO_ID.search(url)
+    target = f'yt:{match.group(1)}' if match else url.strip().rstrip('/')
+    relevant = {key: (opts or {}).get(key) for key in KEY_OPTIONS if (opts or {}).get(key) is not None}
+    if relevant:
+        digest = hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:12]
+        target = f'{target}#{digest}'
+    return f'{namespace}:{target}'
+
+
+class MetadataCache:
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self._pid = os.getpid()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._local = threading.local()
+        self._pending = Counter()  # counter increments not yet written
+        self._pending_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        with self._conn() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB,
+                    error TEXT,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                );
+            ''')
+            conn.execute('DELETE FROM entries WHERE expires_at < ?', (time.time(),))
+
+    def _conn(self):
+        # One connection per thread so extractor thread pools can share a cache
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=15)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._pending_lock:
+            self._pending[name] += 1
+            due = time.monotonic() - self._flushed_at >= COUNTER_FLUSH_SECONDS
+        if due:
+            try:
+                self.flush_counters()
+            except sqlite3.Error:
+                pass  # kept in memory for the next flush
+
+    def _write_counters(self, conn):
+        """Add pending increments to the counters in ``conn``'s transaction"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        try:
+            conn.executemany(
+                'INSERT INTO counters (name, value) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                pending.items(),
+            )
+        except sqlite3.Error:
+            with self._pending_lock:
+                self._pending.update(pending)
+            raise
+
+    def flush_counters(self):
+        """Write counter increments held in memory"""
+        if self._pending:
+            with self._conn() as conn:
+                self._write_counters(conn)
+
+    def get(self, key):
+        """Return the cached value, raise CachedExtractionError for a cached
+        failure, or return None on a miss"""
+        row = self._conn().execute(
+            'SELECT value, error FROM entries WHERE key = ? AND expires_at >= ?',
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        if row[1] is not None:
+            self._count('negative_hits')
+            raise CachedExtractionError(row[1])
+        self._count('hits')
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, value, ttl=None):
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, error, expires_at) VALUES (?, ?, NULL, ?)',
+                (key, zlib.compress(json.dumps(value).encode('utf-8')),
+                 time.time() + (self.ttl if ttl is None else ttl)),
+            )
+            self._write_counters(conn)
+
+    def set_error(self, key, error):
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, error, expires_at) VALUES (?, NULL, ?, ?)',
+                (key, str(error), time.time() + self.negative_ttl),
+            )
+            with self._pending_lock:
+                self._pending['errors'] += 1
+            self._write_counters(conn)
+
+    def invalidate(self, key):
+        with self._conn() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def fetch(self, key, producer, ttl=None):
+        """Return the cached value for ``key`` or compute, store and return
+        ``producer()``. Permanent yt-dlp errors from the producer are cached
+        negatively; anything else propagates without being cached."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        try:
+            value = producer()
+        except Exception as e:
+            if is_permanent(e):
+                self.set_error(key, e)
+            raise
+        if value is None:
+            self.set_error(key, 'No information returned')
+            raise CachedExtractionError('No information returned')
+        self.set(key, value, ttl)
+        return value
+
+    def extract_info(self, url, opts=None, ttl=None):
+        """Cached ``YoutubeDL(opts).extract_info(url, download=False)``.
+
+        The result is yt-dlp's sanitized (JSON safe) info dict, which can be
+        handed back to ``YoutubeDL.process_ie_result`` to download.
+        """
+        def extract():
+            with YoutubeDL(dict(opts or {})) as ydl:
+                info = ydl.extract_info(url, download=False)
+                return ydl.sanitize_info(info) if info else None
+
+        return self.fetch(cache_key(url, opts), extract, ttl)
+
+    def stats(self):
+        self.flush_counters()
+        conn = self._conn()
+        counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+        entries, negative = conn.execute(
+            'SELECT COUNT(*), COUNT(error) FROM entries WHERE expires_at >= ?', (time.time(),)
+        ).fetchone()
+        hits = counters.get('hits', 0) + counters.get('negative_hits', 0)
+        lookups = hits + counters.get('misses', 0)
+        return {
+            'hits': counters.get('hits', 0),
+            'negative_hits': counters.get('negative_hits', 0),
+            'misses': counters.get('misses', 0),
+            'errors': counters.get('errors', 0),
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            'entries': entries,
+            'negative_entries': negative,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide MetadataCache at YTDLP_CACHE_PATH"""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache._pid != os.getpid():
+            _cache = MetadataCache()
+            atexit.register(_cache.flush_counters)
+        return _cache
+
+
+def extract_info(url, opts=None, ttl=None):
+    return get_cache().extract_info(url, opts, ttl)
+
+
+if __name__ == '__main__':
+    print(json.dumps(get_cache().stats(), indent=2))